@@ -2,6 +2,8 @@ import os
 import json
 import re
 import random
+import hashlib
+from datetime import datetime
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
@@ -9,17 +11,18 @@ from dotenv import load_dotenv
 from pydantic import BaseModel
 from langchain_core.messages import HumanMessage
 import base64
-from typing import List, Optional, Union
-from reference_data import get_reference_range
-import io
+from typing import AsyncIterator, List, Optional, Union
+from reference_data import reference_engine
+from utils.sentence_splitter import IncrementalSentenceSplitter
+from utils.single_flight import SingleFlight
+from utils.response_cache import response_cache, canonical_text, canonical_symptoms
+from utils.red_flags import red_flag_detector
+from services.lab_ingest import lab_ingest
+from services.lab_interpreter import lab_interpreter
+from services.lab_parser import lab_parser
+from services.lab_units import unit_registry
 from openai import AsyncOpenAI
 
-# PDF Handling
-try:
-    from pypdf import PdfReader
-except ImportError:
-    pass # Will be handled if missing in requirements
-
 load_dotenv()
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -35,6 +38,120 @@ class AIResponse(BaseModel):
     potential_conditions: List[str]
     recommended_actions: List[str]
 
+# Prompt templates for the cached endpoints. Each template is hashed into its
+# response cache keys, so editing one invalidates the responses it produced.
+EXTRACT_SYMPTOMS_PROMPT = """
+You are an expert medical AI. Extract symptoms from the user's text.
+
+User Input: {text}
+Language: {language}
+
+Task:
+1. Identify all symptoms mentioned.
+2. For each symptom, provide the exact name mentioned, a normalized medical term (e.g., "hurt head" -> "Headache"), and a confidence score (0.0-1.0).
+3. Extract the overall duration and severity (1-10) if mentioned.
+4. Identify any red flags or emergency signs.
+5. Return the output in {language}, but keep the 'normalizedName' in English for standardization.
+
+Return a valid JSON object with the following structure:
+{{
+    "symptoms": [
+        {{
+            "name": "Exact text from user",
+            "normalizedName": "Standard Medical Term (English)",
+            "confidence": 0.95
+        }}
+    ],
+    "duration": "e.g., 2 days",
+    "severity": "e.g., 5",
+    "redFlagsDetected": ["List of emergency signs found"]
+}}
+"""
+
+SUGGEST_REFINEMENTS_PROMPT = """
+You are a medical assistant. Based on the initial symptoms, suggest related symptoms to check for.
+
+Initial Symptoms: {symptoms}
+Language: {language}
+
+Task:
+1. Suggest at least 30 specific symptoms that might be related to the initial symptoms or are important to rule out.
+2. Include a mix of common and less common symptoms.
+3. Return them in a single group named "Related Symptoms".
+
+Return a valid JSON object:
+{{
+    "groups": [
+        {{
+            "name": "Related Symptoms",
+            "symptoms": [
+                "Symptom 1",
+                "Symptom 2",
+                ...
+                "Symptom 30"
+            ]
+        }}
+    ]
+}}
+"""
+
+RECOMMEND_TESTS_PROMPT = """
+Suggest lab tests based on diagnosis.
+
+Diagnosis: {diagnosis}
+Profile: {profile_summary}
+Language: {language}
+
+Task:
+1. Suggest tests.
+2. Provide purpose and prep instructions in {language}.
+
+Return JSON:
+{{
+    "tests": [
+        {{
+            "name": "Test Name",
+            "purpose": "Purpose in {language}",
+            "whatItMeasures": "Explanation in {language}",
+            "prepInstructions": "Instructions in {language}",
+            "urgency": "High/Routine"
+        }}
+    ],
+    "disclaimer": "Disclaimer in {language}"
+}}
+"""
+
+LAB_NARRATIVE_PROMPT = """
+Explain these lab results to the patient in a short, plain-language narrative.
+
+Labs (with pre-calculated flags): {lab_results}
+Findings already computed: {findings}
+Profile: {profile_summary}
+Language: {language}
+
+Task:
+1. In 3-5 sentences, explain what the findings mean together and how they relate to the profile.
+2. Do not contradict the computed flags or add new diagnoses.
+3. Write in {language}. Return plain text only, no JSON or markdown.
+"""
+
+CONVERSATION_SUMMARY_PROMPT = """
+Update the running summary of a patient's conversation with Doctor.ai.
+
+Previous Summary: {previous_summary}
+
+Older Messages to Add:
+{messages}
+
+Task:
+1. Merge the older messages into the previous summary.
+2. Keep every medically relevant fact: symptoms (onset, duration, severity), answers to questions already asked, medications, allergies, history, advice already given and open questions.
+3. Drop greetings and small talk.
+4. Write in {language}, as short plain notes, under 150 words.
+
+Summary:
+"""
+
 class DoctorAgent:
     def __init__(self):
         if not OPENAI_API_KEY:
@@ -48,6 +165,22 @@ class DoctorAgent:
             request_timeout=120
         )
         self.client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+        # Identical prompts in flight at the same time share one LLM call
+        self.flights = SingleFlight("llm-flight")
+
+    async def _ainvoke(self, chain, inputs: dict):
+        """Invoke a prompt chain, coalescing concurrent identical requests"""
+        template = getattr(getattr(chain, "first", None), "template", "")
+        payload = json.dumps({"model": self.llm.model_name, "template": template, "inputs": inputs}, sort_keys=True, default=str)
+        key = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        return await self.flights.do(key, lambda: chain.ainvoke(inputs))
+
+    def get_llm_stats(self) -> dict:
+        """Get LLM request coalescing and response cache statistics"""
+        return {
+            "single_flight": self.flights.get_stats(),
+            "response_cache": response_cache.get_stats()
+        }
 
     def _clean_response(self, text: str) -> str:
         """Removes markdown code blocks if present."""
@@ -109,42 +242,25 @@ class DoctorAgent:
         
         profile_str = profile_data if profile_data else "No profile available."
 
-        response = await chain.ainvoke({"symptoms": symptoms, "language": language, "profile_data": profile_str})
+        response = await self._ainvoke(chain, {"symptoms": symptoms, "language": language, "profile_data": profile_str})
         return self._clean_response(response.content)
 
     async def extract_symptoms(self, text: str, language: str = "English") -> dict:
         try:
-            prompt_template = """
-            You are an expert medical AI. Extract symptoms from the user's text.
+            # Rule-based red flags never wait for the model
+            rule_flags = self.detect_red_flags(text)
             
-            User Input: {text}
-            Language: {language}
-
-            Task:
-            1. Identify all symptoms mentioned.
-            2. For each symptom, provide the exact name mentioned, a normalized medical term (e.g., "hurt head" -> "Headache"), and a confidence score (0.0-1.0).
-            3. Extract the overall duration and severity (1-10) if mentioned.
-            4. Identify any red flags or emergency signs.
-            5. Return the output in {language}, but keep the 'normalizedName' in English for standardization.
-
-            Return a valid JSON object with the following structure:
-            {{
-                "symptoms": [
-                    {{
-                        "name": "Exact text from user",
-                        "normalizedName": "Standard Medical Term (English)",
-                        "confidence": 0.95
-                    }}
-                ],
-                "duration": "e.g., 2 days",
-                "severity": "e.g., 5",
-                "redFlagsDetected": ["List of emergency signs found"]
-            }}
-            """
-            prompt = PromptTemplate(input_variables=["text", "language"], template=prompt_template)
-            chain = prompt | self.llm
-            response = await chain.ainvoke({"text": text, "language": language})
-            result = self._clean_response(response.content)
+            cache_key = response_cache.make_key(
+                "extract_symptoms", self.llm.model_name, EXTRACT_SYMPTOMS_PROMPT,
+                text=canonical_text(text), language=language
+            )
+            result = response_cache.get("extract_symptoms", cache_key)
+            if result is None:
+                prompt = PromptTemplate(input_variables=["text", "language"], template=EXTRACT_SYMPTOMS_PROMPT)
+                chain = prompt | self.llm
+                response = await self._ainvoke(chain, {"text": text, "language": language})
+                result = self._clean_response(response.content)
+                response_cache.set("extract_symptoms", cache_key, result)
             
             # Merge rule-based red flags
             try:
@@ -153,7 +269,6 @@ class DoctorAgent:
                 else:
                     result_dict = result
                     
-                rule_flags = self.detect_red_flags(text)
                 if rule_flags:
                     if "redFlagsDetected" not in result_dict:
                         result_dict["redFlagsDetected"] = []
@@ -168,53 +283,23 @@ class DoctorAgent:
             return {"error": str(e)}
 
     def detect_red_flags(self, text: str) -> List[str]:
-        """Simple regex/keyword based red flag detection as a backup layer"""
-        flags = []
-        text_lower = text.lower()
-        if any(x in text_lower for x in ["chest pain", "heart attack", "crushing"]):
-            flags.append("Possible Cardiac Event")
-        if any(x in text_lower for x in ["stroke", "slurred speech", "numbness one side"]):
-            flags.append("Possible Stroke Signs")
-        if any(x in text_lower for x in ["suicide", "kill myself", "want to die"]):
-            flags.append("Self-Harm Risk")
-        if "fever" in text_lower and ("103" in text_lower or "104" in text_lower or "105" in text_lower or "high" in text_lower):
-            flags.append("High Fever")
-        if any(x in text_lower for x in ["trouble breathing", "can't breathe", "shortness of breath", "gasping"]):
-             flags.append("Respiratory Distress")
-        return flags
+        """Rule-based red flag detection (compiled keyword table, see utils/red_flags.py)"""
+        return red_flag_detector.detect(text)
 
     async def suggest_refinements(self, symptoms: List[dict], language: str = "English") -> dict:
         try:
-            prompt_template = """
-            You are a medical assistant. Based on the initial symptoms, suggest related symptoms to check for.
-            
-            Initial Symptoms: {symptoms}
-            Language: {language}
-
-            Task:
-            1. Suggest at least 30 specific symptoms that might be related to the initial symptoms or are important to rule out.
-            2. Include a mix of common and less common symptoms.
-            3. Return them in a single group named "Related Symptoms".
-
-            Return a valid JSON object:
-            {{
-                "groups": [
-                    {{
-                        "name": "Related Symptoms",
-                        "symptoms": [
-                            "Symptom 1",
-                            "Symptom 2",
-                            ...
-                            "Symptom 30"
-                        ]
-                    }}
-                ]
-            }}
-            """
-            prompt = PromptTemplate(input_variables=["symptoms", "language"], template=prompt_template)
-            chain = prompt | self.llm
-            response = await chain.ainvoke({"symptoms": str(symptoms), "language": language})
-            return self._clean_response(response.content)
+            cache_key = response_cache.make_key(
+                "suggest_refinements", self.llm.model_name, SUGGEST_REFINEMENTS_PROMPT,
+                symptoms=canonical_symptoms(symptoms), language=language
+            )
+            result = response_cache.get("suggest_refinements", cache_key)
+            if result is None:
+                prompt = PromptTemplate(input_variables=["symptoms", "language"], template=SUGGEST_REFINEMENTS_PROMPT)
+                chain = prompt | self.llm
+                response = await self._ainvoke(chain, {"symptoms": str(symptoms), "language": language})
+                result = self._clean_response(response.content)
+                response_cache.set("suggest_refinements", cache_key, result)
+            return result
         except Exception as e:
             print(f"AI Error (suggest_refinements): {e}")
             # Mock Fallback using static list (omitted for brevity, assume similar fallback as before if crash)
@@ -261,7 +346,7 @@ class DoctorAgent:
             profile_str = profile_summary if profile_summary else "No profile available."
             confirmations_str = str(confirmations) if confirmations else "None"
             
-            response = await chain.ainvoke({
+            response = await self._ainvoke(chain, {
                 "symptoms": str(symptoms), 
                 "refinements": str(refinements), 
                 "confirmations": str(confirmations), 
@@ -297,36 +382,19 @@ class DoctorAgent:
 
     async def recommend_tests(self, diagnosis: dict, profile_summary: str = None, language: str = "English") -> dict:
         try:
-            prompt_template = """
-            Suggest lab tests based on diagnosis.
-            
-            Diagnosis: {diagnosis}
-            Profile: {profile_summary}
-            Language: {language}
-    
-            Task:
-            1. Suggest tests.
-            2. Provide purpose and prep instructions in {language}.
-    
-            Return JSON:
-            {{
-                "tests": [
-                    {{
-                        "name": "Test Name",
-                        "purpose": "Purpose in {language}",
-                        "whatItMeasures": "Explanation in {language}",
-                        "prepInstructions": "Instructions in {language}",
-                        "urgency": "High/Routine"
-                    }}
-                ],
-                "disclaimer": "Disclaimer in {language}"
-            }}
-            """
-            prompt = PromptTemplate(input_variables=["diagnosis", "profile_summary", "language"], template=prompt_template)
-            chain = prompt | self.llm
             profile_str = profile_summary if profile_summary else "No profile available."
-            response = await chain.ainvoke({"diagnosis": str(diagnosis), "profile_summary": profile_str, "language": language})
-            return self._clean_response(response.content)
+            cache_key = response_cache.make_key(
+                "recommend_tests", self.llm.model_name, RECOMMEND_TESTS_PROMPT,
+                diagnosis=diagnosis, profile=canonical_text(profile_str), language=language
+            )
+            result = response_cache.get("recommend_tests", cache_key)
+            if result is None:
+                prompt = PromptTemplate(input_variables=["diagnosis", "profile_summary", "language"], template=RECOMMEND_TESTS_PROMPT)
+                chain = prompt | self.llm
+                response = await self._ainvoke(chain, {"diagnosis": str(diagnosis), "profile_summary": profile_str, "language": language})
+                result = self._clean_response(response.content)
+                response_cache.set("recommend_tests", cache_key, result)
+            return result
         except Exception as e:
             print(f"AI Error (recommend_tests): {e}")
             return {"error": str(e)}
@@ -336,60 +404,35 @@ class DoctorAgent:
         is_vision = False
         message_content = []
 
-        # 1. Handle PDF (Text Extraction -> Fallback to Image Extraction)
-        if mime_type == "application/pdf":
-            try:
-                if isinstance(input_data, bytes):
-                    reader = PdfReader(io.BytesIO(input_data))
-                else:
+        # 1. Handle PDFs and Images (parsing, OCR and image re-encoding run in the lab ingest process pool)
+        if mime_type == "application/pdf" or mime_type.startswith("image/"):
+            if not isinstance(input_data, bytes):
+                if mime_type == "application/pdf":
                     return json.dumps({"error": "PDF input must be bytes"})
-                
-                # Attempt Text Extraction
-                for page in reader.pages:
-                    text = page.extract_text()
-                    if text:
-                        extracted_text += text + "\n"
-                
-                # Check if text is sufficient (heuristic: < 50 chars implies scanned doc)
-                if len(extracted_text.strip()) < 50:
-                    print("Low text content detected in PDF. Attempting image extraction for Vision processing...")
-                    images = self._extract_images_from_pdf(reader)
-                    
-                    if images:
-                        is_vision = True
-                        message_content = [{"type": "text", "text": "Analyze these images from a medical report. Extract ALL lab test values found. Return structured JSON with an 'entries' list. Each entry MUST have these exact keys: 'name', 'value' (number), 'unit', 'range' (string). Ensure no data is missed."}]
-                        
-                        for img_base64 in images:
-                            message_content.append({
-                                "type": "image_url",
-                                "image_url": {"url": f"data:image/png;base64,{img_base64}"}
-                            })
-                    else:
-                        return json.dumps({"error": "Could not extract text and no embedded images found in PDF. It might be a flat scanned file that requires server-side OCR tools."})
-            
+                input_data = base64.b64decode(input_data)
+            try:
+                document = await lab_ingest.ingest(input_data, mime_type)
             except Exception as e:
                 print(f"PDF Extraction Error: {e}")
-                return json.dumps({"error": f"Failed to read PDF file: {str(e)}"})
-
-        # 2. Handle Images (Vision API)
-        elif mime_type.startswith("image/"):
-            is_vision = True
-            if isinstance(input_data, bytes):
-                base64_data = base64.b64encode(input_data).decode("utf-8")
-            else:
-                base64_data = input_data 
+                return json.dumps({"error": f"Failed to read file: {str(e)}"})
             
-            message_content = [
-                {"type": "text", "text": "Analyze this medical report image. Extract ALL lab test values found. Return structured JSON with an 'entries' list. Each entry MUST have these exact keys: 'name', 'value' (number), 'unit', 'range' (string). Ensure no data is missed."},
-                {
-                    "type": "image_url", 
-                    "image_url": {
-                        "url": f"data:{mime_type};base64,{base64_data}"
-                    }
-                }
-            ]
-
-        # 3. Handle Plain Text
+            extracted_text = document["text"]
+            if document["images"]:
+                is_vision = True
+                instruction = "Analyze these images from a medical report. Extract ALL lab test values found. Return structured JSON with an 'entries' list. Each entry MUST have these exact keys: 'name', 'value' (number), 'unit', 'range' (string). Ensure no data is missed."
+                if extracted_text.strip():
+                    # Mixed report: include the pages that did have text
+                    instruction += f"\n\nText from the other pages of the report:\n{extracted_text}"
+                message_content = [{"type": "text", "text": instruction}]
+                for img_base64 in document["images"]:
+                    message_content.append({
+                        "type": "image_url",
+                        "image_url": {"url": f"data:image/jpeg;base64,{img_base64}"}
+                    })
+            elif len(extracted_text.strip()) < 50:
+                return json.dumps({"error": "Could not extract text or images from the file. It might be empty or unreadable."})
+
+        # 2. Handle Plain Text
         else:
             extracted_text = input_data
 
@@ -408,7 +451,11 @@ class DoctorAgent:
                 print(f"Vision API Error: {e}")
                 return json.dumps({"error": str(e)})
         else:
-            # Text-based processing
+            # Text-based processing: local line parser first, LLM only if it is not confident
+            parsed = lab_parser.parse(extracted_text)
+            if parsed is not None:
+                return json.dumps({"entries": parsed["entries"], "source": "parser", "confidence": parsed["confidence"]})
+            
             prompt_template = """
             Extract lab test values from the following text (from a medical report).
             
@@ -433,111 +480,105 @@ class DoctorAgent:
             try:
                 prompt = PromptTemplate(input_variables=["text"], template=prompt_template)
                 chain = prompt | self.llm
-                response = await chain.ainvoke({"text": extracted_text})
+                response = await self._ainvoke(chain, {"text": extracted_text})
                 return self._clean_response(response.content)
             except Exception as e:
                 print(f"Text Analysis Error: {e}")
                 return json.dumps({"error": str(e)})
 
-    def _extract_images_from_pdf(self, reader: PdfReader) -> List[str]:
-        """Extracts images from PDF pages and returns them as base64 strings."""
-        images = []
+    def _profile_age(self, profile_summary: Optional[str]) -> Optional[float]:
+        """Age in years from a profile summary ("Age: 45" or "Age: 1980-05-01"), None if unknown"""
+        match = re.search(r"Age:\s*(\d{4})-(\d{2})-(\d{2})|Age:\s*(\d{1,3})\b", profile_summary or "")
+        if not match:
+            return None
+        if match.group(4):
+            return float(match.group(4))
         try:
-            for page in reader.pages:
-                if hasattr(page, "images"):
-                    for image_file_object in page.images:
-                        try:
-                            # Convert to base64
-                            final_data = image_file_object.data
-                            base64_str = base64.b64encode(final_data).decode("utf-8")
-                            images.append(base64_str)
-                        except Exception as img_err:
-                            print(f"Error processing a PDF image: {img_err}")
-        except Exception as e:
-            print(f"Error extracting images from PDF: {e}")
-        return images
+            born = datetime(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+        except ValueError:
+            return None
+        return (datetime.utcnow() - born).days / 365.25
 
-    async def interpret_labs(self, lab_results: List[dict], profile_summary: str = None, language: str = "English") -> dict:
-        # Pre-process labs with stored reference ranges
+    async def interpret_labs(self, lab_results: List[dict], profile_summary: str = None, language: str = "English", narrative: Optional[str] = None) -> str:
+        """
+        Interpret a lab panel locally; the LLM only writes an optional narrative
+
+        Args:
+            lab_results: Lab entries
+            profile_summary: Patient profile text (gender and age select reference bands)
+            language: Response language
+            narrative: None (rules only), "sync" (wait for the LLM narrative)
+                       or "async" (return a narrative_id to poll)
+
+        Returns:
+            JSON string: {"abnormal", "summary", "riskSignals", "critical", "unassessed", "source"}
+            plus "narrative" or "narrative_id"
+        """
+        # Pre-process labs with stored reference ranges (whole panel flagged in one batch)
         gender = "male" # Default
         if profile_summary:
             if "female" in profile_summary.lower():
                 gender = "female"
         
-        processed_labs = []
-        for lab in lab_results:
-            # lab keys: name, value, unit, etc.
-            name = lab.get("name", "")
-            value = lab.get("value")
-            
-            # Try to cast value to float if it's a number-like string or number
-            try:
-                if value is not None:
-                    # Remove non-numeric chars if string
-                    if isinstance(value, str):
-                        import re
-                        # Extract first number found
-                        match = re.search(r"[-+]?\d*\.\d+|\d+", value)
-                        if match:
-                            val_float = float(match.group())
-                        else:
-                            val_float = None
-                    else:
-                        val_float = float(value)
-                        
-                    if val_float is not None:
-                        ref = get_reference_range(name, gender)
-                        if ref:
-                            lab["reference_range_stored"] = f"{ref['min']} - {ref['max']} {ref['unit']}"
-                            if val_float < ref["min"]:
-                                lab["flag_calculated"] = "Low"
-                            elif val_float > ref["max"]:
-                                lab["flag_calculated"] = "High"
-                            else:
-                                lab["flag_calculated"] = "Normal"
-            except Exception as e:
-                print(f"Error processing lab value {value}: {e}")
-                pass
-            processed_labs.append(lab)
-
-        prompt_template = """
-        Interpret lab results.
-        
-        Labs (with pre-calculated flags if available): {lab_results}
-        Profile: {profile_summary}
-        Language: {language}
+        processed_labs = [dict(lab) for lab in lab_results]
+        try:
+            # Entries stored before canonicalization are converted here
+            unit_registry.canonicalize_entries(processed_labs)
+            reference_engine.flag_panel(processed_labs, gender, self._profile_age(profile_summary))
+        except Exception as e:
+            print(f"Error flagging lab values: {e}")
 
-        Task:
-        1. Flag abnormal results. Use 'flag_calculated' if present as a strong signal. If not present, use the 'range' in the lab entry or general medical knowledge.
-        2. Explain meaning in {language}.
-        3. Suggest questions in {language}.
-        4. Identify risk signals.
-        5. Provide a summary.
+        result = lab_interpreter.interpret(processed_labs, language)
+        if narrative not in ("sync", "async") or not lab_interpreter.needs_narrative(result):
+            return json.dumps(result, ensure_ascii=False)
 
-        Return JSON:
-        {{
-            "abnormal": [
-                {{
-                    "test": "Test Name",
-                    "value": float,
-                    "flag": "High/Low/Critical",
-                    "meaning": "Explanation in {language}",
-                    "questionsToAskDoctor": ["Question in {language}"]
-                }}
-            ],
-            "summary": "Summary in {language}",
-            "riskSignals": ["Risks in {language}"]
-        }}
-        """
-        prompt = PromptTemplate(input_variables=["lab_results", "profile_summary", "language"], template=prompt_template)
-        chain = prompt | self.llm
         profile_str = profile_summary if profile_summary else "No profile available."
-        try:
-            response = await chain.ainvoke({"lab_results": str(processed_labs), "profile_summary": profile_str, "language": language})
-            return self._clean_response(response.content)
-        except Exception as e:
-            print(f"AI Error (interpret_labs): {e}")
-            return {"error": str(e)}
+        # The prompt gets the printed entries with their calculated flag, and the cache key
+        # covers exactly those fields (the findings are derived from them)
+        lab_fields = ("name", "value", "unit", "range", "reference_range", "flag_calculated")
+        prompt_labs = [
+            {field: lab[field] for field in lab_fields if lab.get(field) not in (None, "")}
+            for lab in processed_labs
+        ]
+        # Same panel (order-insensitive) for the same profile -> same narrative
+        canonical_labs = sorted(
+            [canonical_text(str(lab.get(field, ""))) for field in lab_fields] for lab in prompt_labs
+        )
+        cache_key = response_cache.make_key(
+            "interpret_labs", self.llm.model_name, LAB_NARRATIVE_PROMPT,
+            labs=canonical_labs, profile=canonical_text(profile_str), language=language
+        )
+
+        async def generate() -> str:
+            cached = response_cache.get("interpret_labs", cache_key)
+            if cached is not None:
+                return cached
+            prompt = PromptTemplate(input_variables=["lab_results", "findings", "profile_summary", "language"], template=LAB_NARRATIVE_PROMPT)
+            chain = prompt | self.llm
+            findings = {key: result[key] for key in ("abnormal", "riskSignals", "unassessed")}
+            response = await self._ainvoke(chain, {
+                "lab_results": json.dumps(prompt_labs, ensure_ascii=False),
+                "findings": json.dumps(findings, ensure_ascii=False),
+                "profile_summary": profile_str,
+                "language": language
+            })
+            text = response.content.strip()
+            response_cache.set("interpret_labs", cache_key, text)
+            return text
+
+        if narrative == "async":
+            narrative_id = hashlib.sha256(cache_key.encode("utf-8")).hexdigest()[:32]
+            job = lab_interpreter.schedule_narrative(narrative_id, generate)
+            result["narrative_id"] = narrative_id
+            result["narrative"] = job["narrative"]
+        else:
+            try:
+                result["narrative"] = await generate()
+            except Exception as e:
+                # The rule-based interpretation stands on its own
+                print(f"AI Error (interpret_labs narrative): {e}")
+                result["narrative"] = None
+        return json.dumps(result, ensure_ascii=False)
 
     async def generate_health_plan(self, diagnosis: dict = None, symptoms: str = None, labs: List[dict] = None, profile_summary: str = None, daily_logs: List[dict] = None, language: str = "English") -> dict:
         try:
@@ -600,7 +641,7 @@ class DoctorAgent:
             labs_str = str(labs) if labs else "None"
             logs_str = str(daily_logs) if daily_logs else "None"
             
-            response = await chain.ainvoke({
+            response = await self._ainvoke(chain, {
                 "diagnosis": diagnosis_str,
                 "symptoms": symptoms_str,
                 "labs": labs_str,
@@ -638,31 +679,6 @@ class DoctorAgent:
                 "warnings": ["If symptoms worsen, seek medical attention immediately."]
             }
 
-    def detect_red_flags(self, symptoms_text: str) -> List[str]:
-        """
-        Fast rule-based detection of emergency keywords.
-        """
-        red_flags = []
-        keywords = {
-            "chest pain": "Potential Heart Attack",
-            "shortness of breath": "Respiratory Distress",
-            "difficulty breathing": "Respiratory Distress",
-            "unconscious": "Loss of Consciousness",
-            "fainted": "Loss of Consciousness",
-            "severe bleeding": "Hemorrhage",
-            "vomiting blood": "Internal Bleeding",
-            "slurred speech": "Potential Stroke",
-            "sudden severe headache": "Potential Stroke/Aneurysm",
-            "suicidal": "Psychiatric Emergency"
-        }
-        
-        text_lower = symptoms_text.lower()
-        for key, warning in keywords.items():
-            if key in text_lower:
-                red_flags.append(warning)
-                
-        return list(set(red_flags))
-
     async def analyze_image(self, image_data: str, prompt_text: str = "Analyze this medical report or image.") -> str:
         # For Gemini 1.5 Flash with images, we typically use the multimodal capabilities.
         # This is a simplified implementation assuming image_data is passed correctly to a multimodal chain
@@ -686,7 +702,7 @@ class DoctorAgent:
             template="Translate the following medical text to {target_language}. Maintain medical accuracy.\n\nText: {text}"
         )
         chain = prompt | self.llm
-        response = await chain.ainvoke({"text": text, "target_language": target_language})
+        response = await self._ainvoke(chain, {"text": text, "target_language": target_language})
         return response.content
         
     async def generate_insights(self, health_data: str) -> str:
@@ -695,10 +711,11 @@ class DoctorAgent:
             template="Analyze the following patient health data and provide a weekly summary with trends and insights.\n\nData: {health_data}"
         )
         chain = prompt | self.llm
-        response = await chain.ainvoke({"health_data": health_data})
+        response = await self._ainvoke(chain, {"health_data": health_data})
         return response.content
 
-    async def chat_with_doctor(self, message: str, history: List[dict], profile_summary: str = None, language: str = "English") -> str:
+    def _build_chat_request(self, message: str, history: List[dict], profile_summary: str = None, language: str = "English", summary: str = None):
+        """Builds the doctor chat chain and its inputs. Returns (chain, inputs, should_show_disclaimer)."""
         # Detect if Bengali
         is_bengali = language.lower() in ["bengali", "bangla", "bn"]
         
@@ -709,7 +726,10 @@ class DoctorAgent:
         Patient Profile: {profile_summary}
         Language: {language}
         
-        Conversation History:
+        Summary of Earlier Conversation:
+        {summary}
+        
+        Recent Conversation:
         {history}
         
         User's New Message: {message}
@@ -729,8 +749,8 @@ class DoctorAgent:
         """
         
         # Prepare disclaimer instruction based on history length
-        # Only show disclaimer on the first message (when history is empty)
-        should_show_disclaimer = len(history) == 0
+        # Only show disclaimer on the first message (no history and no summary of older turns)
+        should_show_disclaimer = len(history) == 0 and not summary
         print(f"[AI-AGENT] Disclaimer Debug: History Length={len(history)}, Should Show={should_show_disclaimer}")
         
         # Language-specific instructions
@@ -759,7 +779,7 @@ class DoctorAgent:
             """
         
         prompt = PromptTemplate(
-            input_variables=["message", "history", "profile_summary", "language", "language_specific_instructions"], 
+            input_variables=["message", "history", "summary", "profile_summary", "language", "language_specific_instructions"], 
             template=prompt_template
         )
         chain = prompt | self.llm
@@ -774,46 +794,102 @@ class DoctorAgent:
             
         profile_str = profile_summary if profile_summary else ("প্রোফাইল পাওয়া যায়নি।" if is_bengali else "No profile available.")
         
-        response = await chain.ainvoke({
+        summary_str = summary if summary else ("নেই" if is_bengali else "None")
+        
+        inputs = {
             "message": message,
             "history": history_str,
+            "summary": summary_str,
             "profile_summary": profile_str,
             "language": "বাংলা (Bengali)" if is_bengali else language,
             "language_specific_instructions": lang_instructions
-        })
+        }
+        return chain, inputs, should_show_disclaimer
+
+    def _strip_disclaimer(self, response_text: str) -> str:
+        """Aggressively removes disclaimer sentences/lines from a reply (or a single sentence of it)."""
+        # List of phrases that trigger removal of the whole sentence or block
+        trigger_phrases = [
+            "informational purposes only",
+            "visit a doctor",
+            "consult a doctor",
+            "consult a healthcare professional",
+            "medical advice",
+            "তথ্যমূলক",
+            "ডাক্তারের পরামর্শ"
+        ]
         
-        response_text = response.content
+        # Simple line-based filtering first (often disclaimer is on its own line)
+        lines = response_text.split('\n')
+        clean_lines = []
+        for line in lines:
+            if any(phrase.lower() in line.lower() for phrase in trigger_phrases):
+                continue # Skip this line
+            clean_lines.append(line)
+        
+        response_text = '\n'.join(clean_lines).strip()
+        
+        # If disclaimer was inline, fallback to regex
+        response_text = re.sub(r"(Remember|Note|Please note).*?(informational purposes|visit a doctor|medical advice).*?(\.|$)", "", response_text, flags=re.IGNORECASE | re.DOTALL).strip()
+        
+        return response_text
+
+    async def chat_with_doctor(self, message: str, history: List[dict], profile_summary: str = None, language: str = "English", summary: str = None) -> str:
+        chain, inputs, should_show_disclaimer = self._build_chat_request(message, history, profile_summary, language, summary)
+        
+        response = await self._ainvoke(chain, inputs)
         
         response_text = response.content
         
         # Post-processing: Aggressive Removal
         if not should_show_disclaimer:
-            # List of phrases that trigger removal of the whole sentence or block
-            trigger_phrases = [
-                "informational purposes only",
-                "visit a doctor",
-                "consult a doctor",
-                "consult a healthcare professional",
-                "medical advice",
-                "তথ্যমূলক",
-                "ডাক্তারের পরামর্শ"
-            ]
-            
-            # Simple line-based filtering first (often disclaimer is on its own line)
-            lines = response_text.split('\n')
-            clean_lines = []
-            for line in lines:
-                if any(phrase.lower() in line.lower() for phrase in trigger_phrases):
-                    continue # Skip this line
-                clean_lines.append(line)
-            
-            response_text = '\n'.join(clean_lines).strip()
-            
-            # If disclaimer was inline, fallback to regex
-            response_text = re.sub(r"(Remember|Note|Please note).*?(informational purposes|visit a doctor|medical advice).*?(\.|$)", "", response_text, flags=re.IGNORECASE | re.DOTALL).strip()
+            response_text = self._strip_disclaimer(response_text)
         
         return response_text
 
+    async def stream_chat_with_doctor(self, message: str, history: List[dict], profile_summary: str = None, language: str = "English", summary: str = None) -> AsyncIterator[str]:
+        """
+        Streaming variant of chat_with_doctor.
+        Yields finished reply sentences as LLM tokens arrive, using the same
+        sentence rules as split_into_sentences and the same disclaimer filter
+        applied per sentence.
+        """
+        chain, inputs, should_show_disclaimer = self._build_chat_request(message, history, profile_summary, language, summary)
+        splitter = IncrementalSentenceSplitter("Bengali" if language.lower() in ["bengali", "bangla", "bn"] else "English")
+        
+        async for chunk in chain.astream(inputs):
+            token = chunk.content if isinstance(chunk.content, str) else ""
+            for sentence in splitter.feed(token):
+                if not should_show_disclaimer:
+                    sentence = self._strip_disclaimer(sentence)
+                if sentence:
+                    yield sentence
+        
+        for sentence in splitter.flush():
+            if not should_show_disclaimer:
+                sentence = self._strip_disclaimer(sentence)
+            if sentence:
+                yield sentence
+
+    async def summarize_conversation(self, previous_summary: Optional[str], messages: List[dict], language: str = "English") -> str:
+        """
+        Fold older chat turns into the running conversation summary.
+        Called from a background task, never while a user waits for a reply.
+        """
+        prompt = PromptTemplate(
+            input_variables=["previous_summary", "messages", "language"],
+            template=CONVERSATION_SUMMARY_PROMPT
+        )
+        chain = prompt | self.llm
+        
+        transcript = "\n".join(f"{msg.get('role', 'user').capitalize()}: {msg.get('content', '')}" for msg in messages)
+        response = await self._ainvoke(chain, {
+            "previous_summary": previous_summary or "None",
+            "messages": transcript,
+            "language": language
+        })
+        return response.content.strip()
+
     def _clean_response(self, content: str) -> str:
         # Use regex to find the JSON block
         match = re.search(r'\{.*\}', content, re.DOTALL)
@@ -0,0 +1,135 @@
+"""
+Lab parser accuracy and speed benchmark
+Runs the local lab-line parser over a report corpus and scores each field
+against ground truth.
+
+By default the corpus is synthetic: reports built from REFERENCE_RANGES and
+TEST_ALIASES in the usual layouts, with header/metadata/narrative noise.
+Real reports can be used instead: a directory of <name>.txt files with a
+<name>.json ground truth each ({"entries": [{"name", "value", "unit", "range"}]}).
+
+Run from the backend directory:
+    python -m benchmarks.bench_lab_parser [--corpus DIR] [--reports N]
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reference_data import REFERENCE_RANGES, TEST_ALIASES
+from services.lab_parser import LAB_PARSER_MIN_CONFIDENCE, parse_lab_text
+
+LAYOUTS = [
+    "{name} {value} {unit} {low}-{high}",
+    "{name}: {value} {unit} ({low} - {high})",
+    "{name}\t{value}\t{unit}\t{low} - {high}",
+    "{name} | {value} | {unit} | {low}-{high}",
+    "{name}    {value}  {flag}  {unit}   {low} - {high}",
+    "{name} {value} {low}-{high} {unit}",
+    "{name} {value} {unit} {low} to {high}",
+]
+NOISE = [
+    "CITY DIAGNOSTIC LABORATORY",
+    "Patient Name: John Doe",
+    "Age: 45 Years   Sex: Male",
+    "Collected: 12/03/2024 08:15   Reported: 12/03/2024 14:02",
+    "Test Name Result Unit Reference Range",
+    "COMPLETE BLOOD COUNT",
+    "Results should be correlated clinically.",
+    "Page 1 of 2",
+    "*** End of Report ***",
+]
+
+
+def synthetic_report(rng: random.Random):
+    """One report (text, truth) with 5-15 results and some noise lines"""
+    lines = rng.sample(NOISE[:5], 3)
+    truth = []
+    for key in rng.sample(list(REFERENCE_RANGES), rng.randint(5, min(15, len(REFERENCE_RANGES)))):
+        band = next(iter(REFERENCE_RANGES[key].values()))
+        low, high = band["min"], band["max"]
+        value = round(rng.uniform(low * 0.6, high * 1.4 if high else 10), 1)
+        printed = rng.choice([key] + TEST_ALIASES.get(key, []))
+        if printed.islower():
+            printed = printed.upper() if len(printed) <= 5 else printed.title()
+        flag = "H" if value > high else "L" if value < low else ""
+        layout = rng.choice(LAYOUTS)
+        lines.append(layout.format(name=printed, value=value, unit=band["unit"], low=low, high=high, flag=flag))
+        truth.append({"name": key, "value": value, "unit": band["unit"], "range": f"{low}-{high}"})
+        if rng.random() < 0.1:
+            lines.append(rng.choice(NOISE[5:]))
+    lines += rng.sample(NOISE[5:], 2)
+    return "\n".join(lines), truth
+
+
+def load_corpus(directory: str):
+    corpus = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.txt"))):
+        truth_path = os.path.splitext(path)[0] + ".json"
+        if not os.path.exists(truth_path):
+            continue
+        with open(path, encoding="utf-8") as f, open(truth_path, encoding="utf-8") as t:
+            corpus.append((f.read(), json.load(t)["entries"]))
+    return corpus
+
+
+def score(entries, truth):
+    """Matched fields per ground-truth entry (name, value, unit, range)"""
+    fields = {"name": 0, "value": 0, "unit": 0, "range": 0}
+    remaining = list(entries)
+    for expected in truth:
+        match = next((e for e in remaining if e["name"].lower() == expected["name"].lower()), None)
+        if match is None:
+            continue
+        remaining.remove(match)
+        fields["name"] += 1
+        fields["value"] += abs(float(match["value"]) - float(expected["value"])) < 1e-6
+        fields["unit"] += match["unit"].replace("µ", "u").lower() == str(expected["unit"]).replace("µ", "u").lower()
+        fields["range"] += match["range"].replace(" ", "") == str(expected["range"]).replace(" ", "")
+    return fields, len(remaining)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="Directory of .txt reports with .json ground truth")
+    parser.add_argument("--reports", type=int, default=2000, help="Synthetic reports to generate")
+    args = parser.parse_args()
+
+    if args.corpus:
+        corpus = load_corpus(args.corpus)
+    else:
+        rng = random.Random(7)
+        corpus = [synthetic_report(rng) for _ in range(args.reports)]
+    if not corpus:
+        print("Empty corpus")
+        return
+
+    totals = {"name": 0, "value": 0, "unit": 0, "range": 0}
+    expected = extra = accepted = 0
+    start = time.perf_counter()
+    results = [parse_lab_text(text) for text, _ in corpus]
+    seconds = time.perf_counter() - start
+
+    for result, (_, truth) in zip(results, corpus):
+        fields, spurious = score(result["entries"], truth)
+        for field, matched in fields.items():
+            totals[field] += matched
+        expected += len(truth)
+        extra += spurious
+        accepted += result["confidence"] >= LAB_PARSER_MIN_CONFIDENCE
+
+    print(f"{len(corpus)} reports, {expected} results, {sum(len(text) for text, _ in corpus) / len(corpus):.0f} chars on average\n")
+    for field, matched in totals.items():
+        print(f"{field:>6} accuracy: {matched / expected * 100:6.2f}%")
+    print(f"  spurious entries: {extra}")
+    print(f"  accepted without LLM (confidence >= {LAB_PARSER_MIN_CONFIDENCE}): {accepted / len(corpus) * 100:.1f}%")
+    print(f"  parse time: {seconds / len(corpus) * 1000:.3f} ms/report")
+
+
+if __name__ == "__main__":
+    main()
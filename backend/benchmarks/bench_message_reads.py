@@ -0,0 +1,116 @@
+"""
+Conversation read-size benchmark
+Bytes read per chat turn with the old whole-document load versus the
+windowed layout ($slice projection of the last N messages)
+
+Run from the backend directory:
+    python -m benchmarks.bench_message_reads
+    python -m benchmarks.bench_message_reads --mongo   # also time real reads (uses MONGODB_URL/DB_NAME)
+"""
+import argparse
+import asyncio
+import os
+import random
+import string
+import sys
+import time
+from datetime import datetime
+
+import bson
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.message_store import MESSAGE_WINDOW
+
+CONTEXT_MESSAGES = 10
+LENGTHS = (10, 50, 200, 1000, 5000)
+
+
+def make_messages(count: int):
+    random.seed(count)
+    messages = []
+    for i in range(count):
+        role = "user" if i % 2 == 0 else "assistant"
+        size = random.randint(40, 120) if role == "user" else random.randint(250, 700)
+        content = "".join(random.choices(string.ascii_lowercase + "      ", k=size))
+        messages.append({"role": role, "content": content, "timestamp": datetime.utcnow()})
+    return messages
+
+
+def make_document(messages, windowed: bool):
+    doc = {
+        "_id": bson.ObjectId(),
+        "user_id": "benchmark-user",
+        "profile_id": None,
+        "language": "English",
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow(),
+    }
+    if windowed:
+        doc["messages"] = messages[-MESSAGE_WINDOW:]
+        doc["message_count"] = len(messages)
+    else:
+        doc["messages"] = messages
+    return doc
+
+
+def projected(doc, count: int):
+    return {**doc, "messages": doc["messages"][-count:]}
+
+
+def report_sizes():
+    print(f"Per-turn read size (context = last {CONTEXT_MESSAGES} messages, window = {MESSAGE_WINDOW})\n")
+    print(f"{'messages':>9} {'legacy read':>12} {'windowed read':>14} {'windowed doc':>13}")
+    for length in LENGTHS:
+        messages = make_messages(length)
+        legacy = make_document(messages, windowed=False)
+        windowed = make_document(messages, windowed=True)
+        print(f"{length:>9} {len(bson.encode(legacy)):>12,} "
+              f"{len(bson.encode(projected(windowed, CONTEXT_MESSAGES))):>14,} {len(bson.encode(windowed)):>13,}")
+
+
+async def time_mongo_reads(rounds: int = 50):
+    from database import db
+    from services.message_store import MessageStore
+
+    await db.connect()
+    database = db.get_db()
+    if database is None:
+        print("Database not connected")
+        return
+
+    legacy_collection = database["bench_conversations_legacy"]
+    store = MessageStore("bench_conversations_windowed")
+    print(f"\nRead latency over {rounds} rounds\n")
+    print(f"{'messages':>9} {'legacy ms':>10} {'windowed ms':>12}")
+    try:
+        for length in LENGTHS:
+            messages = make_messages(length)
+            legacy = make_document(messages, windowed=False)
+            windowed = make_document(messages, windowed=True)
+            await legacy_collection.insert_one(legacy)
+            await database[store.collection_name].insert_one(windowed)
+
+            start = time.perf_counter()
+            for _ in range(rounds):
+                await legacy_collection.find_one({"_id": legacy["_id"]})
+            legacy_ms = (time.perf_counter() - start) / rounds * 1000
+
+            start = time.perf_counter()
+            for _ in range(rounds):
+                await store.find_recent(database, {"_id": windowed["_id"]}, CONTEXT_MESSAGES)
+            windowed_ms = (time.perf_counter() - start) / rounds * 1000
+            print(f"{length:>9} {legacy_ms:>10.2f} {windowed_ms:>12.2f}")
+    finally:
+        await legacy_collection.drop()
+        await database[store.collection_name].drop()
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Conversation read-size benchmark")
+    parser.add_argument("--mongo", action="store_true", help="Also time reads against MongoDB")
+    args = parser.parse_args()
+    report_sizes()
+    if args.mongo:
+        asyncio.run(time_mongo_reads())
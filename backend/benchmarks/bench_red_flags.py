@@ -0,0 +1,134 @@
+"""
+Red-flag detector microbenchmark
+Compares the compiled detector with the previous per-keyword substring scan,
+after checking regression cases the substring scan used to catch
+
+Run from the backend directory:
+    python -m benchmarks.bench_red_flags
+"""
+import json
+import os
+import random
+import string
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.red_flags import RedFlagDetector, red_flag_detector
+
+# Keyword tables of the two former DoctorAgent.detect_red_flags definitions
+LEGACY_KEYWORDS = {
+    "chest pain": "Potential Heart Attack",
+    "shortness of breath": "Respiratory Distress",
+    "difficulty breathing": "Respiratory Distress",
+    "unconscious": "Loss of Consciousness",
+    "fainted": "Loss of Consciousness",
+    "severe bleeding": "Hemorrhage",
+    "vomiting blood": "Internal Bleeding",
+    "slurred speech": "Potential Stroke",
+    "sudden severe headache": "Potential Stroke/Aneurysm",
+    "suicidal": "Psychiatric Emergency",
+}
+LEGACY_GROUPS = [
+    (["chest pain", "heart attack", "crushing"], "Possible Cardiac Event"),
+    (["stroke", "slurred speech", "numbness one side"], "Possible Stroke Signs"),
+    (["suicide", "kill myself", "want to die"], "Self-Harm Risk"),
+    (["trouble breathing", "can't breathe", "shortness of breath", "gasping"], "Respiratory Distress"),
+]
+
+
+def legacy_detect(text: str):
+    text_lower = text.lower()
+    flags = [label for keys, label in LEGACY_GROUPS if any(k in text_lower for k in keys)]
+    flags += [label for key, label in LEGACY_KEYWORDS.items() if key in text_lower]
+    return list(set(flags))
+
+
+MESSAGES = [
+    "I have had a mild headache and a runny nose since yesterday.",
+    "No chest pain, but I feel tired and a bit dizzy after lunch.",
+    "My father has chest pain spreading to his arm and he is sweating a lot.",
+    "I've been coughing for two weeks and sometimes I am short of breath when climbing stairs.",
+    "আমার দুই দিন ধরে জ্বর এবং মাথা ব্যথা হচ্ছে।",
+    "আমার বুকে ব্যথা হচ্ছে এবং শ্বাস নিতে কষ্ট হচ্ছে।",
+    "My fever is 104 degrees and I cannot keep water down.",
+    "I feel sad lately and sometimes I think I want to die.",
+]
+
+
+# (message, labels the detector must report); the detector must never be weaker than legacy_detect
+REGRESSION_CASES = [
+    ("I keep getting chest pains", {"Possible Cardiac Event"}),
+    ("I have a 104 fever", {"High Fever"}),
+    ("I never had chest pain before until today", {"Possible Cardiac Event"}),
+    ("My temperature is high and I feel weak", {"High Fever"}),
+    ("I didn't have chest pain yesterday, but now it hurts", {"Possible Cardiac Event"}),
+    ("He had two strokes last year", {"Possible Stroke Signs"}),
+    ("No chest pain, but I feel tired and a bit dizzy after lunch.", set()),
+    ("I have no fever and no chest pain", set()),
+]
+
+
+def check_regressions() -> int:
+    """Print and count regression cases the detector gets wrong"""
+    failures = 0
+    for text, expected in REGRESSION_CASES:
+        labels = set(red_flag_detector.detect(text))
+        if labels != expected:
+            failures += 1
+            print(f"REGRESSION: {text!r} -> {sorted(labels)}, expected {sorted(expected)}")
+    print(f"{len(REGRESSION_CASES) - failures}/{len(REGRESSION_CASES)} regression cases pass\n")
+    return failures
+
+
+def table_substring_detect(text: str):
+    """Legacy approach applied to the full keyword table (no boundaries, no negation)"""
+    text_lower = text.lower()
+    return list({entry["label"] for phrase, entry in red_flag_detector.phrases.items() if phrase in text_lower})
+
+
+def main(iterations: int = 20000):
+    if check_regressions():
+        sys.exit(1)
+
+    random.seed(7)
+    corpus = [random.choice(MESSAGES) * random.randint(1, 4) for _ in range(1000)]
+    print(f"{len(corpus)} messages, {sum(map(len, corpus)) / len(corpus):.0f} chars on average, "
+          f"{red_flag_detector.phrase_count} phrases in the table\n")
+
+    benchmarks = (
+        ("legacy keyword scan", legacy_detect),
+        ("substring scan, full table", table_substring_detect),
+        ("compiled detector", red_flag_detector.detect),
+    )
+    for name, fn in benchmarks:
+        runs = iterations // len(corpus)
+        seconds = timeit.timeit(lambda: [fn(text) for text in corpus], number=runs)
+        print(f"{name:>28}: {seconds / (runs * len(corpus)) * 1e6:7.2f} us/message")
+
+    # Cost as the keyword table grows (synthetic phrases that never match)
+    print()
+    for size in (100, 1000, 5000):
+        words = ["".join(random.choices(string.ascii_lowercase, k=random.randint(4, 9))) for _ in range(size * 2)]
+        table = {"flags": [{"label": "Synthetic", "severity": "urgent",
+                            "phrases": {"en": [f"{words[2 * i]} {words[2 * i + 1]}" for i in range(size)]}}]}
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+            json.dump(table, f)
+        detector = RedFlagDetector(f.name)
+        os.unlink(f.name)
+
+        phrases = list(detector.phrases)
+        substring = timeit.timeit(lambda: [[p for p in phrases if p in lowered] for lowered in map(str.lower, corpus)], number=1)
+        compiled = timeit.timeit(lambda: [detector.detect(text) for text in corpus], number=1)
+        print(f"{size:>5} phrases: substring scan {substring / len(corpus) * 1e6:8.2f} us/message, "
+              f"compiled {compiled / len(corpus) * 1e6:6.2f} us/message")
+
+    print()
+    for text in MESSAGES:
+        print(f"{red_flag_detector.detect(text)!s:<60} {text[:60]}")
+
+
+if __name__ == "__main__":
+    main()
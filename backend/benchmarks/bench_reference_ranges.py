@@ -0,0 +1,97 @@
+"""
+Reference-range engine benchmark
+Compares the indexed/NumPy engine with the previous per-entry substring scan
+for panels of 10 to 10,000 lab entries
+
+Run from the backend directory:
+    python -m benchmarks.bench_reference_ranges
+"""
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reference_data import REFERENCE_RANGES, TEST_ALIASES, reference_engine
+
+
+def legacy_get_reference_range(test_name, gender="male", age=30):
+    """Former get_reference_range: first key that is a substring either way"""
+    test_key = None
+    for key in REFERENCE_RANGES.keys():
+        if key.lower() in test_name.lower() or test_name.lower() in key.lower():
+            test_key = key
+            break
+    if not test_key:
+        return None
+    ranges = REFERENCE_RANGES[test_key]
+    gender = gender.lower()
+    if gender in ranges:
+        return ranges[gender]
+    elif "all" in ranges:
+        return ranges["all"]
+    elif gender == "female" and "male" in ranges:
+        return ranges["male"]
+    elif gender == "male" and "female" in ranges:
+        return ranges["female"]
+    return None
+
+
+def legacy_flag_panel(labs, gender="male"):
+    """Former interpret_labs pre-processing loop"""
+    for lab in labs:
+        value = lab.get("value")
+        if isinstance(value, str):
+            match = re.search(r"[-+]?\d*\.\d+|\d+", value)
+            val_float = float(match.group()) if match else None
+        else:
+            val_float = float(value)
+        if val_float is not None:
+            ref = legacy_get_reference_range(lab.get("name", ""), gender)
+            if ref:
+                lab["reference_range_stored"] = f"{ref['min']} - {ref['max']} {ref['unit']}"
+                if val_float < ref["min"]:
+                    lab["flag_calculated"] = "Low"
+                elif val_float > ref["max"]:
+                    lab["flag_calculated"] = "High"
+                else:
+                    lab["flag_calculated"] = "Normal"
+    return labs
+
+
+def make_panel(size: int, rng: random.Random):
+    names = [name for key in REFERENCE_RANGES for name in [key] + TEST_ALIASES.get(key, [])] + ["MCV", "Ferritin"]
+    panel = []
+    for _ in range(size):
+        key = rng.choice(list(REFERENCE_RANGES))
+        band = next(iter(REFERENCE_RANGES[key].values()))
+        value = round(rng.uniform(band["min"] * 0.5, (band["max"] or 10) * 1.5), 2)
+        panel.append({"name": rng.choice(names), "value": value if rng.random() < 0.7 else str(value), "unit": band["unit"]})
+    return panel
+
+
+def main():
+    rng = random.Random(7)
+    print("Lookup correctness (legacy -> engine):")
+    for name in ("Hemoglobin", "Hemoglobin A1c", "HbA1c", "HGB", "SGPT", "Cholesterol", "HDL", "K"):
+        legacy = next((k for k in REFERENCE_RANGES if k.lower() in name.lower() or name.lower() in k.lower()), None)
+        print(f"  {name:<15} {str(legacy):<35} {reference_engine.resolve_test(name)}")
+
+    print()
+    for size in (10, 100, 1000, 10000):
+        panel = make_panel(size, rng)
+        runs = max(1, 20000 // size)
+        legacy = timeit.timeit(lambda: legacy_flag_panel([dict(lab) for lab in panel]), number=runs) / runs
+        engine = timeit.timeit(lambda: reference_engine.flag_panel([dict(lab) for lab in panel], "female", 45), number=runs) / runs
+        names = [lab["name"] for lab in panel]
+        values = [float(lab["value"]) for lab in panel]
+        units = [lab["unit"] for lab in panel]
+        batch = timeit.timeit(lambda: reference_engine.flag_batch(names, values, units, "female", 45), number=runs) / runs
+        print(f"{size:>6} entries: legacy {legacy * 1000:9.3f} ms, flag_panel {engine * 1000:8.3f} ms, "
+              f"flag_batch (arrays) {batch * 1000:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
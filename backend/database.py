@@ -1,5 +1,9 @@
+import asyncio
 import os
+import threading
+import time
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
 import certifi
 from dotenv import load_dotenv
 
@@ -8,30 +12,241 @@ load_dotenv()
 MONGODB_URL = os.getenv("MONGODB_URL")
 DB_NAME = os.getenv("DB_NAME")
 
+# Connection pool
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "5"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "10000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+# Wire compression, in order of preference (only those with an installed library are used)
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "zstd,snappy,zlib")
+
+# Reconnect / health check
+MONGO_RECONNECT_MAX_DELAY = float(os.getenv("MONGO_RECONNECT_MAX_DELAY", "60"))
+MONGO_HEALTH_INTERVAL = float(os.getenv("MONGO_HEALTH_INTERVAL", "30"))
+# Consecutive failed pings before a connected database is reported not ready
+MONGO_UNHEALTHY_AFTER = max(1, int(os.getenv("MONGO_UNHEALTHY_AFTER", "3")))
+
+
+def available_compressors(names: str) -> list:
+    """Compressors from a comma-separated list whose Python library is installed"""
+    modules = {"zstd": "zstandard", "snappy": "snappy", "zlib": "zlib"}
+    available = []
+    for name in (n.strip().lower() for n in names.split(",")):
+        if name not in modules:
+            continue
+        try:
+            __import__(modules[name])
+            available.append(name)
+        except ImportError:
+            print(f"[DB] Compressor {name} not installed, skipping")
+    return available
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Connection pool utilization from pymongo pool events (called from driver threads)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.open_connections = 0
+        self.checked_out = 0
+        self.max_checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.pools_cleared = 0
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self.lock:
+            self.pools_cleared += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self.lock:
+            self.open_connections += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self.lock:
+            self.open_connections = max(0, self.open_connections - 1)
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        with self.lock:
+            self.checkout_failures += 1
+
+    def connection_checked_out(self, event):
+        # duration: seconds spent waiting for the connection (wait queue + connect)
+        wait_ms = getattr(event, "duration", 0.0) * 1000
+        with self.lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.max_checked_out = max(self.max_checked_out, self.checked_out)
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+
+    def connection_checked_in(self, event):
+        with self.lock:
+            self.checked_out = max(0, self.checked_out - 1)
+
+    def get_stats(self) -> dict:
+        """Get pool utilization statistics"""
+        with self.lock:
+            return {
+                "max_pool_size": MONGO_MAX_POOL_SIZE,
+                "min_pool_size": MONGO_MIN_POOL_SIZE,
+                "open_connections": self.open_connections,
+                "checked_out": self.checked_out,
+                "max_checked_out": self.max_checked_out,
+                "utilization": round(self.checked_out / MONGO_MAX_POOL_SIZE * 100, 2) if MONGO_MAX_POOL_SIZE > 0 else 0,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "avg_wait_ms": round(self.total_wait_ms / self.checkouts, 3) if self.checkouts > 0 else 0,
+                "max_wait_ms": round(self.max_wait_ms, 3),
+                "pools_cleared": self.pools_cleared
+            }
+
+
 class Database:
     client: AsyncIOMotorClient = None
 
-    async def connect(self):
+    def __init__(self):
+        self.ready = False
+        self.metrics = PoolMetrics()
+        self.monitor_task = None
+        self.on_ready = None
+        self.last_error = None
+        self.last_ping_ms = None
+        self.consecutive_failures = 0
+
+    async def connect(self, on_ready=None):
+        """
+        Create the client and start the background health monitor
+
+        Args:
+            on_ready: Optional async callback(database), run every time the
+                database becomes reachable (startup or after an outage)
+        """
         if not MONGODB_URL:
             print("MONGODB_URL not found in environment variables")
             return
-        
-        self.client = AsyncIOMotorClient(MONGODB_URL, tlsCAFile=certifi.where())
+
+        self.on_ready = on_ready
+        compressors = available_compressors(MONGO_COMPRESSORS)
+        self.client = AsyncIOMotorClient(
+            MONGODB_URL,
+            tlsCAFile=certifi.where(),
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+            waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            compressors=compressors,
+            event_listeners=[self.metrics]
+        )
+        if await self.ping():
+            print(f"Connected to MongoDB (compressors: {', '.join(compressors) or 'none'})")
+            # Startup hook errors propagate (e.g. DB_VERIFY_INDEXES=strict aborts startup)
+            if self.on_ready is not None:
+                await self.on_ready(self.get_db())
+        # The client reconnects by itself; the monitor only tracks readiness
+        self.monitor_task = asyncio.create_task(self._monitor())
+
+    async def ping(self) -> bool:
+        """
+        Ping the server and update readiness
+
+        A connected database is only reported not ready after
+        MONGO_UNHEALTHY_AFTER consecutive failures, so one slow or dropped
+        ping does not make get_db() return None for every request.
+
+        Returns:
+            True if this ping succeeded
+        """
+        if not self.client:
+            return False
+        start = time.perf_counter()
         try:
             await self.client.admin.command('ping')
-            print("Connected to MongoDB")
+            self.last_ping_ms = round((time.perf_counter() - start) * 1000, 2)
+            self.last_error = None
+            self.consecutive_failures = 0
+            self.ready = True
+            return True
+        except Exception as e:
+            self.consecutive_failures += 1
+            if self.ready and self.consecutive_failures >= MONGO_UNHEALTHY_AFTER:
+                print(f"[DB] Lost connection to MongoDB after {self.consecutive_failures} failed pings: {e}")
+                self.ready = False
+            elif self.ready:
+                print(f"[DB] Ping failed ({self.consecutive_failures}/{MONGO_UNHEALTHY_AFTER}): {e}")
+            elif self.last_error is None:
+                print(f"Failed to connect to MongoDB: {e}")
+            self.last_error = str(e)
+            return False
+
+    async def _run_on_ready(self):
+        if self.on_ready is None:
+            return
+        try:
+            await self.on_ready(self.get_db())
         except Exception as e:
-            print(f"Failed to connect to MongoDB: {e}")
-            self.client = None
+            print(f"[DB] Reconnect hook failed: {e}")
+
+    async def _monitor(self):
+        """Retry with exponential backoff while down, ping periodically while up"""
+        delay = 1.0
+        while True:
+            if self.ready:
+                # Re-check quickly after a failed ping instead of waiting a full interval
+                await asyncio.sleep(min(delay, MONGO_HEALTH_INTERVAL) if self.consecutive_failures else MONGO_HEALTH_INTERVAL)
+                if await self.ping():
+                    delay = 1.0
+                elif self.ready:
+                    delay = min(delay * 2, MONGO_RECONNECT_MAX_DELAY)
+                continue
+            await asyncio.sleep(delay)
+            if await self.ping():
+                print("[DB] Reconnected to MongoDB")
+                await self._run_on_ready()
+            else:
+                delay = min(delay * 2, MONGO_RECONNECT_MAX_DELAY)
 
     def close(self):
+        if self.monitor_task:
+            self.monitor_task.cancel()
+            self.monitor_task = None
         if self.client:
             self.client.close()
+            self.ready = False
             print("Disconnected from MongoDB")
 
     def get_db(self):
-        if self.client:
+        if self.client and self.ready:
             return self.client[DB_NAME]
         return None
 
+    def get_stats(self) -> dict:
+        """Get readiness and pool statistics"""
+        return {
+            "ready": self.ready,
+            "last_ping_ms": self.last_ping_ms,
+            "last_error": self.last_error,
+            "consecutive_failures": self.consecutive_failures,
+            "pool": self.metrics.get_stats()
+        }
+
 db = Database()
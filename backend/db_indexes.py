@@ -0,0 +1,224 @@
+"""
+MongoDB Index Registry
+Indexes behind every hot query, applied idempotently at startup
+
+Each registered query shape mirrors a query in main.py (or services/). With
+DB_VERIFY_INDEXES=warn|strict the startup also runs explain() on every shape
+and reports any that would fall back to a collection scan; strict aborts
+startup instead of only logging.
+
+Run from the backend directory for a one-off report:
+    python db_indexes.py
+"""
+import asyncio
+import os
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+from services.health_score import SCORES_COLLECTION
+from services.lab_trends import SERIES_COLLECTION
+from services.message_store import SEGMENTS_COLLECTION
+
+DB_VERIFY_INDEXES = (os.getenv("DB_VERIFY_INDEXES") or "off").lower()
+
+
+class QueryShape(NamedTuple):
+    collection: str
+    filter: Dict[str, Any]
+    sort: Optional[List[Tuple[str, int]]] = None
+    description: str = ""
+
+
+# collection -> indexes (create_indexes is a no-op for indexes that already exist)
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("uid", ASCENDING)], name="uid_1"),
+    ],
+    "health_profiles": [
+        IndexModel([("user_id", ASCENDING)], name="user_id_1"),
+    ],
+    "patient_profiles": [
+        IndexModel([("owner_id", ASCENDING), ("relation", ASCENDING)], name="owner_id_1_relation_1"),
+    ],
+    "daily_logs": [
+        # Per-profile reads and upserts; also serves the plain user_id filter
+        IndexModel([("user_id", ASCENDING), ("profile_id", ASCENDING), ("date", DESCENDING)],
+                   name="user_id_1_profile_id_1_date_-1"),
+        # Sorted reads across all profiles of a user (no in-memory sort)
+        IndexModel([("user_id", ASCENDING), ("date", DESCENDING)], name="user_id_1_date_-1"),
+    ],
+    "labs": [
+        IndexModel([("visit_id", ASCENDING)], name="visit_id_1"),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_id_1_created_at_-1"),
+    ],
+    SERIES_COLLECTION: [
+        # One series per profile and analyte (services/lab_trends.py); also serves the per-profile listing
+        IndexModel([("user_id", ASCENDING), ("profile_id", ASCENDING), ("analyte", ASCENDING)],
+                   name="user_id_1_profile_id_1_analyte_1", unique=True),
+    ],
+    SCORES_COLLECTION: [
+        # One score rollup per profile (services/health_score.py)
+        IndexModel([("user_id", ASCENDING), ("profile_id", ASCENDING)], name="user_id_1_profile_id_1", unique=True),
+    ],
+    "visits": [
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_id_1_created_at_-1"),
+    ],
+    "conversations": [
+        IndexModel([("user_id", ASCENDING), ("profile_id", ASCENDING)], name="user_id_1_profile_id_1"),
+    ],
+    "chat_history": [
+        IndexModel([("user_id", ASCENDING), ("profile_id", ASCENDING), ("timestamp", ASCENDING)],
+                   name="user_id_1_profile_id_1_timestamp_1"),
+    ],
+    SEGMENTS_COLLECTION: [
+        # History reads in _id order and segment appends (services/message_store.py;
+        # a parent has few segments, so the open-segment lookup scans only those)
+        IndexModel([("collection", ASCENDING), ("parent_id", ASCENDING), ("_id", ASCENDING)],
+                   name="collection_1_parent_id_1__id_1"),
+    ],
+}
+
+# collection -> index names replaced by the registry above (dropped at startup)
+RETIRED_INDEXES: Dict[str, List[str]] = {
+    # Series were per user before profile_id was part of the key
+    SERIES_COLLECTION: ["user_id_1_analyte_1"],
+    # Did not cover the _id sort of history reads
+    SEGMENTS_COLLECTION: ["collection_1_parent_id_1_count_1"],
+}
+
+# Query shapes checked with explain() (placeholder values; only the plan matters)
+QUERY_SHAPES: List[QueryShape] = [
+    QueryShape("users", {"uid": "uid"}, description="get/update user"),
+    QueryShape("health_profiles", {"user_id": "uid"}, description="health profile"),
+    QueryShape("patient_profiles", {"owner_id": "uid"}, description="list profiles"),
+    QueryShape("patient_profiles", {"owner_id": "uid", "relation": "Self"}, description="self profile"),
+    QueryShape("daily_logs", {"user_id": "uid", "date": "2024-01-01"}, description="log upsert"),
+    QueryShape("daily_logs", {"user_id": "uid", "profile_id": "pid", "date": "2024-01-01"}, description="profile log upsert"),
+    QueryShape("daily_logs", {"user_id": "uid"}, [("date", ASCENDING)], "tracking logs"),
+    QueryShape("daily_logs", {"user_id": "uid", "profile_id": "pid"}, [("date", DESCENDING)], "score rollup rebuild"),
+    QueryShape(SCORES_COLLECTION, {"user_id": "uid", "profile_id": "pid"}, description="tracking score"),
+    QueryShape("labs", {"visit_id": "vid"}, description="visit labs"),
+    QueryShape("labs", {"user_id": "uid"}, [("created_at", DESCENDING)], "user labs"),
+    QueryShape(SERIES_COLLECTION, {"user_id": "uid", "profile_id": "pid", "analyte": "Hemoglobin"},
+               description="lab trend"),
+    QueryShape(SERIES_COLLECTION, {"user_id": "uid", "profile_id": "pid"}, [("analyte", ASCENDING)], "lab trend list"),
+    QueryShape("visits", {"user_id": "uid"}, [("created_at", DESCENDING)], "visit history"),
+    QueryShape("conversations", {"user_id": "uid"}, description="reset conversations"),
+    QueryShape("conversations", {"user_id": "uid", "profile_id": "pid"}, description="voice chat context"),
+    QueryShape("chat_history", {"user_id": "uid", "profile_id": "pid"}, [("timestamp", ASCENDING)], "chat history"),
+    QueryShape(SEGMENTS_COLLECTION, {"collection": "conversations", "parent_id": "id"}, [("_id", DESCENDING)],
+               "message history"),
+    QueryShape(SEGMENTS_COLLECTION, {"collection": "conversations", "parent_id": "id", "count": {"$lt": 100}},
+               description="segment append"),
+]
+
+
+async def ensure_indexes(database) -> int:
+    """
+    Drop retired indexes and create all registered indexes (idempotent)
+
+    Args:
+        database: Motor database
+
+    Returns:
+        Number of collections whose indexes could not be dropped or created
+    """
+    failed = 0
+    for collection, names in RETIRED_INDEXES.items():
+        try:
+            existing = await database[collection].index_information()
+            for name in names:
+                if name in existing:
+                    await database[collection].drop_index(name)
+                    print(f"[DB-INDEXES] Dropped retired index {collection}.{name}")
+        except Exception as e:
+            failed += 1
+            print(f"[DB-INDEXES] Could not drop retired indexes on {collection}: {e}")
+    for collection, indexes in INDEXES.items():
+        try:
+            await database[collection].create_indexes(indexes)
+        except Exception as e:
+            # An existing index with the same keys but other options, for example
+            failed += 1
+            print(f"[DB-INDEXES] Could not create indexes on {collection}: {e}")
+    print(f"[DB-INDEXES] Ensured {sum(len(i) for i in INDEXES.values())} indexes on {len(INDEXES)} collections")
+    return failed
+
+
+def _plan_stages(plan: Dict[str, Any]) -> List[str]:
+    """All stage names in an explain() plan tree"""
+    stages = [plan.get("stage", "")]
+    for child in ("inputStage", "queryPlan"):
+        if isinstance(plan.get(child), dict):
+            stages += _plan_stages(plan[child])
+    for child in plan.get("inputStages", []):
+        stages += _plan_stages(child)
+    return stages
+
+
+async def explain_shape(database, shape: QueryShape) -> List[str]:
+    """
+    Winning plan stages of a query shape
+
+    Args:
+        database: Motor database
+        shape: Registered query shape
+
+    Returns:
+        Stage names (e.g. ["FETCH", "IXSCAN"])
+    """
+    cursor = database[shape.collection].find(shape.filter)
+    if shape.sort:
+        cursor = cursor.sort(shape.sort)
+    explain = await cursor.explain()
+    return _plan_stages(explain.get("queryPlanner", {}).get("winningPlan", {}))
+
+
+async def verify_query_plans(database, mode: str = DB_VERIFY_INDEXES) -> List[Dict[str, Any]]:
+    """
+    Check that no registered query shape needs a collection scan
+
+    Args:
+        database: Motor database
+        mode: "off", "warn" (log problems) or "strict" (raise on problems)
+
+    Returns:
+        One report entry per shape ({collection, description, stages, ok})
+    """
+    if mode not in ("warn", "strict"):
+        return []
+
+    report = []
+    for shape in QUERY_SHAPES:
+        try:
+            stages = await explain_shape(database, shape)
+            ok = "COLLSCAN" not in stages and "SORT" not in stages
+        except Exception as e:
+            stages = [f"error: {e}"]
+            ok = False
+        report.append({"collection": shape.collection, "description": shape.description, "stages": stages, "ok": ok})
+        if not ok:
+            print(f"[DB-INDEXES] {shape.collection} ({shape.description}) is not index-backed: {' > '.join(stages)}")
+
+    problems = [entry for entry in report if not entry["ok"]]
+    print(f"[DB-INDEXES] Verified {len(report)} query shapes, {len(problems)} problem(s)")
+    if problems and mode == "strict":
+        raise RuntimeError(f"{len(problems)} query shape(s) are not index-backed (DB_VERIFY_INDEXES=strict)")
+    return report
+
+
+if __name__ == "__main__":
+    from database import db
+
+    async def main():
+        await db.connect()
+        database = db.get_db()
+        if database is None:
+            print("[DB-INDEXES] Database not connected")
+            return
+        await ensure_indexes(database)
+        await verify_query_plans(database, "warn")
+        db.close()
+
+    asyncio.run(main())
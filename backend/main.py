@@ -1,8 +1,10 @@
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 from database import db
+from db_indexes import ensure_indexes, verify_query_plans
 from ai_agent import agent, SymptomAnalysisRequest
 from models import User, UserUpdate, HealthProfile, VisitDraft, LabResult, HealthPlan, DailyLog, VoiceChatRequest, Conversation, ChatMessage, HealthPlanRequest
 from bson import ObjectId
@@ -12,11 +14,23 @@ from pydantic import BaseModel
 from typing import List, Optional
 from fastapi.responses import StreamingResponse, Response
 
+async def prepare_database(database):
+    """Create registered indexes and check query plans"""
+    await ensure_indexes(database)
+    await verify_query_plans(database)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    await db.connect()
+    # Indexes are (re)applied whenever the database becomes reachable
+    await db.connect(on_ready=prepare_database)
+    await warm_tts_cache()
+    phrase_bank_task = asyncio.create_task(render_phrase_bank())
+    symptom_index_task = asyncio.create_task(build_symptom_index())
     yield
+    phrase_bank_task.cancel()
+    symptom_index_task.cancel()
+    lab_ingest.shutdown()
     # Shutdown
     db.close()
 
@@ -50,6 +64,20 @@ async def health_check():
         return {"status": "ok", "database": "connected"}
     return {"status": "error", "database": "disconnected"}
 
+@app.get("/health/live")
+async def health_live():
+    """Liveness: the process is up and serving (does not depend on the database)"""
+    return {"status": "ok"}
+
+@app.get("/health/ready")
+async def health_ready(response: Response):
+    """Readiness: the database is reachable; 503 while it is down or reconnecting"""
+    stats = db.get_stats()
+    if not stats["ready"]:
+        response.status_code = 503
+        return {"status": "unavailable", "database": stats}
+    return {"status": "ok", "database": stats}
+
 @app.post("/api/users/sync")
 async def sync_user(user: User):
     database = db.get_db()
@@ -302,11 +330,38 @@ async def extract_symptoms(request: SymptomExtractionRequest):
         return {"error": str(e)}
 
 from models import RefinementRequest
+from services.symptom_index import symptom_index
+
+SYMPTOM_INDEX_ENABLED = os.getenv("SYMPTOM_INDEX_ENABLED", "true").lower() == "true"
+
+
+async def build_symptom_index():
+    """Build the related-symptom index from completed visits (background)"""
+    database = db.get_db()
+    if not SYMPTOM_INDEX_ENABLED or database is None:
+        return
+    try:
+        await symptom_index.build(database)
+    except Exception as e:
+        print(f"[SYMPTOM-INDEX] Build failed: {e}")
+
+
+async def suggest_refinements(symptoms: List, language: str = "English"):
+    """
+    Related symptoms from the local index, falling back to the LLM
+    Returns the suggest_refinements result (dict or JSON string)
+    """
+    if SYMPTOM_INDEX_ENABLED:
+        related = symptom_index.related(symptoms, language)
+        if related is not None:
+            return {"groups": [{"name": "Related Symptoms", "symptoms": related}]}
+    return await agent.suggest_refinements(symptoms, language)
+
 
 @app.post("/api/ai/refine-symptoms")
 async def refine_symptoms(request: RefinementRequest):
     try:
-        result_data = await agent.suggest_refinements(request.symptoms, request.language)
+        result_data = await suggest_refinements(request.symptoms, request.language)
         if isinstance(result_data, str):
             try:
                 result = json.loads(result_data)
@@ -403,6 +458,10 @@ async def predict_conditions(request: PredictionRequest):
                     {"_id": ObjectId(request.visit_id)},
                     {"$set": update_data}
                 )
+                
+                # Completed visit feeds the related-symptom index
+                if SYMPTOM_INDEX_ENABLED:
+                    symptom_index.add_visit(request.visit_id, request.symptoms, request.refinements)
         
         return result
     except Exception as e:
@@ -521,7 +580,14 @@ async def save_lab_results(result: LabResult):
     labs_collection = database["labs"]
     
     lab_dict = result.dict()
+    # Store the canonical value/unit next to the original
+    unit_registry.canonicalize_entries(lab_dict["entries"])
     res = await labs_collection.insert_one(lab_dict)
+    try:
+        await lab_trends.add_lab(database, lab_dict)
+    except Exception as e:
+        # The lab itself is stored; the series can be rebuilt with migrations.build_lab_series
+        print(f"[LAB-TRENDS] Could not update series for lab {res.inserted_id}: {e}")
     
     return {"status": "created", "lab_id": str(res.inserted_id)}
 
@@ -541,6 +607,8 @@ async def get_visit_labs(visit_id: str):
     return labs
 
 from services.google_fit import fetch_google_fit_data
+from services.health_score import calculate_daily_score, health_scores
+from pymongo import ReturnDocument
 
 class GoogleFitSyncRequest(BaseModel):
     access_token: str
@@ -559,15 +627,20 @@ async def sync_google_fit(request: GoogleFitSyncRequest):
         today = datetime.utcnow().strftime("%Y-%m-%d")
         
         # Update or Insert
-        await logs_collection.update_one(
+        log = await logs_collection.find_one_and_update(
             {"user_id": request.user_id, "date": today},
             {"$set": {
                 "steps": data.get("steps"),
                 "heart_rate_avg": data.get("heart_rate_avg"),
                 "updated_at": datetime.utcnow()
             }},
-            upsert=True
+            upsert=True,
+            return_document=ReturnDocument.AFTER
         )
+        try:
+            await health_scores.record(database, log)
+        except Exception as e:
+            print(f"[HEALTH-SCORE] Could not score synced log for {request.user_id}: {e}")
         
     return {"status": "success", "data": data}
 
@@ -589,9 +662,12 @@ async def get_lab_by_id(lab_id: str):
         return {"status": "invalid_id"}
 
 from fastapi import UploadFile, File
-import pytesseract
-from PIL import Image
 import io
+from services.lab_ingest import lab_ingest
+from services.lab_parser import lab_parser
+from services.lab_units import unit_registry
+from services.lab_interpreter import lab_interpreter
+from services.lab_trends import lab_trends, DEFAULT_TREND_POINTS
 
 @app.post("/api/labs/upload")
 async def upload_lab_report(file: UploadFile = File(...)):
@@ -609,22 +685,41 @@ async def upload_lab_report(file: UploadFile = File(...)):
             result_json_str = await agent.extract_lab_values(contents, mime_type=file.content_type or "image/jpeg")
         
         result = json.loads(result_json_str)
+        if isinstance(result, dict) and isinstance(result.get("entries"), list):
+            unit_registry.canonicalize_entries(result["entries"])
         
         return result
     except Exception as e:
         return {"error": str(e)}
 
+@app.get("/api/labs/ingest-stats")
+async def lab_ingest_stats():
+    """Get lab report ingestion (process pool) and local parser statistics"""
+    stats = lab_ingest.get_stats()
+    stats["parser"] = lab_parser.get_stats()
+    stats["units"] = unit_registry.get_stats()
+    stats["interpreter"] = lab_interpreter.get_stats()
+    return stats
+
 from models import LabInterpretationRequest
 
 @app.post("/api/ai/interpret-labs")
 async def interpret_labs(request: LabInterpretationRequest):
     try:
-        result_json_str = await agent.interpret_labs(request.lab_results, request.profile_summary, request.language)
+        result_json_str = await agent.interpret_labs(request.lab_results, request.profile_summary, request.language, request.narrative)
         result = json.loads(result_json_str)
         return result
     except Exception as e:
         return {"error": str(e)}
 
+@app.get("/api/ai/interpret-labs/narrative/{narrative_id}")
+async def get_lab_narrative(narrative_id: str):
+    """Poll a narrative requested with narrative="async" (status: pending, ready or failed)"""
+    job = lab_interpreter.get_narrative(narrative_id)
+    if job is None:
+        return {"error": "Narrative not found"}
+    return {"narrative_id": narrative_id, "status": job["status"], "narrative": job["narrative"]}
+
 
 
 
@@ -643,14 +738,25 @@ async def save_daily_log(log: DailyLog):
         
     existing = await logs_collection.find_one(query)
     if existing:
+        log_dict = log.dict(exclude={"created_at"})
+        # Score once at write time, from the log as it will be stored
+        log_dict["score"] = calculate_daily_score({**existing, **log_dict})
         await logs_collection.update_one(
             {"_id": existing["_id"]},
-            {"$set": log.dict(exclude={"created_at"})}
+            {"$set": log_dict}
         )
-        return {"status": "updated"}
+        status = "updated"
+    else:
+        log_dict = log.dict()
+        log_dict["score"] = calculate_daily_score(log_dict)
+        await logs_collection.insert_one(log_dict)
+        status = "created"
     
-    await logs_collection.insert_one(log.dict())
-    return {"status": "created"}
+    try:
+        await health_scores.update_rollup(database, log.user_id, log.profile_id, log.date, log_dict["score"])
+    except Exception as e:
+        print(f"[HEALTH-SCORE] Could not update rollup for {log.user_id}: {e}")
+    return {"status": status, "score": log_dict["score"]}
 
 @app.get("/api/tracking/logs")
 async def get_daily_logs(user_id: str, days: int = 7, profile_id: Optional[str] = None):
@@ -673,81 +779,26 @@ async def get_daily_logs(user_id: str, days: int = 7, profile_id: Optional[str]
 
 @app.get("/api/tracking/score")
 async def get_health_score(user_id: str, profile_id: Optional[str] = None):
+    """
+    Latest daily score with rolling averages and trend, read from the materialized rollup
+    (logs saved without a profile_id form their own rollup)
+    """
     database = db.get_db()
     if database is None:
         return {"error": "Database not connected"}
     
-    logs_collection = database["daily_logs"]
-    query = {"user_id": user_id}
-    if profile_id:
-        query["profile_id"] = profile_id
-        
-    cursor = logs_collection.find(query).sort("date", -1).limit(5)
-    logs = await cursor.to_list(length=5)
-    
-    if not logs:
+    rollup = await health_scores.get(database, user_id, profile_id)
+    if not rollup:
         return {"score": 0, "trend": "No data"}
     
-    def calculate_daily_score(log):
-        score = 70 # Base score
-        
-        # Sleep
-        sleep = log.get("sleep_hours", 0) or 0
-        if sleep >= 7 and sleep <= 9: score += 10
-        elif sleep >= 5: score += 5
-        else: score -= 10
-        
-        # Hydration
-        water = log.get("hydration_liters", 0) or 0
-        if water >= 2: score += 5
-        elif water < 1: score -= 5
-        
-        # Pain
-        pain = log.get("pain", 0) or 0
-        if pain == 0: score += 10
-        elif pain <= 3: score += 5
-        elif pain <= 6: score -= 5
-        else: score -= 15
-        
-        # Energy
-        energy = log.get("energy", 5) or 5
-        if energy >= 8: score += 5
-        elif energy <= 3: score -= 5
-        
-        # Fever (Temp in C)
-        fever = log.get("fever")
-        if fever:
-            if 36.1 <= fever <= 37.2: score += 5
-            elif fever > 37.5: score -= 10
-            
-        # Heart Rate
-        hr = log.get("heart_rate_avg")
-        if hr:
-            if 60 <= hr <= 100: score += 5
-            else: score -= 5
-            
-        # Blood Pressure
-        sys = log.get("blood_pressure_systolic")
-        dia = log.get("blood_pressure_diastolic")
-        if sys and dia:
-            if 90 <= sys <= 120 and 60 <= dia <= 80: score += 10
-            elif sys > 140 or dia > 90: score -= 10
-            
-        return min(100, max(0, score))
-    
-    latest = logs[0]
-    score = calculate_daily_score(latest)
-    
-    # Trend
-    trend = "Stable"
-    if len(logs) > 1:
-        prev = logs[1]
-        prev_score = calculate_daily_score(prev)
-        
-        if score > prev_score: trend = "Improving"
-        elif score < prev_score: trend = "Declining"
-        
-    return {"score": score, "trend": trend}
+    return {
+        "score": rollup["score"],
+        "trend": rollup["trend"],
+        "averages": rollup["averages"],
+        "slope": rollup["slope"],
+        "as_of": rollup["as_of"],
+        "days_logged": rollup["days_logged"]
+    }
 
 @app.get("/api/users/{user_id}/visits")
 async def get_user_visits(user_id: str):
@@ -771,7 +822,7 @@ async def get_user_labs(user_id: str):
         return {"error": "Database not connected"}
     
     labs_collection = database["labs"]
-    cursor = labs_collection.find({"user_id": user_id}).sort("date", -1)
+    cursor = labs_collection.find({"user_id": user_id}).sort("created_at", -1)
     labs = await cursor.to_list(length=100)
     
     for lab in labs:
@@ -779,6 +830,44 @@ async def get_user_labs(user_id: str):
         
     return labs
 
+@app.get("/api/users/{user_id}/labs/trends")
+async def get_user_lab_trends(user_id: str, profile_id: Optional[str] = None):
+    """
+    Analytes with a stored time series for a profile (no points)
+    (labs saved without a profile_id form their own series)
+    """
+    database = db.get_db()
+    if database is None:
+        return {"error": "Database not connected"}
+    
+    return await lab_trends.list_series(database, user_id, profile_id)
+
+@app.get("/api/users/{user_id}/labs/trend")
+async def get_user_lab_trend(user_id: str, analyte: str, points: int = DEFAULT_TREND_POINTS,
+                             since: Optional[str] = None, until: Optional[str] = None,
+                             profile_id: Optional[str] = None):
+    """
+    One analyte of a profile over time in its canonical unit, downsampled to at most `points` points
+    since/until are ISO dates ("2024-01-31") or datetimes; a date-only until includes that whole day
+    """
+    database = db.get_db()
+    if database is None:
+        return {"error": "Database not connected"}
+    
+    try:
+        since_dt = datetime.fromisoformat(since) if since else None
+        until_dt = datetime.fromisoformat(until) if until else None
+        if until and len(until) == 10:
+            # Date only: up to the end of that day
+            until_dt = until_dt.replace(hour=23, minute=59, second=59, microsecond=999999)
+    except ValueError:
+        return {"error": "Invalid date, expected YYYY-MM-DD"}
+    
+    trend = await lab_trends.query(database, user_id, analyte, max(1, min(points, 2000)), since_dt, until_dt, profile_id)
+    if trend is None:
+        return {"status": "not_found"}
+    return trend
+
 @app.delete("/api/visits/{visit_id}")
 async def delete_visit(visit_id: str):
     database = db.get_db()
@@ -804,12 +893,18 @@ async def delete_lab(lab_id: str):
     labs_collection = database["labs"]
     from bson import ObjectId
     try:
-        result = await labs_collection.delete_one({"_id": ObjectId(lab_id)})
-        if result.deleted_count == 1:
-            return {"status": "deleted"}
-        return {"status": "not_found"}
+        lab = await labs_collection.find_one_and_delete(
+            {"_id": ObjectId(lab_id)}, {"user_id": 1, "profile_id": 1, "entries.analyte": 1, "entries.canonical_value": 1}
+        )
     except:
         return {"status": "invalid_id"}
+    if lab is None:
+        return {"status": "not_found"}
+    try:
+        await lab_trends.remove_lab(database, lab)
+    except Exception as e:
+        print(f"[LAB-TRENDS] Could not update series for deleted lab {lab_id}: {e}")
+    return {"status": "deleted"}
 
 def calculate_age(dob_str):
     try:
@@ -867,6 +962,9 @@ async def generate_plan(request: HealthPlanRequest):
 
     return result
 
+from services.message_store import conversation_messages, voice_session_messages
+from services.conversation_summarizer import conversation_summarizer
+
 @app.delete("/api/voice-chat/reset")
 async def reset_voice_chat(user_id: str, profile_id: Optional[str] = None):
     """Reset/clear conversation history for a user/profile"""
@@ -890,8 +988,10 @@ async def reset_voice_chat(user_id: str, profile_id: Optional[str] = None):
         
         print(f"[RESET] Query: {query}")
         
-        # Delete matching conversations (delete_many to be safe)
+        # Delete matching conversations (delete_many to be safe) and their history segments
+        conversation_ids = [doc["_id"] async for doc in conversations_collection.find(query, {"_id": 1})]
         result = await conversations_collection.delete_many(query)
+        await conversation_messages.delete(database, conversation_ids)
         
         print(f"[RESET] Deleted {result.deleted_count} conversation(s)")
         
@@ -908,6 +1008,132 @@ async def reset_voice_chat(user_id: str, profile_id: Optional[str] = None):
         traceback.print_exc()
         return {"error": str(e)}
 
+from utils.red_flags import red_flag_detector, is_critical
+
+# Answer critical red flags with a fixed emergency reply instead of waiting for the LLM
+RED_FLAG_FAST_PATH = os.getenv("RED_FLAG_FAST_PATH", "false").lower() == "true"
+
+
+def red_flag_fast_path(flags, language: str) -> Optional[str]:
+    """Emergency reply if the message must skip the LLM, None otherwise"""
+    if RED_FLAG_FAST_PATH and is_critical(flags):
+        print(f"[RED-FLAGS] Fast path: {', '.join(flag.label for flag in flags)}")
+        return red_flag_detector.emergency_reply(language)
+    return None
+
+async def load_voice_chat_context(request: VoiceChatRequest, database):
+    """
+    Get or create the conversation for a voice chat turn and build the agent context
+    Returns dict with conversation_id, messages, summary, language and profile_summary
+    
+    messages holds only the turns not yet folded into the running summary,
+    capped at the summarizer token budget, so the prompt size stays flat.
+    """
+    conversations_collection = database["conversations"]
+    profiles_collection = database["patient_profiles"]
+    
+    # Get or create conversation
+    query = {"user_id": request.user_id}
+    if request.profile_id:
+        query["profile_id"] = request.profile_id
+    
+    print(f"[VOICE-CHAT] Looking for conversation with query: {query}")
+        
+    # Try to find existing conversation unless new_session is requested
+    conversation = None
+    if not request.new_session:
+        try:
+            # Only the recent window (and the running summary) is needed for the agent context
+            conversation = await conversation_messages.find_recent(database, query, conversation_messages.window)
+            if conversation:
+                print(f"[VOICE-CHAT] Found existing conversation with {conversation.get('message_count', len(conversation.get('messages', [])))} messages")
+            else:
+                print(f"[VOICE-CHAT] No existing conversation found")
+        except Exception as e:
+            print(f"[VOICE-CHAT] Error finding conversation: {e}")
+            conversation = None
+    else:
+         print(f"[VOICE-CHAT] New session requested, forcing new conversation.")
+    
+    if not conversation:
+        print(f"[VOICE-CHAT] Creating new conversation with language={request.language}")
+        conversation = Conversation(
+            user_id=request.user_id,
+            profile_id=request.profile_id,
+            language=request.language
+        )
+        try:
+            res = await conversations_collection.insert_one({**conversation.dict(exclude={"id"}), **conversation_messages.new_document_fields()})
+            conversation_id = res.inserted_id
+            messages = []
+            summary = None
+            current_language = request.language
+        except Exception as e:
+            print(f"[VOICE-CHAT] Error creating conversation: {e}")
+            # Continue without saving conversation
+            conversation_id = None
+            messages = []
+            summary = None
+            current_language = request.language
+    else:
+        conversation_id = conversation["_id"]
+        messages = await conversation_summarizer.recent_messages(database, conversation)
+        summary = conversation.get("summary")
+        current_language = conversation.get("language", "English")
+        
+        # Update language if changed
+        if request.language != current_language:
+            print(f"[VOICE-CHAT] Language changed from {current_language} to {request.language}")
+            current_language = request.language
+        
+    # Get profile summary
+    profile_summary = "No profile data."
+    if request.profile_id:
+        try:
+            profile = await profiles_collection.find_one({"_id": ObjectId(request.profile_id)})
+            if profile:
+                profile_summary = f"Name: {profile.get('name')}, Age: {profile.get('dob')}, Gender: {profile.get('gender')}, Conditions: {', '.join(profile.get('conditions', []))}, Meds: {', '.join(profile.get('medications', []))}"
+        except Exception as e:
+            print(f"Error getting profile: {e}")
+            pass
+    
+    return {
+        "conversation_id": conversation_id,
+        "messages": messages,
+        "summary": summary,
+        "language": current_language,
+        "profile_summary": profile_summary
+    }
+
+async def save_voice_chat_turn(database, conversation_id, user_text: str, ai_text: str, language: str,
+                               recent: Optional[List[dict]] = None):
+    """
+    Append the user message and AI reply to the conversation
+    
+    If the unsummarized turns (recent plus this one) pass the token budget,
+    older turns are summarized in the background.
+    """
+    if not conversation_id:
+        return
+    try:
+        new_user_msg = ChatMessage(role="user", content=user_text)
+        new_ai_msg = ChatMessage(role="assistant", content=ai_text)
+        
+        await conversation_messages.append(
+            database,
+            conversation_id,
+            [new_user_msg.dict(), new_ai_msg.dict()],
+            {
+                "updated_at": datetime.utcnow(),
+                "language": language  # Store language preference
+            }
+        )
+        if recent is not None and conversation_summarizer.needs_summary(recent + [new_user_msg.dict(), new_ai_msg.dict()]):
+            conversation_summarizer.schedule(database, conversation_id, agent.summarize_conversation)
+    except Exception as e:
+        print(f"Error updating conversation: {e}")
+        # Continue anyway, we have the response
+
 @app.post("/api/voice-chat")
 async def voice_chat(request: VoiceChatRequest):
     try:
@@ -917,106 +1143,31 @@ async def voice_chat(request: VoiceChatRequest):
         if database is None:
             return {"error": "Database not connected"}
         
-        conversations_collection = database["conversations"]
-        profiles_collection = database["patient_profiles"]
-        
-        # Get or create conversation
-        query = {"user_id": request.user_id}
-        if request.profile_id:
-            query["profile_id"] = request.profile_id
-        
-        print(f"[VOICE-CHAT] Looking for conversation with query: {query}")
-            
-        # Try to find existing conversation unless new_session is requested
-        conversation = None
-        if not request.new_session:
-            try:
-                conversation = await conversations_collection.find_one(query)
-                if conversation:
-                    print(f"[VOICE-CHAT] Found existing conversation with {len(conversation.get('messages', []))} messages")
-                else:
-                    print(f"[VOICE-CHAT] No existing conversation found")
-            except Exception as e:
-                print(f"[VOICE-CHAT] Error finding conversation: {e}")
-                conversation = None
-        else:
-             print(f"[VOICE-CHAT] New session requested, forcing new conversation.")
-        
-        if not conversation:
-            print(f"[VOICE-CHAT] Creating new conversation with language={request.language}")
-            conversation = Conversation(
-                user_id=request.user_id,
-                profile_id=request.profile_id,
-                language=request.language
-            )
-            try:
-                res = await conversations_collection.insert_one(conversation.dict(exclude={"id"}))
-                conversation_id = res.inserted_id
-                messages = []
-                current_language = request.language
-            except Exception as e:
-                print(f"[VOICE-CHAT] Error creating conversation: {e}")
-                # Continue without saving conversation
-                conversation_id = None
-                messages = []
-                current_language = request.language
-        else:
-            conversation_id = conversation["_id"]
-            messages = conversation.get("messages", [])
-            current_language = conversation.get("language", "English")
-            
-            # Update language if changed
-            if request.language != current_language:
-                print(f"[VOICE-CHAT] Language changed from {current_language} to {request.language}")
-                current_language = request.language
-            
-        # Get profile summary
-        profile_summary = "No profile data."
-        if request.profile_id:
-            try:
-                profile = await profiles_collection.find_one({"_id": ObjectId(request.profile_id)})
-                if profile:
-                    profile_summary = f"Name: {profile.get('name')}, Age: {profile.get('dob')}, Gender: {profile.get('gender')}, Conditions: {', '.join(profile.get('conditions', []))}, Meds: {', '.join(profile.get('medications', []))}"
-            except Exception as e:
-                print(f"Error getting profile: {e}")
-                pass
+        red_flags = red_flag_detector.scan(request.message)
+        context = await load_voice_chat_context(request, database)
                 
         # Call AI Agent
         # Convert messages to dict for agent
-        history_dicts = [{"role": m["role"], "content": m["content"]} for m in messages[-10:]] # Last 10 messages context
+        history_dicts = [{"role": m["role"], "content": m["content"]} for m in context["messages"]] # Unsummarized recent messages
         
-        try:
-            ai_response_text = await agent.chat_with_doctor(
-                message=request.message,
-                history=history_dicts,
-                profile_summary=profile_summary,
-                language=current_language  # Use current language preference
-            )
-        except Exception as e:
-            print(f"Error calling AI agent: {e}")
-            return {"error": f"AI service error: {str(e)}"}
-        
-        # Update conversation
-        if conversation_id:
+        ai_response_text = red_flag_fast_path(red_flags, context["language"])
+        if ai_response_text is None:
             try:
-                new_user_msg = ChatMessage(role="user", content=request.message)
-                new_ai_msg = ChatMessage(role="assistant", content=ai_response_text)
-                
-                await conversations_collection.update_one(
-                    {"_id": conversation_id},
-                    {
-                        "$push": {"messages": {"$each": [new_user_msg.dict(), new_ai_msg.dict()]}},
-                        "$set": {
-                            "updated_at": datetime.utcnow(),
-                            "language": current_language  # Store language preference
-                        }
-                    }
+                ai_response_text = await agent.chat_with_doctor(
+                    message=request.message,
+                    history=history_dicts,
+                    profile_summary=context["profile_summary"],
+                    language=context["language"],  # Use current language preference
+                    summary=context["summary"]
                 )
             except Exception as e:
-                print(f"Error updating conversation: {e}")
-                # Continue anyway, we have the response
+                print(f"Error calling AI agent: {e}")
+                return {"error": f"AI service error: {str(e)}"}
+        
+        # Update conversation
+        await save_voice_chat_turn(database, context["conversation_id"], request.message, ai_response_text, context["language"], history_dicts)
         
-        return {"response": ai_response_text}
+        return {"response": ai_response_text, "redFlags": [flag.label for flag in red_flags]}
     
     except Exception as e:
         print(f"Voice chat error: {e}")
@@ -1030,6 +1181,11 @@ async def voice_chat(request: VoiceChatRequest):
 from utils.text_normalizer import normalize_for_tts, extract_voice_summary
 from utils.sentence_splitter import split_into_sentences, format_for_doctor_tone
 from utils.tts_cache import tts_cache, chunk_store
+from utils.response_cache import response_cache
+from utils.tts_engine import TTSSynthesizer
+from utils.audio_store import DiskAudioStore, GridFSAudioStore
+from utils.phrase_bank import phrase_bank
+from utils.http_audio import audio_media_type, audio_response, etag_matches
 from openai import AsyncOpenAI
 import time
 import uuid
@@ -1041,6 +1197,49 @@ openai_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 TTS_MODEL = os.getenv("TTS_MODEL", "gpt-4o-mini-tts")
 TTS_VOICE = os.getenv("TTS_VOICE", "alloy")
 TTS_FORMAT = os.getenv("TTS_FORMAT", "mp3")
+TTS_CACHE_TTL = int(os.getenv("TTS_CACHE_TTL", "86400"))
+TTS_MAX_CONCURRENCY = int(os.getenv("TTS_MAX_CONCURRENCY", "8"))
+TTS_REQUEST_CONCURRENCY = int(os.getenv("TTS_REQUEST_CONCURRENCY", "4"))
+
+TTS_DISK_CACHE_DIR = os.getenv("TTS_DISK_CACHE_DIR", os.path.join(os.path.dirname(__file__), ".tts_cache"))
+TTS_DISK_CACHE_MAX_MB = int(os.getenv("TTS_DISK_CACHE_MAX_MB", "512"))
+TTS_GRIDFS_CACHE = os.getenv("TTS_GRIDFS_CACHE", "false").lower() == "true"
+TTS_GRIDFS_CACHE_MAX_MB = int(os.getenv("TTS_GRIDFS_CACHE_MAX_MB", "1024"))
+TTS_CACHE_WARM_COUNT = int(os.getenv("TTS_CACHE_WARM_COUNT", "200"))
+PHRASE_BANK_VOICES = [v.strip() for v in os.getenv("PHRASE_BANK_VOICES", "alloy").split(",") if v.strip()]
+PHRASE_BANK_RENDER_ON_STARTUP = os.getenv("PHRASE_BANK_RENDER_ON_STARTUP", "false").lower() == "true"
+
+# Persistent tiers under the in-memory TTS cache
+if TTS_DISK_CACHE_DIR:
+    try:
+        tts_cache.add_tier(DiskAudioStore(TTS_DISK_CACHE_DIR, max_bytes=TTS_DISK_CACHE_MAX_MB * 1024 * 1024))
+    except OSError as e:
+        print(f"[TTS-CACHE] Disk tier disabled: {e}")
+if TTS_GRIDFS_CACHE:
+    tts_cache.add_tier(GridFSAudioStore(db.get_db, max_bytes=TTS_GRIDFS_CACHE_MAX_MB * 1024 * 1024))
+
+
+async def warm_tts_cache():
+    """Preload recently used TTS audio from persistent tiers"""
+    if TTS_CACHE_WARM_COUNT > 0 and tts_cache.tiers:
+        await tts_cache.warm(TTS_CACHE_WARM_COUNT)
+
+# Shared synthesizer for chunked TTS (bounded fan-out on cache misses)
+tts_engine = TTSSynthesizer(
+    openai_client,
+    tts_cache,
+    model=TTS_MODEL,
+    response_format="mp3",
+    max_concurrency=TTS_MAX_CONCURRENCY,
+    request_concurrency=TTS_REQUEST_CONCURRENCY,
+    phrase_bank=phrase_bank
+)
+
+
+async def render_phrase_bank():
+    """Render fixed phrases that have no bundled audio yet"""
+    if PHRASE_BANK_RENDER_ON_STARTUP:
+        await phrase_bank.render_missing(TTS_MODEL, PHRASE_BANK_VOICES, tts_engine.synthesize)
 
 
 class TTSRequest(BaseModel):
@@ -1056,44 +1255,30 @@ class TTSChunksRequest(BaseModel):
 
 
 @app.post("/api/voice/speak")
-async def speak_single(request: TTSRequest):
+async def speak_single(request: TTSRequest, http_request: Request):
     """
     Generate single TTS audio from text
-    Returns audio/mpeg bytes
+    Returns audio bytes in the requested format (supports If-None-Match and Range)
     """
     try:
         # Normalize text
         normalized_text = normalize_for_tts(request.text, "English")
         
         if not normalized_text:
-            return Response(content=b"", media_type="audio/mpeg")
+            return Response(content=b"", media_type=audio_media_type(request.format))
         
-        # Check cache
-        cached_audio = tts_cache.get(TTS_MODEL, request.voice, normalized_text)
-        if cached_audio:
-            print(f"[TTS] Cache HIT for text: {normalized_text[:50]}...")
-            return Response(content=cached_audio, media_type="audio/mpeg")
-        
-        # Generate TTS
-        print(f"[TTS] Generating audio for: {normalized_text[:50]}...")
-        start_time = time.time()
-        
-        response = await openai_client.audio.speech.create(
-            model=TTS_MODEL,
-            voice=request.voice,
-            input=normalized_text,
-            response_format=request.format
-        )
+        # Audio is content-addressed, so a matching ETag needs no lookup at all
+        response_format = request.format or "mp3"
+        media_type = audio_media_type(response_format)
+        etag = tts_cache.etag(TTS_MODEL, request.voice, normalized_text, response_format)
+        if etag_matches(http_request, etag):
+            return audio_response(http_request, b"", etag, max_age=TTS_CACHE_TTL, media_type=media_type)
         
-        audio_bytes = response.content
-        generation_time = time.time() - start_time
+        # Phrase bank, cache and generation are all keyed on the format; concurrent
+        # requests for the same sentence and format share one TTS call
+        audio_bytes = await tts_engine.synthesize(normalized_text, request.voice, response_format=response_format)
         
-        # Cache result
-        tts_cache.set(TTS_MODEL, request.voice, normalized_text, audio_bytes, generation_time)
-        
-        print(f"[TTS] Generated in {generation_time:.2f}s")
-        
-        return Response(content=audio_bytes, media_type="audio/mpeg")
+        return audio_response(http_request, audio_bytes, etag, max_age=TTS_CACHE_TTL, media_type=media_type)
     
     except Exception as e:
         print(f"[TTS] Error: {e}")
@@ -1102,6 +1287,27 @@ async def speak_single(request: TTSRequest):
         return {"error": str(e)}
 
 
+def prepare_tts_sentences(text: str, lang: str):
+    """
+    Turn reply text into doctor-tone sentences for chunked TTS
+    Returns (sentences, caption_text)
+    """
+    # Extract voice-friendly summary if text is too long
+    voice_text, caption_text = extract_voice_summary(text, max_chars=900)
+    
+    # Normalize
+    normalized_text = normalize_for_tts(voice_text, lang)
+    
+    if not normalized_text:
+        return [], caption_text
+    
+    # Split into sentences
+    sentences = split_into_sentences(normalized_text, lang, max_sentences=12)
+    sentences = format_for_doctor_tone(sentences, lang)
+    
+    return sentences, caption_text
+
+
 @app.post("/api/voice/speak-chunks")
 async def speak_chunks(request: TTSChunksRequest):
     """
@@ -1109,58 +1315,29 @@ async def speak_chunks(request: TTSChunksRequest):
     Returns chunk metadata with URLs
     """
     try:
-        # Extract voice-friendly summary if text is too long
-        voice_text, caption_text = extract_voice_summary(request.text, max_chars=900)
-        
-        # Normalize
-        normalized_text = normalize_for_tts(voice_text, request.lang)
+        sentences, caption_text = prepare_tts_sentences(request.text, request.lang)
         
-        if not normalized_text:
+        if not sentences:
             return {"chunks": [], "caption": caption_text}
         
-        # Split into sentences
-        sentences = split_into_sentences(normalized_text, request.lang, max_sentences=12)
-        sentences = format_for_doctor_tone(sentences, request.lang)
-        
         print(f"[TTS-CHUNKS] Processing {len(sentences)} sentences")
         
         # Generate session ID
         session_id = str(uuid.uuid4())[:8]
+        await chunk_store.open_session_async(session_id, len(sentences))
         
-        chunks_data = []
+        # Generate audio for all sentences concurrently (cache misses fan out)
+        start_time = time.time()
+        audio_list = await tts_engine.synthesize_many(sentences, request.voice)
+        print(f"[TTS-CHUNKS] Synthesized {len(sentences)} chunks in {time.time() - start_time:.2f}s")
         
-        # Generate audio for each sentence
-        for i, sentence in enumerate(sentences):
-            chunk_id = f"c{i+1}"
-            
-            # Check cache
-            cached_audio = tts_cache.get(TTS_MODEL, request.voice, sentence)
-            
-            if cached_audio:
-                print(f"[TTS-CHUNKS] Cache HIT for chunk {chunk_id}")
-                audio_bytes = cached_audio
-            else:
-                print(f"[TTS-CHUNKS] Generating chunk {chunk_id}: {sentence[:40]}...")
-                start_time = time.time()
-                
-                response = await openai_client.audio.speech.create(
-                    model=TTS_MODEL,
-                    voice=request.voice,
-                    input=sentence,
-                    response_format="mp3"
-                )
-                
-                audio_bytes = response.content
-                generation_time = time.time() - start_time
-                
-                # Cache
-                tts_cache.set(TTS_MODEL, request.voice, sentence, audio_bytes, generation_time)
-                print(f"[TTS-CHUNKS] Generated in {generation_time:.2f}s")
-            
-            chunks_data.append((chunk_id, audio_bytes, sentence))
+        chunks_data = [
+            (f"c{i+1}", audio_bytes, sentence, tts_cache.etag(TTS_MODEL, request.voice, sentence))
+            for i, (sentence, audio_bytes) in enumerate(zip(sentences, audio_list))
+        ]
         
         # Store chunks
-        chunk_metadata = chunk_store.save_chunks(session_id, chunks_data)
+        chunk_metadata = await chunk_store.save_chunks_async(session_id, chunks_data)
         
         # Get cache stats
         stats = tts_cache.get_stats()
@@ -1169,6 +1346,7 @@ async def speak_chunks(request: TTSChunksRequest):
         return {
             "session_id": session_id,
             "chunks": chunk_metadata,
+            "stream_url": f"/api/voice/stream/{session_id}",
             "caption": caption_text,
             "cache_stats": stats
         }
@@ -1180,23 +1358,147 @@ async def speak_chunks(request: TTSChunksRequest):
         return {"error": str(e)}
 
 
+@app.post("/api/voice/speak-chunks/stream")
+async def speak_chunks_stream(request: TTSChunksRequest):
+    """
+    Stream chunked TTS metadata as NDJSON
+    Each chunk line is emitted as soon as its audio is in chunk_store,
+    in sentence order, so playback can start after the first chunk
+    """
+    sentences, caption_text = prepare_tts_sentences(request.text, request.lang)
+    session_id = str(uuid.uuid4())[:8]
+    await chunk_store.open_session_async(session_id, len(sentences))
+    
+    async def event_stream():
+        yield json.dumps({
+            "type": "session",
+            "session_id": session_id,
+            "stream_url": f"/api/voice/stream/{session_id}",
+            "caption": caption_text,
+            "total": len(sentences)
+        }) + "\n"
+        
+        saved = 0
+        try:
+            start_time = time.time()
+            async for i, sentence, audio_bytes in tts_engine.synthesize_ordered(sentences, request.voice):
+                metadata = await chunk_store.save_chunk_async(session_id, f"c{i+1}", audio_bytes, sentence, tts_cache.etag(TTS_MODEL, request.voice, sentence))
+                saved += 1
+                if i == 0:
+                    print(f"[TTS-STREAM] First chunk ready in {time.time() - start_time:.2f}s")
+                yield json.dumps({"type": "chunk", **metadata}) + "\n"
+            
+            yield json.dumps({"type": "done", "session_id": session_id}) + "\n"
+        except Exception as e:
+            print(f"[TTS-STREAM] Error: {e}")
+            # End the audio stream after the chunks that did make it
+            await chunk_store.close_session_async(session_id, saved)
+            yield json.dumps({"type": "error", "error": str(e)}) + "\n"
+    
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+
+class VoiceChatStreamRequest(VoiceChatRequest):
+    voice: Optional[str] = "alloy"
+
+
+@app.post("/api/voice-chat/stream")
+async def voice_chat_stream(request: VoiceChatStreamRequest):
+    """
+    Voice chat with streamed reply audio
+    LLM tokens are cut into sentences as they arrive and each sentence is
+    synthesized immediately; chunk metadata is streamed as NDJSON so the
+    client can start playback after the first sentence
+    """
+    print(f"[VOICE-CHAT-STREAM] Request from user_id={request.user_id}, profile_id={request.profile_id}")
+    
+    database = db.get_db()
+    if database is None:
+        return {"error": "Database not connected"}
+    
+    red_flags = red_flag_detector.scan(request.message)
+    context = await load_voice_chat_context(request, database)
+    history_dicts = [{"role": m["role"], "content": m["content"]} for m in context["messages"]] # Unsummarized recent messages
+    language = context["language"]
+    emergency_reply = red_flag_fast_path(red_flags, language)
+    session_id = str(uuid.uuid4())[:8]
+    # Chunk count is unknown until the LLM finishes
+    await chunk_store.open_session_async(session_id, None)
+    
+    async def event_stream():
+        yield json.dumps({
+            "type": "session",
+            "session_id": session_id,
+            "stream_url": f"/api/voice/stream/{session_id}",
+            "redFlags": [flag.label for flag in red_flags]
+        }) + "\n"
+        
+        reply_sentences = []
+        saved = 0
+        
+        async def reply_stream():
+            if emergency_reply is not None:
+                for sentence in split_into_sentences(emergency_reply, language):
+                    yield sentence
+                return
+            async for sentence in agent.stream_chat_with_doctor(
+                message=request.message,
+                history=history_dicts,
+                profile_summary=context["profile_summary"],
+                language=language,
+                summary=context["summary"]
+            ):
+                yield sentence
+        
+        async def tts_sentences():
+            async for sentence in reply_stream():
+                reply_sentences.append(sentence)
+                normalized = normalize_for_tts(sentence, language)
+                if normalized:
+                    yield normalized
+        
+        try:
+            start_time = time.time()
+            async for i, sentence, audio_bytes in tts_engine.synthesize_ordered(tts_sentences(), request.voice):
+                metadata = await chunk_store.save_chunk_async(session_id, f"c{i+1}", audio_bytes, sentence, tts_cache.etag(TTS_MODEL, request.voice, sentence))
+                saved += 1
+                if i == 0:
+                    print(f"[VOICE-CHAT-STREAM] First audio ready in {time.time() - start_time:.2f}s")
+                yield json.dumps({"type": "chunk", **metadata}) + "\n"
+        except Exception as e:
+            print(f"[VOICE-CHAT-STREAM] Error: {e}")
+            await chunk_store.close_session_async(session_id, saved)
+            yield json.dumps({"type": "error", "error": str(e)}) + "\n"
+            return
+        
+        await chunk_store.close_session_async(session_id, saved)
+        ai_response_text = " ".join(reply_sentences)
+        await save_voice_chat_turn(database, context["conversation_id"], request.message, ai_response_text, language, history_dicts)
+        
+        yield json.dumps({"type": "done", "session_id": session_id, "response": ai_response_text}) + "\n"
+    
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+
 @app.get("/api/voice/chunk/{session_id}/{chunk_id}")
-async def get_chunk(session_id: str, chunk_id: str):
+async def get_chunk(session_id: str, chunk_id: str, request: Request):
     """
     Retrieve a specific audio chunk
-    Returns audio/mpeg bytes
+    Returns audio/mpeg bytes (supports If-None-Match and Range)
     """
     try:
-        audio_bytes = chunk_store.get_chunk(session_id, chunk_id)
+        entry = await chunk_store.get_chunk_entry_async(session_id, chunk_id)
         
-        if audio_bytes is None:
+        if entry is None:
             return Response(
                 content=json.dumps({"error": "Chunk not found or expired"}),
                 status_code=404,
                 media_type="application/json"
             )
         
-        return Response(content=audio_bytes, media_type="audio/mpeg")
+        # memoryview is handed to the response without copying the audio
+        audio_bytes, etag = entry
+        return audio_response(request, audio_bytes, etag, max_age=chunk_store.ttl)
     
     except Exception as e:
         print(f"[TTS-CHUNK] Error: {e}")
@@ -1207,10 +1509,84 @@ async def get_chunk(session_id: str, chunk_id: str):
         )
 
 
+AUDIO_STREAM_POLL_INTERVAL = 0.05
+AUDIO_STREAM_CHUNK_TIMEOUT = float(os.getenv("AUDIO_STREAM_CHUNK_TIMEOUT", "30"))
+
+
+@app.get("/api/voice/stream/{session_id}")
+async def stream_session_audio(session_id: str):
+    """
+    Stream all chunks of a session as one continuous audio/mpeg response
+    Chunks are sent in order as they become available; MP3 frames are
+    concatenated as-is, no re-encoding
+    """
+    if not await chunk_store.session_exists_async(session_id):
+        return Response(
+            content=json.dumps({"error": "Session not found or expired"}),
+            status_code=404,
+            media_type="application/json"
+        )
+    
+    async def audio_stream():
+        index = 1
+        waited = 0.0
+        while True:
+            # One store round trip per poll
+            total, audio_bytes = await chunk_store.next_chunk_async(session_id, index)
+            if total is not None and index > total:
+                break
+            
+            if audio_bytes is not None:
+                yield bytes(audio_bytes)
+                index += 1
+                waited = 0.0
+                continue
+            
+            # Not generated yet (or evicted): wait a bit, then give up
+            if waited >= AUDIO_STREAM_CHUNK_TIMEOUT:
+                print(f"[TTS-STREAM] Timed out waiting for {session_id}/c{index}")
+                break
+            await asyncio.sleep(AUDIO_STREAM_POLL_INTERVAL)
+            waited += AUDIO_STREAM_POLL_INTERVAL
+    
+    return StreamingResponse(audio_stream(), media_type="audio/mpeg")
+
+
 @app.get("/api/voice/cache-stats")
 async def cache_stats():
     """Get TTS cache statistics"""
-    return tts_cache.get_stats()
+    stats = tts_cache.get_stats()
+    stats["synthesis"] = tts_engine.get_stats()
+    return stats
+
+
+@app.get("/api/ai/cache-stats")
+async def ai_cache_stats():
+    """Get LLM response cache (per method), request coalescing, symptom index, red-flag and summarizer statistics"""
+    stats = agent.get_llm_stats()
+    stats["symptom_index"] = symptom_index.get_stats()
+    stats["red_flags"] = red_flag_detector.get_stats()
+    stats["summarizer"] = conversation_summarizer.get_stats()
+    return stats
+
+
+@app.post("/api/ai/cache/{method}")
+async def set_ai_cache_method(method: str, enabled: bool = True):
+    """Enable or disable the LLM response cache for one DoctorAgent method"""
+    response_cache.set_enabled(method, enabled)
+    return {"method": method, "enabled": response_cache.is_enabled(method)}
+
+
+@app.get("/api/voice/chunk-stats")
+async def chunk_stats():
+    """Get chunk store memory gauges"""
+    return await chunk_store.get_stats_async()
+
+
+@app.get("/api/voice/phrase-bank")
+async def phrase_bank_stats():
+    """Get phrase bank usage and hot sentences that could be added to it"""
+    return phrase_bank.get_report()
 
 
 # --- Voice Doctor Endpoints ---
@@ -1251,7 +1627,7 @@ async def create_voice_session(request: VoiceSessionCreate):
     session_data = {
         "user_id": request.user_id,
         "profile_id": request.profile_id,
-        "messages": [], # {role, content, timestamp}
+        **voice_session_messages.new_document_fields(), # messages: recent {role, content, ts}
         "stage": "INTAKE", # INTAKE, REFINE, PREDICT, DONE
         "created_at": datetime.utcnow(),
         "updated_at": datetime.utcnow()
@@ -1260,6 +1636,8 @@ async def create_voice_session(request: VoiceSessionCreate):
     res = await sessions_collection.insert_one(session_data)
     return {"session_id": str(res.inserted_id), "status": "created"}
 
+VOICE_SESSION_HISTORY_LIMIT = int(os.getenv("VOICE_SESSION_HISTORY_LIMIT", "500"))
+
 @app.get("/api/voice/session/{session_id}")
 async def get_voice_session(session_id: str):
     database = db.get_db()
@@ -1270,6 +1648,9 @@ async def get_voice_session(session_id: str):
     try:
         session = await sessions_collection.find_one({"_id": ObjectId(session_id)})
         if session:
+            # Full history lives in segments (legacy sessions still hold it inline)
+            if "message_count" in session:
+                session["messages"] = await voice_session_messages.history(database, session["_id"], limit=VOICE_SESSION_HISTORY_LIMIT)
             session["_id"] = str(session["_id"])
             return session
         return {"error": "Session not found"}
@@ -1285,112 +1666,108 @@ async def voice_speak(request: VoiceSpeakRequest):
     return Response(content=audio_bytes, media_type="audio/mpeg")
 
 @app.post("/api/voice/analyze")
-async def analyze_voice_session(request: VoiceAnalyzeRequest):
+async def analyze_voice_session(request: VoiceAnalyzeRequest, response: Response):
     database = db.get_db()
     if database is None:
         return {"error": "Database not connected"}
     
-    sessions_collection = database["voice_sessions"]
+    timings = {}
+    start_time = time.perf_counter()
+    
+    def timed(stage: str, since: float):
+        timings[stage] = (time.perf_counter() - since) * 1000
     
-    # 1. Fetch Session
+    # 1. Fetch Session (only the recent messages are needed for context)
     try:
         session_id = ObjectId(request.session_id)
-        session = await sessions_collection.find_one({"_id": session_id})
+        session = await voice_session_messages.find_recent(database, {"_id": session_id}, 9, {"stage": 1})
         if not session:
             return {"error": "Session not found"}
     except:
         return {"error": "Invalid session ID"}
+    timed("session", start_time)
     
-    # 2. Append User Message
     user_msg = {"role": "user", "content": request.text, "ts": datetime.utcnow()}
-    await sessions_collection.update_one(
-        {"_id": session_id},
-        {"$push": {"messages": user_msg}, "$set": {"updated_at": datetime.utcnow()}}
-    )
     
-    # 3. Analyze Logic
-    # We want to mimic the text flow: Extract -> Analyze -> Suggest/Predict
-    
-    # A. Extract Symptoms & Red Flags first
-    # We combine previous user messages + current text for better extraction? 
-    # Or just current text? Let's use current text + recent context if needed.
-    # For now, just current text to keep it simple, or full conversation?
-    # extract_symptoms expects "text".
-    
-    full_context_text = request.text # Or construct from history
-    
-    # Optional: Retrieve profile for context
-    profile_data = "Unknown"
-    if session.get("profile_id"):
-        # Fetch profile... (omitted for brevity, can implement if needed)
-        pass
-
-    # Call AI Agent to "Chat/Analyze"
-    # We'll use a specific logic: 
-    # If explicit "diagnose me" or enough symptoms -> Predict
-    # Else -> Gather info (Intake)
-    
-    # Let's try to Extract Symptoms first
-    extraction = await agent.extract_symptoms(request.text)
-    extracted_symptoms = []
-    red_flags = []
-    
-    if isinstance(extraction, str):
-         try: extraction = json.loads(extraction) 
-         except: pass
-         
-    if isinstance(extraction, dict):
-        extracted_symptoms = extraction.get("symptoms", [])
-        red_flags = extraction.get("redFlagsDetected", [])
-
-    # Decide Stage
-    current_stage = session.get("stage", "INTAKE")
+    # Rule-based red flags run before any LLM call
+    rule_flags = red_flag_detector.scan(request.text)
+    emergency_reply = red_flag_fast_path(rule_flags, "English")
     
-    # If red flags -> URGENT
-    urgency = "low"
-    if red_flags:
-        urgency = "high"
+    # 2. Analyze Logic as a task graph:
+    #    extract_symptoms --> suggest_refinements
+    #    chat_with_doctor (independent of extraction)
     
-    # Generate Assistant Reply
-    # We use chat_with_doctor to get a conversational reply + questions
-    # But we also want "Suggested Symptoms" buttons (Follow-ups)
-    
-    # Get history for context
+    # Get history for context (last 10 messages including the current one)
     history = session.get("messages", []) + [user_msg]
-    # Limit history to last 10 messages
     history_tuples = [{"role": m["role"], "content": m["content"]} for m in history[-10:]]
-
-    # Generate conversational reply
-    reply_text = await agent.chat_with_doctor(
-        message=request.text,
-        history=history_tuples[:-1], # Exclude current message from history param as it's passed as message
-        profile_summary=None, # Todo: fetch
-        language="English"
-    )
     
-    # Generate Follow-up Options (Suggested Symptoms)
-    # If we found symptoms, assume we are in "REFINE" or "INTAKE" -> suggest related
-    suggested_symptoms = []
-    if extracted_symptoms:
-        # Get existing symptom names
-        symptom_names = [s["name"] for s in extracted_symptoms]
-        # Call refinement
-        refinements = await agent.suggest_refinements(symptom_names)
-        if isinstance(refinements, str):
-             try: refinements = json.loads(refinements)
-             except: pass
-        
-        if isinstance(refinements, dict):
-             groups = refinements.get("groups", [])
-             for g in groups:
-                 suggested_symptoms.extend([{"label": s, "key": s} for s in g.get("symptoms", [])[:4]]) # Limit to 4
+    async def extract_and_refine():
+        stage_start = time.perf_counter()
+        extraction = await agent.extract_symptoms(request.text)
+        timed("extract", stage_start)
+        
+        extracted_symptoms = []
+        red_flags = []
+        if isinstance(extraction, str):
+            try: extraction = json.loads(extraction)
+            except: pass
+        if isinstance(extraction, dict):
+            extracted_symptoms = extraction.get("symptoms", [])
+            red_flags = extraction.get("redFlagsDetected", [])
+        
+        # Generate Follow-up Options (Suggested Symptoms) as soon as extraction is done
+        suggested_symptoms = []
+        if extracted_symptoms:
+            stage_start = time.perf_counter()
+            # Normalized names let the local index answer
+            refinements = await suggest_refinements(extracted_symptoms)
+            timed("refine", stage_start)
+            if isinstance(refinements, str):
+                try: refinements = json.loads(refinements)
+                except: pass
+            if isinstance(refinements, dict):
+                for g in refinements.get("groups", []):
+                    suggested_symptoms.extend([{"label": s, "key": s} for s in g.get("symptoms", [])[:4]]) # Limit to 4
+        
+        return red_flags, suggested_symptoms
+    
+    async def chat():
+        stage_start = time.perf_counter()
+        reply = await agent.chat_with_doctor(
+            message=request.text,
+            history=history_tuples[:-1], # Exclude current message from history param as it's passed as message
+            profile_summary=None, # Todo: fetch
+            language="English"
+        )
+        timed("chat", stage_start)
+        return reply
+    
+    llm_start = time.perf_counter()
+    try:
+        if emergency_reply is not None:
+            red_flags, suggested_symptoms, reply_text = [], [], emergency_reply
+        else:
+            (red_flags, suggested_symptoms), reply_text = await asyncio.gather(extract_and_refine(), chat())
+    except Exception:
+        # Keep the user's turn even if the reply failed
+        await voice_session_messages.append(database, session_id, [user_msg], {"updated_at": datetime.utcnow()})
+        raise
+    timed("llm", llm_start)
+    
+    red_flags = list(dict.fromkeys([flag.label for flag in rule_flags] + red_flags))
     
-    # Save Assistant Message
+    # If red flags -> URGENT
+    urgency = "critical" if emergency_reply is not None else "high" if red_flags else "low"
+    current_stage = session.get("stage", "INTAKE")
+    
+    # 3. Save User and Assistant Messages in one write
+    db_start = time.perf_counter()
     asst_msg = {"role": "assistant", "content": reply_text, "ts": datetime.utcnow()}
-    await sessions_collection.update_one(
-        {"_id": session_id},
-        {"$push": {"messages": asst_msg}}
-    )
+    await voice_session_messages.append(database, session_id, [user_msg, asst_msg], {"updated_at": datetime.utcnow()})
+    timed("save", db_start)
+    timed("total", start_time)
+    
+    response.headers["Server-Timing"] = ", ".join(f"{stage};dur={ms:.1f}" for stage, ms in timings.items())
     
     return {
         "reply": reply_text,
@@ -0,0 +1,55 @@
+"""
+Migration: windowed conversation storage
+Moves the inline messages of conversations and voice_sessions documents into
+message_segments buckets and trims each parent to the recent-message window
+(see services/message_store.py). Safe to re-run: migrated documents carry a
+message_count field and are skipped.
+
+Run from the backend directory:
+    python -m migrations.bucket_messages [--dry-run]
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import db
+from db_indexes import ensure_indexes
+from services.message_store import conversation_messages, voice_session_messages
+
+
+async def migrate(dry_run: bool = False, batch_size: int = 100):
+    await db.connect()
+    database = db.get_db()
+    if database is None:
+        print("[MIGRATION] Database not connected")
+        return
+
+    await ensure_indexes(database)
+
+    for store in (conversation_messages, voice_session_messages):
+        collection = database[store.collection_name]
+        pending = await collection.count_documents({"message_count": {"$exists": False}})
+        print(f"[MIGRATION] {store.collection_name}: {pending} documents to migrate")
+        if dry_run or pending == 0:
+            continue
+
+        migrated = 0
+        cursor = collection.find({"message_count": {"$exists": False}}).batch_size(batch_size)
+        async for doc in cursor:
+            if await store.migrate_document(database, doc):
+                migrated += 1
+                if migrated % 500 == 0:
+                    print(f"[MIGRATION] {store.collection_name}: {migrated}/{pending}")
+        print(f"[MIGRATION] {store.collection_name}: migrated {migrated} documents")
+
+    db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bucket inline chat messages into segments")
+    parser.add_argument("--dry-run", action="store_true", help="Only count documents to migrate")
+    args = parser.parse_args()
+    asyncio.run(migrate(dry_run=args.dry_run))
@@ -0,0 +1,68 @@
+"""
+Migration: lab trend series
+Canonicalizes stored lab entries that predate the unit registry and rebuilds
+the lab_series collection from the labs collection (see services/lab_trends.py).
+Series written before profile_id was part of the series key are removed first.
+Safe to re-run: each lab replaces its own points in the series.
+
+Run from the backend directory:
+    python -m migrations.build_lab_series [--dry-run]
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import db
+from db_indexes import ensure_indexes
+from services.lab_trends import SERIES_COLLECTION, lab_trends
+from services.lab_units import unit_registry
+
+
+async def migrate(dry_run: bool = False, batch_size: int = 100):
+    await db.connect()
+    database = db.get_db()
+    if database is None:
+        print("[MIGRATION] Database not connected")
+        return
+
+    await ensure_indexes(database)
+
+    # Per-user series from before profiles were tracked separately
+    legacy = {"profile_id": {"$exists": False}}
+    print(f"[MIGRATION] lab_series: {await database[SERIES_COLLECTION].count_documents(legacy)} per-user series to replace")
+    if not dry_run:
+        await database[SERIES_COLLECTION].delete_many(legacy)
+
+    labs_collection = database["labs"]
+    pending = await labs_collection.count_documents({"user_id": {"$exists": True}})
+    print(f"[MIGRATION] labs: {pending} documents to project")
+    if dry_run or pending == 0:
+        db.close()
+        return
+
+    processed = canonicalized = 0
+    cursor = labs_collection.find({"user_id": {"$exists": True}}).sort("created_at", 1).batch_size(batch_size)
+    async for lab in cursor:
+        entries = lab.get("entries") or []
+        missing = [entry for entry in entries if isinstance(entry, dict) and entry.get("canonical_value") is None]
+        unit_registry.canonicalize_entries(entries)
+        if any(entry.get("canonical_value") is not None for entry in missing):
+            await labs_collection.update_one({"_id": lab["_id"]}, {"$set": {"entries": entries}})
+            canonicalized += 1
+        await lab_trends.add_lab(database, lab)
+        processed += 1
+        if processed % 500 == 0:
+            print(f"[MIGRATION] labs: {processed}/{pending}")
+    print(f"[MIGRATION] labs: projected {processed} documents ({canonicalized} newly canonicalized)")
+
+    db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build per-analyte lab trend series")
+    parser.add_argument("--dry-run", action="store_true", help="Only count documents to project")
+    args = parser.parse_args()
+    asyncio.run(migrate(dry_run=args.dry_run))
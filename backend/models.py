@@ -72,6 +72,10 @@ class LabEntry(BaseModel):
     value: float
     unit: str
     reference_range: Optional[str] = None
+    # Set at ingestion by the unit registry (value in the reference unit of the analyte)
+    analyte: Optional[str] = None
+    canonical_value: Optional[float] = None
+    canonical_unit: Optional[str] = None
 
 class LabResult(BaseModel):
     visit_id: Optional[str] = None
@@ -86,6 +90,7 @@ class LabInterpretationRequest(BaseModel):
     lab_results: List[dict]
     profile_summary: Optional[str] = None
     language: str = "English"
+    narrative: Optional[str] = None  # None (rules only), "sync" or "async"
 
 class HealthPlanRequest(BaseModel):
     visit_id: Optional[str] = None
@@ -1,6 +1,10 @@
 
 # Common Lab Reference Ranges
 # These are general reference ranges and may vary by laboratory.
+import re
+from functools import lru_cache
+
+import numpy as np
 
 REFERENCE_RANGES = {
     "Hemoglobin": {
@@ -25,6 +29,9 @@ REFERENCE_RANGES = {
     "Glucose (Fasting)": {
         "all": {"min": 70, "max": 99, "unit": "mg/dL"}
     },
+    "Glucose": {
+        "all": {"min": 70, "max": 140, "unit": "mg/dL"} # Random / non-fasting sample
+    },
     "Hemoglobin A1c": {
         "all": {"min": 0, "max": 5.7, "unit": "%"} # < 5.7 Normal
     },
@@ -70,32 +77,289 @@ REFERENCE_RANGES = {
     }
 }
 
-def get_reference_range(test_name, gender="male", age=30):
+# Names and abbreviations used on lab reports, per REFERENCE_RANGES key
+# (the key itself, its abbreviation and its parenthesized expansion are added automatically;
+# an unqualified name like "glucose" never maps to a qualified test like "Glucose (Fasting)")
+TEST_ALIASES = {
+    "Hemoglobin": ["haemoglobin", "hgb", "hb", "hb%"],
+    "Hematocrit": ["haematocrit", "hct", "pcv", "packed cell volume"],
+    "WBC (White Blood Cells)": ["white blood cell count", "wbc count", "total wbc count", "total leukocyte count", "tlc", "leukocytes", "leucocytes"],
+    "RBC (Red Blood Cells)": ["red blood cell count", "rbc count", "total rbc count", "erythrocytes"],
+    "Platelets": ["platelet count", "plt", "platelet"],
+    "Glucose (Fasting)": ["fasting glucose", "glucose fasting", "glucose, fasting", "fasting blood sugar", "fasting blood glucose", "fasting plasma glucose", "fbs", "fbg", "fpg"],
+    "Glucose": ["blood glucose", "blood sugar", "random blood sugar", "random blood glucose", "random glucose", "glucose random", "glucose, random", "rbs", "rbg", "plasma glucose", "serum glucose"],
+    "Hemoglobin A1c": ["haemoglobin a1c", "hba1c", "hb a1c", "a1c", "glycated hemoglobin", "glycated haemoglobin", "glycosylated hemoglobin"],
+    "Total Cholesterol": ["cholesterol, total", "cholesterol total", "serum cholesterol", "cholesterol"],
+    "LDL Cholesterol": ["ldl", "ldl-c", "ldl cholesterol (calculated)", "ldl-cholesterol", "low density lipoprotein"],
+    "HDL Cholesterol": ["hdl", "hdl-c", "hdl-cholesterol", "high density lipoprotein"],
+    "Triglycerides": ["triglyceride", "tg", "serum triglycerides"],
+    "Sodium": ["na", "na+", "serum sodium"],
+    "Potassium": ["k", "k+", "serum potassium"],
+    "Creatinine": ["serum creatinine", "creat", "s. creatinine"],
+    "BUN (Blood Urea Nitrogen)": ["urea nitrogen", "blood urea nitrogen (bun)"],
+    "ALT (Alanine Aminotransferase)": ["sgpt", "alt (sgpt)", "sgpt (alt)", "alanine transaminase"],
+    "AST (Aspartate Aminotransferase)": ["sgot", "ast (sgot)", "sgot (ast)", "aspartate transaminase"],
+    "TSH (Thyroid Stimulating Hormone)": ["thyrotropin", "tsh, ultrasensitive", "ultrasensitive tsh"],
+    "Vitamin D (25-Hydroxy)": ["vitamin d", "25-hydroxy vitamin d", "25-oh vitamin d", "25(oh)d", "25(oh) vitamin d", "vit d", "vitamin d, 25-hydroxy", "vitamin d total"],
+}
+
+
+def normalize_test_name(name):
+    """Case- and whitespace-insensitive form of a test name"""
+    return " ".join(str(name).split()).lower()
+
+
+def build_alias_index():
+    """
+    Map every known test name/abbreviation (normalized) to its REFERENCE_RANGES key
+    """
+    index = {}
+    for key in REFERENCE_RANGES:
+        names = [key] + TEST_ALIASES.get(key, [])
+        if "(" in key:
+            # "ALT (Alanine Aminotransferase)" -> "ALT", "Alanine Aminotransferase"
+            # A single-word qualifier ("Fasting") is neither a name on its own nor
+            # optional: "Glucose" alone is a different test than "Glucose (Fasting)"
+            outer, inner = key.split("(", 1)
+            if len(inner.split()) > 1:
+                names.append(outer)
+                names.append(inner.rstrip(")"))
+        for name in names:
+            index.setdefault(normalize_test_name(name), key)
+    return index
+
+
+ALIAS_INDEX = build_alias_index()
+
+
+# Default age band (years, [min, max)) per band key; a band may override with "age_min"/"age_max"
+BAND_AGES = {"children": (0, 18)}
+ADULT_AGE = 30
+
+# Printed unit spellings that mean the same unit (conversions between units live in the unit registry)
+UNIT_SYNONYMS = {
+    "10^3/ul": ["x10^3/ul", "x10³/ul", "10³/ul", "k/ul", "thou/ul", "10^9/l", "x10^9/l", "10*3/ul", "x10e3/ul"],
+    "10^6/ul": ["x10^6/ul", "x10⁶/ul", "10⁶/ul", "m/ul", "mill/ul", "million/ul", "10^12/l", "x10^12/l", "10*6/ul", "x10e6/ul"],
+    "/ul": ["/cumm", "/mm3", "cells/ul", "/cmm"],
+    "miu/l": ["uiu/ml", "µiu/ml", "mu/l"],
+    "u/l": ["iu/l"],
+    "mg/dl": ["mg%", "mg/100ml"],
+    "g/dl": ["gm/dl", "g%", "gm%", "g/100ml"],
+}
+_UNIT_ALIASES = {alias: unit for unit, aliases in UNIT_SYNONYMS.items() for alias in aliases}
+
+
+@lru_cache(maxsize=1024)
+def normalize_unit(unit):
+    """Comparable form of a printed unit ("x10³/µL" -> "10^3/ul", "mcg/dL" -> "ug/dl")"""
+    if not unit:
+        return ""
+    unit = "".join(str(unit).split()).lower().replace("μ", "µ").replace("×", "x")
+    unit = unit.replace("mcl", "ul").replace("mcg", "ug").replace("µ", "u")
+    return _UNIT_ALIASES.get(unit, _UNIT_ALIASES.get(unit.replace("u", "µ"), unit))
+
+
+def _strip_qualifiers(name):
+    """Drop method/specimen qualifiers: "Serum Creatinine (Jaffe)" -> "creatinine" """
+    name = re.sub(r"\([^)]*\)|\[[^\]]*\]", " ", name)
+    name = re.sub(r"^(?:serum|plasma|blood|whole blood|s\.|p\.)\s+", "", normalize_test_name(name))
+    return name.strip(" ,:-")
+
+
+class ReferenceRangeEngine:
+    """
+    Indexed reference-range lookups with age/sex bands and a NumPy batch API
+
+    Bands are resolved once into arrays indexed by [test, sex, age group], so
+    flagging a panel is a handful of vectorized gathers and comparisons.
+    """
+
+    SEXES = ("male", "female")
+    FLAGS = np.array(["", "Low", "Normal", "High"], dtype=object)
+
+    def __init__(self, ranges=REFERENCE_RANGES):
+        self.tests = list(ranges)
+        self.test_ids = {test: i for i, test in enumerate(self.tests)}
+        self.alias_ids = {alias: self.test_ids[test] for alias, test in build_alias_index().items() if test in self.test_ids}
+        self.name_cache = {}
+
+        bands = []
+        for test, entries in ranges.items():
+            for key, band in entries.items():
+                age_min, age_max = BAND_AGES.get(key, (0, np.inf))
+                bands.append({
+                    "test": self.test_ids[test],
+                    "sex": key if key in self.SEXES else None,
+                    "age_min": band.get("age_min", age_min),
+                    "age_max": band.get("age_max", age_max),
+                    **band
+                })
+
+        # Age groups: intervals between every band boundary
+        bounds = sorted({b["age_min"] for b in bands} | {b["age_max"] for b in bands if np.isfinite(b["age_max"])} | {0})
+        self.age_bounds = np.array(bounds, dtype=float)
+
+        shape = (len(self.tests), len(self.SEXES), len(bounds))
+        self.low = np.full(shape, np.nan)
+        self.high = np.full(shape, np.nan)
+        self.units = np.full(shape, "", dtype=object)
+        self.unit_keys = np.full(shape, "", dtype=object)
+        for test_id in range(len(self.tests)):
+            candidates = [b for b in bands if b["test"] == test_id]
+            for sex_id, sex in enumerate(self.SEXES):
+                for group, age in enumerate(bounds):
+                    best = max(candidates, key=lambda b: self._band_rank(b, sex, age))
+                    self.low[test_id, sex_id, group] = best["min"]
+                    self.high[test_id, sex_id, group] = best["max"]
+                    self.units[test_id, sex_id, group] = best["unit"]
+                    self.unit_keys[test_id, sex_id, group] = normalize_unit(best["unit"])
+
+    @staticmethod
+    def _band_rank(band, sex, age):
+        # Age fit first, then the narrowest age band, then sex (exact > any > other)
+        age_fit = band["age_min"] <= age < band["age_max"]
+        sex_fit = 2 if band["sex"] == sex else 1 if band["sex"] is None else 0
+        return (age_fit, -(band["age_max"] - band["age_min"]), sex_fit)
+
+    def resolve_test(self, name):
+        """
+        REFERENCE_RANGES key for a printed test name (exact alias match, no substrings)
+
+        Args:
+            name: Test name as printed ("HGB", "SGPT", "Serum Creatinine")
+
+        Returns:
+            Test key or None
+        """
+        test_id = self._test_id(name)
+        return self.tests[test_id] if test_id >= 0 else None
+
+    def _test_id(self, name):
+        key = normalize_test_name(name or "")
+        test_id = self.name_cache.get(key)
+        if test_id is None:
+            test_id = self.alias_ids.get(key, self.alias_ids.get(_strip_qualifiers(key), -1))
+            self.name_cache[key] = test_id
+        return test_id
+
+    def _sex_id(self, gender):
+        return 1 if str(gender or "").lower() in ("female", "f", "woman") else 0
+
+    def _age_group(self, ages):
+        ages = np.where(np.isnan(ages), ADULT_AGE, ages)
+        return np.clip(np.searchsorted(self.age_bounds, ages, side="right") - 1, 0, len(self.age_bounds) - 1)
+
+    def lookup(self, test_name, gender="male", age=ADULT_AGE, unit=None):
+        """
+        Reference range for one test
+
+        Args:
+            test_name: Printed test name
+            gender: "male"/"female"
+            age: Age in years (None = adult)
+            unit: Unit of the value to compare (None = any)
+
+        Returns:
+            {"test", "min", "max", "unit"} or None (unknown test or incompatible unit)
+        """
+        test_id = self._test_id(test_name)
+        if test_id < 0:
+            return None
+        group = self._age_group(np.array([np.nan if age is None else age], dtype=float))[0]
+        index = (test_id, self._sex_id(gender), group)
+        if unit and normalize_unit(unit) != self.unit_keys[index]:
+            return None
+        return {"test": self.tests[test_id], "min": float(self.low[index]), "max": float(self.high[index]), "unit": self.units[index]}
+
+    def flag_batch(self, names, values, units=None, gender="male", age=None):
+        """
+        Flag a whole panel at once
+
+        Args:
+            names: Printed test names
+            values: Numeric values (NaN for missing)
+            units: Units per value (None/"" = assume the reference unit)
+            gender: One gender for the panel or one per entry
+            age: One age for the panel or one per entry (None = adult)
+
+        Returns:
+            Dict of arrays: test_id (-1 unknown), low, high, unit, flag ("" when not comparable)
+        """
+        count = len(names)
+        test_ids = np.fromiter((self._test_id(name) for name in names), dtype=np.int64, count=count)
+        values = np.asarray(values, dtype=float)
+        sex_ids = np.broadcast_to(
+            np.array([self._sex_id(g) for g in gender]) if isinstance(gender, (list, tuple)) else self._sex_id(gender), count
+        )
+        ages = np.broadcast_to(np.asarray([np.nan if a is None else a for a in age] if isinstance(age, (list, tuple))
+                                          else (np.nan if age is None else age), dtype=float), count)
+        groups = self._age_group(ages)
+
+        known = test_ids >= 0
+        safe_ids = np.where(known, test_ids, 0)
+        low = np.where(known, self.low[safe_ids, sex_ids, groups], np.nan)
+        high = np.where(known, self.high[safe_ids, sex_ids, groups], np.nan)
+        ref_units = np.where(known, self.units[safe_ids, sex_ids, groups], "")
+
+        comparable = known & ~np.isnan(values)
+        if units is not None:
+            unit_keys = np.array([normalize_unit(unit) for unit in units], dtype=object)
+            ref_keys = self.unit_keys[safe_ids, sex_ids, groups]
+            comparable &= (unit_keys == "") | (unit_keys == ref_keys)
+
+        # 0 = not comparable, 1 = Low, 2 = Normal, 3 = High
+        codes = np.where(values < low, 1, np.where(values > high, 3, 2))
+        codes = np.where(comparable, codes, 0)
+        return {"test_id": test_ids, "low": low, "high": high, "unit": ref_units, "flag": self.FLAGS[codes]}
+
+    def flag_panel(self, labs, gender="male", age=None):
+        """
+        Annotate lab dicts with reference_range_stored and flag_calculated
+
+        Args:
+            labs: Lab entries ({"name", "value", "unit", ...}); annotated in place
+            gender: Patient gender
+            age: Patient age in years (None = adult)
+
+        Returns:
+            The same list
+        """
+        if not labs:
+            return labs
+        # Entries canonicalized by the unit registry are compared in their canonical unit
+        canonical = [lab.get("canonical_value") is not None for lab in labs]
+        result = self.flag_batch(
+            [lab.get("analyte") or lab.get("name", "") for lab in labs],
+            [lab["canonical_value"] if is_canonical else parse_number(lab.get("value")) for lab, is_canonical in zip(labs, canonical)],
+            [lab.get("canonical_unit") if is_canonical else lab.get("unit") for lab, is_canonical in zip(labs, canonical)],
+            gender, age
+        )
+        for i, lab in enumerate(labs):
+            if result["test_id"][i] < 0:
+                continue
+            lab["reference_range_stored"] = f"{result['low'][i]:g} - {result['high'][i]:g} {result['unit'][i]}"
+            if result["flag"][i]:
+                lab["flag_calculated"] = result["flag"][i]
+        return labs
+
+
+def parse_number(value):
+    """First number in a value ("13.2", "<0.5", 13.2), NaN if none"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    match = re.search(r"[-+]?\d*\.\d+|\d+", str(value or ""))
+    return float(match.group()) if match else np.nan
+
+
+# Global engine instance
+reference_engine = ReferenceRangeEngine()
+
+
+def get_reference_range(test_name, gender="male", age=ADULT_AGE):
     """
     Helper to get the range for a specific test, gender, and age.
     """
-    # Normalize test name (simple substring match for now)
-    test_key = None
-    for key in REFERENCE_RANGES.keys():
-        if key.lower() in test_name.lower() or test_name.lower() in key.lower():
-            test_key = key
-            break
-    
-    if not test_key:
+    ref = reference_engine.lookup(test_name, gender, age)
+    if ref is None:
         return None
-        
-    ranges = REFERENCE_RANGES[test_key]
-    
-    # Check gender specific
-    gender = gender.lower()
-    if gender in ranges:
-        return ranges[gender]
-    elif "all" in ranges:
-        return ranges["all"]
-    elif gender == "female" and "male" in ranges:
-         # Fallback if only male defined (unlikely but safe)
-         return ranges["male"]
-    elif gender == "male" and "female" in ranges:
-        return ranges["female"]
-        
-    return None
+    return {"min": ref["min"], "max": ref["max"], "unit": ref["unit"]}
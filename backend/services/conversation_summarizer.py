@@ -0,0 +1,184 @@
+"""
+Rolling Conversation Summarizer
+Keeps chat prompts a flat size: once the unsummarized part of a conversation
+passes a token budget, older turns are folded into a running summary stored
+on the conversation document (summary, summarized_count). Prompts are built
+as that summary plus the recent messages.
+
+Summarization runs in a background task, never on the request path.
+"""
+import asyncio
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from services.message_store import MessageStore, conversation_messages
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 chars per token for Latin text, 2 for Bengali)"""
+    ascii_chars = sum(1 for char in text if char.isascii())
+    return ascii_chars // 4 + (len(text) - ascii_chars) // 2 + 1
+
+
+class ConversationSummarizer:
+    """Schedules and applies incremental summaries of long conversations"""
+
+    def __init__(self, store: MessageStore, token_budget: int = 1200, keep_recent: int = 6):
+        """
+        Initialize summarizer
+
+        Args:
+            store: Message store of the conversations collection
+            token_budget: Max tokens of unsummarized history sent with a prompt
+            keep_recent: Messages always left out of the summary
+        """
+        self.store = store
+        self.token_budget = token_budget
+        self.keep_recent = keep_recent
+        self.in_flight: set = set()
+        self.tasks: set = set()
+
+        # Metrics
+        self.scheduled = 0
+        self.completed = 0
+        self.failed = 0
+        self.folded_messages = 0
+
+    async def recent_messages(self, database, doc: Dict[str, Any]) -> List[dict]:
+        """
+        Messages to send verbatim: not yet summarized and within the token budget
+
+        If the summary lags behind the start of the stored window, the
+        messages in between are read from the segments, so no turn is left
+        out of both the summary and the prompt.
+
+        Args:
+            database: Motor database
+            doc: Conversation with a (sliced) messages array, message_count and summarized_count
+
+        Returns:
+            Messages oldest first
+        """
+        messages = doc.get("messages") or []
+        total = doc.get("message_count", len(messages))
+        first_index = total - len(messages)
+        summarized = doc.get("summarized_count", 0)
+        unsummarized = messages[max(0, summarized - first_index):]
+
+        recent = self._within_budget(unsummarized)
+        if summarized < first_index and len(recent) == len(unsummarized):
+            # Budget left and a gap between the summary and the window
+            history = await self.store.history(database, doc["_id"], limit=total - summarized)
+            # Conversations from before segments were written have no history to fall back on
+            if len(history) > len(unsummarized):
+                recent = self._within_budget(history)
+        return recent
+
+    def _within_budget(self, messages: List[dict]) -> List[dict]:
+        """Newest messages first until the budget is spent (keeps prompts flat if the summary lags)"""
+        recent = []
+        tokens = 0
+        for message in reversed(messages):
+            tokens += estimate_tokens(message.get("content", ""))
+            if recent and tokens > self.token_budget:
+                break
+            recent.append(message)
+        recent.reverse()
+        return recent
+
+    def needs_summary(self, messages: List[dict]) -> bool:
+        """True if the unsummarized messages exceed the token budget"""
+        if len(messages) <= self.keep_recent:
+            return False
+        return sum(estimate_tokens(m.get("content", "")) for m in messages) > self.token_budget
+
+    def schedule(self, database, conversation_id, summarize_fn):
+        """
+        Summarize a conversation in the background (at most one job per conversation)
+
+        Args:
+            database: Motor database
+            conversation_id: Conversation _id
+            summarize_fn: async (previous_summary, messages, language) -> summary text
+        """
+        if conversation_id is None or conversation_id in self.in_flight:
+            return
+        self.in_flight.add(conversation_id)
+        self.scheduled += 1
+        task = asyncio.create_task(self._run(database, conversation_id, summarize_fn))
+        # Keep a reference until done so the task is not garbage collected
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _run(self, database, conversation_id, summarize_fn):
+        try:
+            await self.summarize(database, conversation_id, summarize_fn)
+        except Exception as e:
+            self.failed += 1
+            print(f"[SUMMARIZER] Failed for {conversation_id}: {e}")
+        finally:
+            self.in_flight.discard(conversation_id)
+
+    async def summarize(self, database, conversation_id, summarize_fn) -> Optional[str]:
+        """
+        Fold all but the most recent messages into the running summary
+
+        Args:
+            database: Motor database
+            conversation_id: Conversation _id
+            summarize_fn: async (previous_summary, messages, language) -> summary text
+
+        Returns:
+            The new summary, or None if nothing was folded
+        """
+        collection = database[self.store.collection_name]
+        doc = await collection.find_one(
+            {"_id": conversation_id},
+            {"summary": 1, "summarized_count": 1, "message_count": 1, "language": 1}
+        )
+        if not doc or "message_count" not in doc:
+            return None
+
+        start = doc.get("summarized_count", 0)
+        pending = await self.store.history(database, conversation_id, limit=doc["message_count"] - start)
+        to_fold = pending[:-self.keep_recent] if self.keep_recent else pending
+        if not to_fold:
+            return None
+
+        summary = await summarize_fn(doc.get("summary"), to_fold, doc.get("language", "English"))
+
+        # Only apply if no other worker moved the summary meanwhile
+        result = await collection.update_one(
+            {"_id": conversation_id, "summarized_count": {"$in": [start, None]} if start == 0 else start},
+            {"$set": {
+                "summary": summary,
+                "summarized_count": start + len(to_fold),
+                "summary_updated_at": datetime.utcnow()
+            }}
+        )
+        if result.modified_count:
+            self.completed += 1
+            self.folded_messages += len(to_fold)
+            print(f"[SUMMARIZER] Folded {len(to_fold)} messages of {conversation_id}")
+        return summary
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get summarization statistics"""
+        return {
+            "token_budget": self.token_budget,
+            "keep_recent": self.keep_recent,
+            "in_flight": len(self.in_flight),
+            "scheduled": self.scheduled,
+            "completed": self.completed,
+            "failed": self.failed,
+            "folded_messages": self.folded_messages
+        }
+
+
+# Global summarizer for /api/voice-chat conversations
+conversation_summarizer = ConversationSummarizer(
+    conversation_messages,
+    token_budget=int(os.getenv("SUMMARY_TOKEN_BUDGET", "1200")),
+    keep_recent=int(os.getenv("SUMMARY_KEEP_RECENT", "6"))
+)
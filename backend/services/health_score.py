@@ -0,0 +1,322 @@
+"""
+Health Score
+Daily health score of a tracking log plus a materialized per-profile rollup
+
+Each daily log is scored once when it is written (save_daily_log, Google Fit
+sync) and keeps the result in its "score" field. The health_scores collection
+holds one rollup document per (user_id, profile_id):
+    points       {date: score} for the 90 days up to the latest logged date
+    score        score of the latest logged date
+    averages     {"7d", "30d", "90d"} mean scores over windows ending at as_of
+    slope        least-squares score change per day over the last
+                 HEALTH_TREND_WINDOW days
+    trend        "Improving" / "Declining" / "Stable" from the slope
+so /api/tracking/score is a single indexed read. Rollups missing for older
+data are rebuilt from the logs on first read.
+"""
+import os
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from pymongo import DESCENDING, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+SCORES_COLLECTION = "health_scores"
+ROLLUP_DAYS = 90
+AVERAGE_WINDOWS = (7, 30, 90)
+HEALTH_TREND_WINDOW = int(os.getenv("HEALTH_TREND_WINDOW", "30"))
+HEALTH_TREND_MIN_SLOPE = float(os.getenv("HEALTH_TREND_MIN_SLOPE", "0.1"))
+
+
+def calculate_daily_score(log: Dict[str, Any]) -> int:
+    """
+    Score one daily log (0-100)
+
+    Args:
+        log: Daily log fields (sleep, hydration, pain, energy, vitals)
+
+    Returns:
+        Score, starting from a base of 70
+    """
+    score = 70 # Base score
+
+    # Sleep
+    sleep = log.get("sleep_hours", 0) or 0
+    if sleep >= 7 and sleep <= 9: score += 10
+    elif sleep >= 5: score += 5
+    else: score -= 10
+
+    # Hydration
+    water = log.get("hydration_liters", 0) or 0
+    if water >= 2: score += 5
+    elif water < 1: score -= 5
+
+    # Pain
+    pain = log.get("pain", 0) or 0
+    if pain == 0: score += 10
+    elif pain <= 3: score += 5
+    elif pain <= 6: score -= 5
+    else: score -= 15
+
+    # Energy
+    energy = log.get("energy", 5) or 5
+    if energy >= 8: score += 5
+    elif energy <= 3: score -= 5
+
+    # Fever (Temp in C)
+    fever = log.get("fever")
+    if fever:
+        if 36.1 <= fever <= 37.2: score += 5
+        elif fever > 37.5: score -= 10
+
+    # Heart Rate
+    hr = log.get("heart_rate_avg")
+    if hr:
+        if 60 <= hr <= 100: score += 5
+        else: score -= 5
+
+    # Blood Pressure
+    sys = log.get("blood_pressure_systolic")
+    dia = log.get("blood_pressure_diastolic")
+    if sys and dia:
+        if 90 <= sys <= 120 and 60 <= dia <= 80: score += 10
+        elif sys > 140 or dia > 90: score -= 10
+
+    return min(100, max(0, score))
+
+
+def _parse_date(value: Any) -> Optional[datetime]:
+    try:
+        return datetime.strptime(str(value), "%Y-%m-%d")
+    except ValueError:
+        return None
+
+
+def rollup_fields(points: Dict[str, float]) -> Dict[str, Any]:
+    """
+    Rollup fields for a {date: score} map
+
+    Args:
+        points: Daily scores keyed by "YYYY-MM-DD"
+
+    Returns:
+        points (pruned to ROLLUP_DAYS), score, as_of, days_logged, averages, slope, trend
+    """
+    days = {date: _parse_date(date) for date in points}
+    days = {date: day for date, day in days.items() if day is not None}
+    if not days:
+        return {"points": {}, "score": None, "as_of": None, "days_logged": 0,
+                "averages": {f"{w}d": None for w in AVERAGE_WINDOWS}, "slope": 0.0, "trend": "No data"}
+
+    as_of = max(days.values())
+    offsets = {date: (as_of - day).days for date, day in days.items()}
+    kept = {date: points[date] for date in sorted(days) if offsets[date] < ROLLUP_DAYS}
+
+    averages = {}
+    for window in AVERAGE_WINDOWS:
+        values = [score for date, score in kept.items() if offsets[date] < window]
+        averages[f"{window}d"] = round(sum(values) / len(values), 1) if values else None
+
+    # Least-squares slope (score per day) over the trend window
+    xs = [-offsets[date] for date in kept if offsets[date] < HEALTH_TREND_WINDOW]
+    ys = [kept[date] for date in kept if offsets[date] < HEALTH_TREND_WINDOW]
+    slope = 0.0
+    if len(set(xs)) > 1:
+        mean_x, mean_y = sum(xs) / len(xs), sum(ys) / len(ys)
+        slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / sum((x - mean_x) ** 2 for x in xs)
+
+    trend = "Stable"
+    if slope >= HEALTH_TREND_MIN_SLOPE:
+        trend = "Improving"
+    elif slope <= -HEALTH_TREND_MIN_SLOPE:
+        trend = "Declining"
+
+    latest = as_of.strftime("%Y-%m-%d")
+    return {
+        "points": kept,
+        "score": kept[latest],
+        "as_of": latest,
+        "days_logged": len(kept),
+        "averages": averages,
+        "slope": round(slope, 3),
+        "trend": trend
+    }
+
+
+class HealthScoreStore:
+    """Per-log scores and per-profile rolling score rollups"""
+
+    def __init__(self, collection_name: str = SCORES_COLLECTION, max_retries: int = 5):
+        """
+        Initialize store
+
+        Args:
+            collection_name: Rollup collection
+            max_retries: Attempts per rollup update when a concurrent write wins
+        """
+        self.collection_name = collection_name
+        self.max_retries = max_retries
+
+        # Metrics
+        self.scored = 0
+        self.rollup_updates = 0
+        self.conflicts = 0
+        self.rebuilds = 0
+        self.reads = 0
+
+    def _key(self, user_id: str, profile_id: Optional[str]) -> Dict[str, Any]:
+        return {"user_id": user_id, "profile_id": profile_id or None}
+
+    async def record(self, database, log: Dict[str, Any]) -> int:
+        """
+        Score a stored daily log, save the score on it and update the rollup
+
+        Args:
+            database: Motor database
+            log: Daily log document as stored (with _id)
+
+        Returns:
+            The score
+        """
+        score = calculate_daily_score(log)
+        await database["daily_logs"].update_one({"_id": log["_id"]}, {"$set": {"score": score}})
+        self.scored += 1
+        await self.update_rollup(database, log["user_id"], log.get("profile_id"), log["date"], score)
+        return score
+
+    async def _merge(self, database, key: Dict[str, Any], points: Dict[str, float],
+                     override: bool = True) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """
+        Merge daily scores into an existing rollup (version-guarded, retried on conflicts)
+
+        Args:
+            database: Motor database
+            key: Rollup key
+            points: {date: score} to merge
+            override: True if these scores replace stored ones for the same dates
+
+        Returns:
+            (rollup exists, written rollup fields or None if every attempt lost a race)
+        """
+        collection = database[self.collection_name]
+        for _ in range(self.max_retries):
+            doc = await collection.find_one(key)
+            if doc is None:
+                return False, None
+            stored = doc.get("points") or {}
+            merged = {**stored, **points} if override else {**points, **stored}
+            fields = rollup_fields(merged)
+            fields["updated_at"] = datetime.utcnow()
+            result = await collection.update_one(
+                {"_id": doc["_id"], "version": doc.get("version", 0)},
+                {"$set": fields, "$inc": {"version": 1}}
+            )
+            if result.matched_count == 1:
+                self.rollup_updates += 1
+                return True, fields
+            # Another log for this profile was saved in between: re-read and re-apply
+            self.conflicts += 1
+        print(f"[HEALTH-SCORE] Gave up updating rollup for {key['user_id']}/{key['profile_id']} after {self.max_retries} attempts")
+        return True, None
+
+    async def update_rollup(self, database, user_id: str, profile_id: Optional[str], date: str, score: float) -> bool:
+        """
+        Set one day's score in the profile rollup and recompute its aggregates
+
+        Args:
+            database: Motor database
+            user_id: User ID
+            profile_id: Profile ID (None = the user's logs without a profile)
+            date: Log date ("YYYY-MM-DD")
+            score: Daily score
+
+        Returns:
+            True if the rollup was written
+        """
+        if _parse_date(date) is None:
+            return False
+        exists, fields = await self._merge(database, self._key(user_id, profile_id), {date: score})
+        if not exists:
+            # First rollup for the profile: include the logs saved before rollups existed
+            return await self.rebuild(database, user_id, profile_id) is not None
+        return fields is not None
+
+    async def rebuild(self, database, user_id: str, profile_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Build a rollup from the stored logs (scoring logs saved before scores were stored)
+
+        Args:
+            database: Motor database
+            user_id: User ID
+            profile_id: Profile ID
+
+        Returns:
+            The rollup document, or None if the profile has no logs
+        """
+        key = self._key(user_id, profile_id)
+        cursor = database["daily_logs"].find(key).sort("date", DESCENDING).limit(ROLLUP_DAYS)
+        logs = await cursor.to_list(length=ROLLUP_DAYS)
+        if not logs:
+            return None
+
+        points = {}
+        writes = []
+        for log in logs:
+            score = log.get("score")
+            if score is None:
+                score = calculate_daily_score(log)
+                writes.append(UpdateOne({"_id": log["_id"]}, {"$set": {"score": score}}))
+            points.setdefault(log["date"], score)
+        if writes:
+            await database["daily_logs"].bulk_write(writes, ordered=False)
+            self.scored += len(writes)
+
+        fields = rollup_fields(points)
+        fields["updated_at"] = datetime.utcnow()
+        try:
+            # Only create: an existing rollup is never overwritten from a possibly older read
+            await database[self.collection_name].insert_one({**key, **fields, "version": 1})
+        except DuplicateKeyError:
+            # A concurrent save or rebuild created it first: merge these points,
+            # keeping its scores for the dates it already has
+            _, merged = await self._merge(database, key, points, override=False)
+            fields = merged or fields
+        self.rebuilds += 1
+        print(f"[HEALTH-SCORE] Rebuilt rollup for {user_id}/{profile_id} from {len(logs)} logs")
+        return {**key, **fields}
+
+    async def get(self, database, user_id: str, profile_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Rollup for a profile (built from the logs if missing)
+
+        Args:
+            database: Motor database
+            user_id: User ID
+            profile_id: Profile ID
+
+        Returns:
+            Rollup document without points, or None if there are no logs
+        """
+        self.reads += 1
+        doc = await database[self.collection_name].find_one(
+            self._key(user_id, profile_id), {"_id": 0, "points": 0, "version": 0}
+        )
+        if doc is None:
+            doc = await self.rebuild(database, user_id, profile_id)
+            if doc is not None:
+                doc.pop("points", None)
+        return doc
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get health score statistics"""
+        return {
+            "scored": self.scored,
+            "rollup_updates": self.rollup_updates,
+            "conflicts": self.conflicts,
+            "rebuilds": self.rebuilds,
+            "reads": self.reads
+        }
+
+
+# Global store instance
+health_scores = HealthScoreStore()
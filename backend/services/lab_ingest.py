@@ -0,0 +1,317 @@
+"""
+Lab Report Ingestion
+Process-pool pipeline that turns an uploaded lab report into text and/or
+vision-ready images without blocking the event loop.
+
+Stages (per page; each worker takes one contiguous page range and parses
+the PDF, written once to a temporary file, a single time):
+1. Text layer extraction (pypdf)
+2. Local OCR for scanned pages (pdf2image + Tesseract)
+3. Page image downscaled and re-encoded as JPEG for the vision model,
+   only when neither text nor OCR produced enough text
+
+Uploaded images skip to stage 3. Every range runs under a timeout of
+LAB_PAGE_TIMEOUT per page; a range that times out or fails is reported and
+skipped instead of failing the whole upload, and a timeout recycles the pool
+so the hung worker does not keep holding capacity.
+"""
+import asyncio
+import base64
+import io
+import math
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+
+LAB_INGEST_WORKERS = int(os.getenv("LAB_INGEST_WORKERS", str(min(4, os.cpu_count() or 1))))
+LAB_PAGE_TIMEOUT = float(os.getenv("LAB_PAGE_TIMEOUT", "30"))
+LAB_MAX_PAGES = int(os.getenv("LAB_MAX_PAGES", "20"))
+LAB_MIN_PAGE_CHARS = int(os.getenv("LAB_MIN_PAGE_CHARS", "50"))
+LAB_OCR_ENABLED = os.getenv("LAB_OCR_ENABLED", "true").lower() == "true"
+LAB_OCR_LANG = os.getenv("LAB_OCR_LANG", "eng")
+LAB_OCR_DPI = int(os.getenv("LAB_OCR_DPI", "200"))
+LAB_IMAGE_MAX_SIDE = int(os.getenv("LAB_IMAGE_MAX_SIDE", "1600"))
+LAB_IMAGE_QUALITY = int(os.getenv("LAB_IMAGE_QUALITY", "80"))
+
+
+# --- Worker functions (run in the process pool, must stay module-level) ---
+
+def encode_image(image, max_side: int = LAB_IMAGE_MAX_SIDE, quality: int = LAB_IMAGE_QUALITY) -> str:
+    """
+    Downscale a PIL image so its longest side is at most max_side and
+    re-encode it as JPEG
+
+    Returns:
+        Base64 JPEG data
+    """
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    if max(image.size) > max_side:
+        image.thumbnail((max_side, max_side))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality, optimize=True)
+    return base64.b64encode(buffer.getvalue()).decode("utf-8")
+
+
+def prepare_image(data: bytes, max_side: int = LAB_IMAGE_MAX_SIDE, quality: int = LAB_IMAGE_QUALITY) -> Dict[str, Any]:
+    """Downscale and re-encode an uploaded image for the vision model"""
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(data))
+    return {"page": 0, "text": "", "source": "image", "images": [encode_image(image, max_side, quality)]}
+
+
+def count_pages(path: str) -> int:
+    """Number of pages in a PDF"""
+    from pypdf import PdfReader
+
+    return len(PdfReader(path).pages)
+
+
+def extract_page(reader, path: str, index: int, min_chars: int = LAB_MIN_PAGE_CHARS, ocr_enabled: bool = LAB_OCR_ENABLED,
+                 ocr_lang: str = LAB_OCR_LANG, dpi: int = LAB_OCR_DPI, max_side: int = LAB_IMAGE_MAX_SIDE,
+                 quality: int = LAB_IMAGE_QUALITY, timeout: float = LAB_PAGE_TIMEOUT) -> Dict[str, Any]:
+    """
+    Extract one PDF page: text layer, then OCR, then a page image
+
+    Args:
+        reader: PdfReader of the document
+        path: PDF file (rendered by pdftoppm for OCR)
+        index: Zero-based page index
+        min_chars: Text shorter than this counts as a scanned page
+        ocr_enabled: Try Tesseract before falling back to an image
+        ocr_lang: Tesseract language(s)
+        dpi: Render resolution for OCR
+        max_side: Longest side of images sent to the vision model
+        quality: JPEG quality of those images
+        timeout: Seconds allowed for each external tool (pdftoppm, tesseract)
+
+    Returns:
+        {"page", "text", "source": "text"|"ocr"|"image"|"empty", "images"}
+    """
+    page = reader.pages[index]
+    text = page.extract_text() or ""
+    if len(text.strip()) >= min_chars:
+        return {"page": index, "text": text, "source": "text", "images": []}
+
+    rendered = None
+    try:
+        from pdf2image import convert_from_path
+
+        rendered = convert_from_path(path, dpi=dpi, first_page=index + 1, last_page=index + 1, timeout=timeout)[0]
+    except Exception as e:
+        print(f"[LAB-INGEST] Could not render page {index + 1}: {e}")
+
+    if rendered is not None and ocr_enabled:
+        try:
+            import pytesseract
+
+            ocr_text = pytesseract.image_to_string(rendered, lang=ocr_lang, timeout=timeout)
+            if len(ocr_text.strip()) >= min_chars:
+                return {"page": index, "text": ocr_text, "source": "ocr", "images": []}
+        except Exception as e:
+            print(f"[LAB-INGEST] OCR failed on page {index + 1}: {e}")
+
+    # Vision fallback: the rendered page, or the embedded images if rendering is unavailable
+    images = []
+    if rendered is not None:
+        images.append(encode_image(rendered, max_side, quality))
+    else:
+        from PIL import Image
+
+        for embedded in getattr(page, "images", []):
+            try:
+                images.append(encode_image(Image.open(io.BytesIO(embedded.data)), max_side, quality))
+            except Exception as img_err:
+                print(f"[LAB-INGEST] Error processing a PDF image: {img_err}")
+
+    return {"page": index, "text": text, "source": "image" if images else "empty", "images": images}
+
+
+def extract_pages(path: str, start: int, stop: int, *options) -> List[Dict[str, Any]]:
+    """
+    Extract a range of PDF pages, parsing the document once
+
+    Args:
+        path: PDF file
+        start: First zero-based page index
+        stop: Page index after the last one
+        *options: extract_page options (min_chars, ocr_enabled, ...)
+
+    Returns:
+        One extract_page result per page
+    """
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    return [extract_page(reader, path, index, *options) for index in range(start, stop)]
+
+
+# --- Async pipeline ---
+
+class LabIngestPipeline:
+    """Runs lab report extraction in a process pool"""
+
+    def __init__(self, workers: int = LAB_INGEST_WORKERS, page_timeout: float = LAB_PAGE_TIMEOUT,
+                 max_pages: int = LAB_MAX_PAGES):
+        """
+        Initialize pipeline
+
+        Args:
+            workers: Worker processes
+            page_timeout: Seconds allowed per page
+            max_pages: Pages processed per PDF (the rest are ignored)
+        """
+        self.workers = max(1, workers)
+        self.page_timeout = page_timeout
+        self.max_pages = max_pages
+        self.executor: Optional[ProcessPoolExecutor] = None
+
+        # Metrics
+        self.documents = 0
+        self.pages = 0
+        self.sources: Dict[str, int] = {}
+        self.timeouts = 0
+        self.errors = 0
+        self.pool_restarts = 0
+        self.total_seconds = 0.0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self.executor is None:
+            # spawn: workers must not inherit the event loop or driver threads
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self.executor
+
+    def _discard_executor(self, executor: ProcessPoolExecutor, terminate: bool = False):
+        """
+        Drop a pool that can no longer run tasks (the next task starts a fresh one)
+
+        Args:
+            executor: The pool to drop
+            terminate: Kill its workers too (a timed-out task keeps its worker busy otherwise)
+        """
+        if self.executor is executor:
+            self.executor = None
+            self.pool_restarts += 1
+            print(f"[LAB-INGEST] Worker pool {'recycled' if terminate else 'broken'}, starting a new one")
+        if terminate:
+            # Tasks of other uploads on this pool fail with BrokenProcessPool and are retried
+            for process in list((getattr(executor, "_processes", None) or {}).values()):
+                process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _run(self, fn, *args, timeout: Optional[float] = None):
+        loop = asyncio.get_running_loop()
+        for attempt in range(2):
+            executor = self._get_executor()
+            try:
+                return await asyncio.wait_for(loop.run_in_executor(executor, fn, *args), timeout)
+            except BrokenProcessPool:
+                # A worker died (out of memory, crash in poppler/PIL): the pool rejects every
+                # later task, so replace it and retry once
+                self._discard_executor(executor)
+                if attempt == 1:
+                    raise
+            except asyncio.TimeoutError:
+                # wait_for only stops waiting; the worker keeps running the hung task
+                self._discard_executor(executor, terminate=True)
+                raise
+
+    async def _pages(self, path: str, start: int, stop: int) -> List[Dict[str, Any]]:
+        """Extract a page range in one worker; every page of a failed range is reported as such"""
+        try:
+            # Tools inside the worker get the page budget; the outer timeout also covers parsing
+            return await self._run(extract_pages, path, start, stop, LAB_MIN_PAGE_CHARS, LAB_OCR_ENABLED,
+                                   LAB_OCR_LANG, LAB_OCR_DPI, LAB_IMAGE_MAX_SIDE, LAB_IMAGE_QUALITY,
+                                   self.page_timeout, timeout=self.page_timeout * (stop - start) + 5)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            print(f"[LAB-INGEST] Pages {start + 1}-{stop} timed out after {self.page_timeout}s per page")
+            source = "timeout"
+        except Exception as e:
+            self.errors += 1
+            print(f"[LAB-INGEST] Pages {start + 1}-{stop} failed: {e}")
+            source = "error"
+        return [{"page": index, "text": "", "source": source, "images": []} for index in range(start, stop)]
+
+    async def _ingest_pdf(self, data: bytes) -> Tuple[int, List[Dict[str, Any]]]:
+        """(total pages, page results); workers read the file from disk instead of receiving it over IPC"""
+        fd, path = tempfile.mkstemp(suffix=".pdf", prefix="lab_ingest_")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                await asyncio.to_thread(f.write, data)
+            total_pages = await self._run(count_pages, path, timeout=self.page_timeout)
+            pages = min(total_pages, self.max_pages)
+            # One contiguous range per worker
+            size = max(1, math.ceil(pages / self.workers))
+            ranges = [(start, min(start + size, pages)) for start in range(0, pages, size)]
+            chunks = await asyncio.gather(*(self._pages(path, start, stop) for start, stop in ranges))
+            if total_pages > self.max_pages:
+                print(f"[LAB-INGEST] Only the first {self.max_pages} of {total_pages} pages processed")
+            return total_pages, [result for chunk in chunks for result in chunk]
+        finally:
+            os.unlink(path)
+
+    async def ingest(self, data: bytes, mime_type: str) -> Dict[str, Any]:
+        """
+        Extract text and vision images from an uploaded report
+
+        Args:
+            data: File bytes
+            mime_type: application/pdf or image/*
+
+        Returns:
+            {"text", "images" (base64 JPEG), "pages" (per-page source), "total_pages"}
+        """
+        start = time.time()
+        if mime_type == "application/pdf":
+            total_pages, results = await self._ingest_pdf(data)
+        else:
+            total_pages = 1
+            results = [await self._run(prepare_image, data, LAB_IMAGE_MAX_SIDE, LAB_IMAGE_QUALITY,
+                                       timeout=self.page_timeout)]
+
+        self.documents += 1
+        self.pages += len(results)
+        for result in results:
+            self.sources[result["source"]] = self.sources.get(result["source"], 0) + 1
+        self.total_seconds += time.time() - start
+
+        text = "\n".join(result["text"] for result in results if result["source"] in ("text", "ocr"))
+        images = [image for result in results for image in result["images"]]
+        print(f"[LAB-INGEST] {len(results)} page(s) in {time.time() - start:.2f}s: "
+              f"{', '.join(result['source'] for result in results)}")
+        return {
+            "text": text,
+            "images": images,
+            "pages": [{"page": result["page"] + 1, "source": result["source"]} for result in results],
+            "total_pages": total_pages
+        }
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get ingestion statistics"""
+        return {
+            "workers": self.workers,
+            "page_timeout": self.page_timeout,
+            "documents": self.documents,
+            "pages": self.pages,
+            "sources": dict(self.sources),
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "pool_restarts": self.pool_restarts,
+            "avg_document_seconds": round(self.total_seconds / self.documents, 3) if self.documents > 0 else 0
+        }
+
+
+# Global pipeline instance (worker processes start on first use)
+lab_ingest = LabIngestPipeline()
@@ -0,0 +1,286 @@
+"""
+Deterministic Lab Interpreter
+Abnormal detection, risk signals and templated explanations computed
+locally, so interpreting a panel needs no LLM call.
+
+Input entries are canonicalized (lab_units) and flagged (reference_data
+flag_panel) by the caller. Entries without a known analyte fall back to the
+printed reference range ("range"/"reference_range"); anything still without
+a range is listed as unassessed.
+
+Risk rules, per-analyte explanations and sentence templates live in
+data/lab_rules.json (English and Bengali). A rule marked "critical" turns
+the entry's flag into "Critical".
+
+The LLM is only used for an optional narrative. Narratives requested in the
+background are tracked here by id (see schedule_narrative/get_narrative).
+"""
+import asyncio
+import json
+import math
+import os
+import re
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from cachetools import TTLCache
+
+from reference_data import parse_number
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "lab_rules.json")
+LAB_NARRATIVE_TTL = int(os.getenv("LAB_NARRATIVE_TTL", "3600"))
+
+_SEVERITY_RANK = {"moderate": 1, "high": 2, "critical": 3}
+_OPS = {
+    ">": lambda value, bound: value > bound,
+    ">=": lambda value, bound: value >= bound,
+    "<": lambda value, bound: value < bound,
+    "<=": lambda value, bound: value <= bound,
+}
+_NUMBER = r"\d+(?:\.\d+)?"
+_RANGE_BETWEEN = re.compile(rf"({_NUMBER})\s*(?:-|–|—|to)\s*({_NUMBER})", re.IGNORECASE)
+_RANGE_BOUND = re.compile(rf"(<=|>=|<|>|≤|≥|up\s*to)\s*({_NUMBER})", re.IGNORECASE)
+
+
+def parse_range(text: Optional[str]) -> Optional[Tuple[float, float]]:
+    """
+    (low, high) from a printed reference range ("13.5-17.5", "<200", "> 40", "up to 35")
+
+    Args:
+        text: Range text
+
+    Returns:
+        (low, high) with -inf/inf for open ends, or None if unparseable
+    """
+    text = str(text or "")
+    match = _RANGE_BETWEEN.search(text)
+    if match:
+        return float(match.group(1)), float(match.group(2))
+    match = _RANGE_BOUND.search(text)
+    if match:
+        bound = float(match.group(2))
+        if match.group(1) in (">", ">=", "≥"):
+            return bound, math.inf
+        return -math.inf, bound
+    return None
+
+
+class LabInterpreter:
+    """Rule-based lab panel interpretation with background narrative jobs"""
+
+    def __init__(self, rules_path: str = DEFAULT_RULES_PATH, narrative_ttl: int = LAB_NARRATIVE_TTL):
+        """
+        Initialize interpreter
+
+        Args:
+            rules_path: JSON rule table ({"rules": [...], "meanings": {...}, "templates": {...}})
+            narrative_ttl: Seconds a background narrative stays retrievable
+        """
+        with open(rules_path, encoding="utf-8") as f:
+            table = json.load(f)
+
+        # analyte -> rules, most severe first
+        self.rules: Dict[str, List[dict]] = {}
+        for rule in table["rules"]:
+            self.rules.setdefault(rule["analyte"], []).append(rule)
+        for rules in self.rules.values():
+            rules.sort(key=lambda rule: -_SEVERITY_RANK[rule["severity"]])
+        self.meanings: Dict[str, Dict[str, Dict[str, str]]] = table.get("meanings", {})
+        self.templates: Dict[str, Dict[str, Any]] = table["templates"]
+
+        # narrative_id -> {"status": "pending"|"ready"|"failed", "narrative", "created_at"}
+        self.narratives: TTLCache = TTLCache(maxsize=1000, ttl=narrative_ttl)
+        self.tasks = set()
+
+        # Metrics
+        self.panels = 0
+        self.all_normal = 0
+        self.critical_panels = 0
+        self.total_us = 0.0
+        self.narratives_scheduled = 0
+        self.narratives_failed = 0
+
+        print(f"[LAB-RULES] Loaded {len(table['rules'])} risk rules from {os.path.basename(rules_path)}")
+
+    def _template(self, language: str, name: str):
+        return self.templates.get(language, self.templates["English"]).get(name) or self.templates["English"][name]
+
+    def _risk_rules(self, analyte: Optional[str], value: float) -> List[dict]:
+        """Rules matched by a canonical value (one per direction: the most severe)"""
+        matched = []
+        for rule in self.rules.get(analyte, []):
+            if not _OPS[rule["op"]](value, rule["value"]):
+                continue
+            if "below" in rule and value >= rule["below"]:
+                continue
+            if any(rule["op"][0] == other["op"][0] for other in matched):
+                continue
+            matched.append(rule)
+        return matched
+
+    def _assess(self, lab: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+        """(flag, reference range text) for one entry; flag is None if unassessed"""
+        flag = lab.get("flag_calculated")
+        if flag:
+            return flag, lab.get("reference_range_stored")
+        range_text = lab.get("range") or lab.get("reference_range")
+        bounds = parse_range(range_text)
+        value = parse_number(lab.get("value"))
+        if bounds is None or math.isnan(value):
+            return None, range_text
+        low, high = bounds
+        return ("Low" if value < low else "High" if value > high else "Normal"), range_text
+
+    def _explain(self, lab: Dict[str, Any], analyte: Optional[str], direction: str,
+                 range_text: Optional[str], critical: bool, language: str) -> Dict[str, Any]:
+        name = lab.get("name") or analyte or ""
+        value = parse_number(lab.get("value"))
+        unit = lab.get("unit") or lab.get("canonical_unit") or ""
+        fields = {"test": name, "value": lab.get("value"), "unit": unit, "range": range_text or "-"}
+
+        meaning = self._template(language, f"meaning_{direction}").format(**fields)
+        detail = self.meanings.get(analyte, {}).get(direction, {})
+        detail_text = detail.get(language) or detail.get("English")
+        if detail_text:
+            meaning = f"{meaning} {detail_text}"
+
+        questions = self._template(language, "questions_Critical") if critical else []
+        questions = questions + self._template(language, f"questions_{direction}")
+        return {
+            "test": name,
+            "value": lab.get("value") if math.isnan(value) else value,
+            "unit": unit,
+            "flag": "Critical" if critical else direction,
+            "meaning": meaning,
+            "questionsToAskDoctor": [question.format(**fields) for question in questions]
+        }
+
+    def interpret(self, labs: List[Dict[str, Any]], language: str = "English") -> Dict[str, Any]:
+        """
+        Interpret a canonicalized, flagged lab panel
+
+        Args:
+            labs: Lab entries (after unit_registry.canonicalize_entries and flag_panel)
+            language: Response language ("English" or "Bengali")
+
+        Returns:
+            {"abnormal": [{"test", "value", "unit", "flag", "meaning", "questionsToAskDoctor"}],
+             "summary", "riskSignals", "critical", "unassessed", "source": "rules"}
+        """
+        start_time = time.perf_counter()
+        abnormal = []
+        signals = []
+        unassessed = []
+        for lab in labs or []:
+            if not isinstance(lab, dict):
+                continue
+            analyte = lab.get("analyte")
+            flag, range_text = self._assess(lab)
+
+            # Risk rules are written in reference units: canonical values only
+            rules = []
+            if analyte and lab.get("canonical_value") is not None:
+                rules = self._risk_rules(analyte, float(lab["canonical_value"]))
+            for rule in rules:
+                signals.append((_SEVERITY_RANK[rule["severity"]], rule["signal"].get(language) or rule["signal"]["English"]))
+            critical = [rule for rule in rules if rule["severity"] == "critical"]
+
+            if critical:
+                direction = "High" if critical[0]["op"].startswith(">") else "Low"
+            elif flag in ("High", "Low"):
+                direction = flag
+            else:
+                if flag is None:
+                    unassessed.append(lab.get("name") or analyte or "")
+                continue
+            abnormal.append(self._explain(lab, analyte, direction, range_text, bool(critical), language))
+
+        # Critical entries and signals first, panel order otherwise
+        abnormal.sort(key=lambda entry: entry["flag"] != "Critical")
+        signals.sort(key=lambda signal: -signal[0])
+        is_critical = any(entry["flag"] == "Critical" for entry in abnormal)
+
+        count = sum(isinstance(lab, dict) for lab in labs or [])
+        assessed = count - len(unassessed)
+        if abnormal:
+            summary = self._template(language, "summary_abnormal").format(
+                abnormal=len(abnormal), count=assessed, tests=", ".join(entry["test"] for entry in abnormal)
+            )
+            if is_critical:
+                summary = f"{summary} {self._template(language, 'summary_critical')}"
+        else:
+            summary = self._template(language, "summary_normal").format(count=assessed)
+        if unassessed:
+            summary = f"{summary} " + self._template(language, "summary_unassessed").format(
+                unassessed=len(unassessed), tests=", ".join(unassessed)
+            )
+
+        self.panels += 1
+        self.all_normal += not abnormal and not signals
+        self.critical_panels += is_critical
+        self.total_us += (time.perf_counter() - start_time) * 1e6
+        return {
+            "abnormal": abnormal,
+            "summary": summary,
+            "riskSignals": list(dict.fromkeys(text for _, text in signals)),
+            "critical": is_critical,
+            "unassessed": unassessed,
+            "source": "rules"
+        }
+
+    def needs_narrative(self, result: Dict[str, Any]) -> bool:
+        """True if a panel has anything for the LLM narrative to explain"""
+        return bool(result["abnormal"] or result["riskSignals"] or result["unassessed"])
+
+    def schedule_narrative(self, narrative_id: str, narrative_fn: Callable[[], Awaitable[str]]) -> Dict[str, Any]:
+        """
+        Generate a narrative in the background (at most one job per id)
+
+        Args:
+            narrative_id: Stable id for the panel (derived from its cache key)
+            narrative_fn: async () -> narrative text
+
+        Returns:
+            Current job state
+        """
+        job = self.narratives.get(narrative_id)
+        if job is not None and job["status"] != "failed":
+            return job
+        job = {"status": "pending", "narrative": None, "created_at": time.time()}
+        self.narratives[narrative_id] = job
+        self.narratives_scheduled += 1
+        task = asyncio.create_task(self._run(narrative_id, job, narrative_fn))
+        # Keep a reference until done so the task is not garbage collected
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return job
+
+    async def _run(self, narrative_id: str, job: Dict[str, Any], narrative_fn):
+        try:
+            job["narrative"] = await narrative_fn()
+            job["status"] = "ready"
+        except Exception as e:
+            self.narratives_failed += 1
+            job["status"] = "failed"
+            print(f"[LAB-RULES] Narrative {narrative_id} failed: {e}")
+
+    def get_narrative(self, narrative_id: str) -> Optional[Dict[str, Any]]:
+        """Background narrative job state, None if unknown or expired"""
+        return self.narratives.get(narrative_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get interpreter statistics"""
+        return {
+            "rules": sum(len(rules) for rules in self.rules.values()),
+            "panels": self.panels,
+            "all_normal": self.all_normal,
+            "critical_panels": self.critical_panels,
+            "avg_interpret_us": round(self.total_us / self.panels, 2) if self.panels > 0 else 0,
+            "narratives_scheduled": self.narratives_scheduled,
+            "narratives_failed": self.narratives_failed,
+            "narratives_pending": sum(job["status"] == "pending" for job in self.narratives.values())
+        }
+
+
+# Global interpreter instance
+lab_interpreter = LabInterpreter(os.getenv("LAB_RULES_TABLE") or DEFAULT_RULES_PATH)
@@ -0,0 +1,226 @@
+"""
+Lab Report Line Parser
+Deterministic extraction of lab values from report text, tried before the LLM
+
+Handles the common one-result-per-line layouts:
+    Hemoglobin 13.2 g/dL 13.5-17.5
+    HGB: 13.2 L g/dL (13.5 - 17.5)
+    Glucose, Fasting    105  H   mg/dL   70 - 99
+    Platelets 250 13.5-17.5 x10^3/uL
+    HDL Cholesterol 45 mg/dL >40
+Test names are matched against the alias index of reference_data; unknown
+names are only accepted when the line also has a unit and a range.
+
+Each document gets a confidence score (share of lab-looking lines parsed,
+weighted by how complete each entry is). Below LAB_PARSER_MIN_CONFIDENCE
+the caller falls back to the LLM.
+"""
+import os
+import re
+from typing import Any, Dict, Optional
+
+from reference_data import ALIAS_INDEX, normalize_test_name
+
+LAB_PARSER_ENABLED = os.getenv("LAB_PARSER_ENABLED", "true").lower() == "true"
+LAB_PARSER_MIN_CONFIDENCE = float(os.getenv("LAB_PARSER_MIN_CONFIDENCE", "0.8"))
+
+_NUMBER = r"\d+(?:[.,]\d+)*"
+_UNIT = (
+    r"%"
+    r"|(?:[x×*]\s*)?10\s*(?:\^|\*\*|e)?\s*(?:\d+|[³⁶⁹])\s*/\s*[a-zµμ]+"
+    r"|/\s*(?:h?pf|[µμu]l|mcl|cumm|mm3)"
+    r"|(?!to\b)[a-zµμ][a-zµμ0-9.]*(?:\s*/\s*[a-zµμ0-9.]+)*"
+)
+_FLAG = r"(?-i:HH|LL|H|L|High|Low|HIGH|LOW|Critical|CRITICAL|Abnormal)(?![a-z])|\*+"
+_RANGE = (
+    rf"[(\[]?\s*(?:(?P<low>{_NUMBER})\s*(?:-|–|—|to)\s*(?P<high>{_NUMBER})"
+    rf"|(?P<op><=|>=|<|>|≤|≥|up\s*to)\s*(?P<bound>{_NUMBER}))\s*[)\]]?"
+)
+_RESULT = re.compile(
+    rf"[\s:=\-–]*(?P<value_op>[<>]=?)?\s*(?P<value>{_NUMBER})(?![\d.,])"
+    rf"(?:\s*(?P<flag>{_FLAG}))?"
+    rf"(?:\s*(?P<unit>{_UNIT}))?"
+    rf"(?:\s*(?P<flag2>{_FLAG}))?"
+    rf"(?:\s*(?P<range>{_RANGE}))?"
+    rf"(?:\s*(?P<unit2>{_UNIT}))?",
+    re.IGNORECASE
+)
+
+# Known names, longest first so "hemoglobin a1c" wins over "hemoglobin"
+_KNOWN_NAME = re.compile(
+    r"^[\s\-•*·]*(?P<name>" + "|".join(
+        r"\s+".join(re.escape(part) for part in alias.split())
+        for alias in sorted(ALIAS_INDEX, key=len, reverse=True)
+    ) + r")(?![a-z0-9])(?:\s*\([^)]{0,40}\))?",
+    re.IGNORECASE
+)
+_UNKNOWN_NAME = re.compile(r"^[\s\-•*·]*(?P<name>[a-z][a-z0-9 ,()/'\-.]{1,40}?)(?=\s*[:=]?\s+[<>]?\d)", re.IGNORECASE)
+
+# Lines with a name, a number and a unit or range after it
+_LAB_LIKE = re.compile(rf"[a-z]{{2,}}[^\d\n]*?{_NUMBER}\s*(?:\S+\s*)?(?:[a-zµμ%]|{_NUMBER}\s*(?:-|–|to)\s*\d)", re.IGNORECASE)
+# Report metadata that also contains numbers
+_SKIP = re.compile(
+    r"^\s*(?:date|time|age|sex|gender|phone|tel|mobile|fax|id|uhid|mrn|reg|lab\s*no|sample|specimen|patient"
+    r"|name|dr\.?|doctor|ref(?:erred)?|collected|received|reported|printed|page|address|report|bill|visit)\b",
+    re.IGNORECASE
+)
+
+
+def to_float(text: str) -> Optional[float]:
+    """Parse a printed number ("13.2", "13,2", "150,000")"""
+    if re.fullmatch(r"\d{1,3}(?:,\d{3})+(?:\.\d+)?", text):
+        text = text.replace(",", "")
+    elif text.count(",") == 1 and "." not in text:
+        text = text.replace(",", ".")
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def _clean_unit(unit: Optional[str]) -> str:
+    return re.sub(r"\s+", "", unit) if unit else ""
+
+
+def parse_line(line: str) -> Optional[Dict[str, Any]]:
+    """
+    Parse one report line
+
+    Args:
+        line: Text line
+
+    Returns:
+        {"name", "value", "unit", "range", "score"} or None
+    """
+    known = _KNOWN_NAME.match(line)
+    if known:
+        name = ALIAS_INDEX[normalize_test_name(known.group("name"))]
+        rest = line[known.end():]
+    else:
+        unknown = _UNKNOWN_NAME.match(line)
+        if not unknown:
+            return None
+        name = " ".join(unknown.group("name").split()).strip(" ,:-")
+        rest = line[unknown.end():]
+
+    result = _RESULT.match(rest)
+    if not result:
+        return None
+    value = to_float(result.group("value"))
+    if value is None:
+        return None
+
+    unit = _clean_unit(result.group("unit") or result.group("unit2"))
+    range_text = ""
+    if result.group("range"):
+        if result.group("low") is not None:
+            range_text = f"{result.group('low')}-{result.group('high')}"
+        else:
+            op = re.sub(r"\s+", " ", result.group("op")).lower()
+            range_text = f"{op} {result.group('bound')}" if op == "up to" else f"{op}{result.group('bound')}"
+
+    # Entry completeness: known names need less supporting evidence
+    if known:
+        score = 1.0 if unit and range_text else 0.9 if unit or range_text else 0.75
+    else:
+        if not (unit and range_text):
+            return None
+        score = 0.85
+
+    return {"name": name, "value": value, "unit": unit, "range": range_text, "score": score}
+
+
+def parse_lab_text(text: str) -> Dict[str, Any]:
+    """
+    Parse all lab values in a report
+
+    Args:
+        text: Report text (PDF text layer or OCR)
+
+    Returns:
+        {"entries": [{"name", "value", "unit", "range"}], "confidence": 0..1,
+         "candidates": lab-looking lines, "parsed": lines parsed}
+    """
+    entries = []
+    scores = []
+    candidates = 0
+    for raw in (text or "").splitlines():
+        # Table layouts: treat column separators as spaces
+        line = re.sub(r"[|\t]+", " ", raw).strip()
+        if not line or _SKIP.match(line):
+            continue
+        is_candidate = _LAB_LIKE.search(line) is not None
+        entry = parse_line(line)
+        if entry is None:
+            candidates += is_candidate
+            continue
+        candidates += 1
+        scores.append(entry.pop("score"))
+        entries.append(entry)
+
+    confidence = 0.0
+    if entries:
+        confidence = (len(entries) / max(candidates, 1)) * (sum(scores) / len(scores))
+    return {
+        "entries": entries,
+        "confidence": round(confidence, 3),
+        "candidates": candidates,
+        "parsed": len(entries)
+    }
+
+
+class LabParser:
+    """Local lab parser with LLM-fallback decision and metrics"""
+
+    def __init__(self, min_confidence: float = LAB_PARSER_MIN_CONFIDENCE, enabled: bool = LAB_PARSER_ENABLED):
+        """
+        Initialize parser
+
+        Args:
+            min_confidence: Documents scoring below this go to the LLM
+            enabled: Master switch
+        """
+        self.min_confidence = min_confidence
+        self.enabled = enabled
+
+        # Metrics
+        self.documents = 0
+        self.accepted = 0
+        self.fallbacks = 0
+
+    def parse(self, text: str) -> Optional[Dict[str, Any]]:
+        """
+        Parse a report if the result is confident enough
+
+        Args:
+            text: Report text
+
+        Returns:
+            parse_lab_text result, or None if the LLM is needed
+        """
+        if not self.enabled:
+            return None
+        self.documents += 1
+        result = parse_lab_text(text)
+        if result["confidence"] >= self.min_confidence:
+            self.accepted += 1
+            print(f"[LAB-PARSER] Parsed {result['parsed']} entries locally (confidence {result['confidence']})")
+            return result
+        self.fallbacks += 1
+        print(f"[LAB-PARSER] Confidence {result['confidence']} below {self.min_confidence}, using LLM")
+        return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get parser statistics"""
+        return {
+            "enabled": self.enabled,
+            "min_confidence": self.min_confidence,
+            "documents": self.documents,
+            "accepted": self.accepted,
+            "fallbacks": self.fallbacks,
+            "accept_rate": round(self.accepted / self.documents * 100, 2) if self.documents > 0 else 0
+        }
+
+
+# Global parser instance
+lab_parser = LabParser()
@@ -0,0 +1,308 @@
+"""
+Lab Trend Store
+Per-profile, per-analyte time series of canonical lab values, kept next to the
+labs collection so trend charts and analyses never read whole lab documents.
+
+One lab_series document per (user_id, profile_id, analyte) holds the points
+in columnar, packed form, sorted by time:
+    t     BSON binary, uint32 seconds since the epoch (lab created_at)
+    v     BSON binary, float64 canonical values
+    labs  BSON binary, 12-byte lab ObjectIds (so deletes can remove points)
+plus unit, count, first_at, last_at, last_value and a version counter.
+That is 24 bytes per point instead of a full lab document per reading.
+Labs saved without a profile_id form their own series (profile_id None).
+
+Series are updated on every lab insert and delete with an optimistic
+read-modify-write (the version must not have changed in between). Entries
+without a canonical value (unknown analyte or unit) are not tracked.
+"""
+import math
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from bson import Binary, ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from reference_data import reference_engine
+
+SERIES_COLLECTION = "lab_series"
+DEFAULT_TREND_POINTS = 200
+_EPOCH = datetime(1970, 1, 1)
+
+
+def to_epoch(value: Any) -> int:
+    """Seconds since the epoch for a naive UTC datetime (now if missing)"""
+    if not isinstance(value, datetime):
+        value = datetime.utcnow()
+    if value.tzinfo is not None:
+        value = value.replace(tzinfo=None) - value.utcoffset()
+    return int((value - _EPOCH).total_seconds())
+
+
+def from_epoch(seconds: float) -> datetime:
+    return datetime.utcfromtimestamp(float(seconds))
+
+
+def decode_series(doc: Optional[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(t, v, lab ids) arrays of a lab_series document (empty arrays for None)"""
+    if not doc:
+        return np.empty(0, dtype="<u4"), np.empty(0, dtype="<f8"), np.empty((0, 12), dtype=np.uint8)
+    return (
+        np.frombuffer(doc["t"], dtype="<u4"),
+        np.frombuffer(doc["v"], dtype="<f8"),
+        # One row per point (raw ObjectId bytes)
+        np.frombuffer(doc["labs"], dtype=np.uint8).reshape(-1, 12),
+    )
+
+
+def downsample(t: np.ndarray, v: np.ndarray, points: int) -> List[Dict[str, Any]]:
+    """
+    Reduce a series to at most `points` equal-width time buckets
+
+    Args:
+        t: Sorted epoch seconds
+        v: Values
+        points: Maximum number of points returned
+
+    Returns:
+        [{"date", "value", "min", "max", "n"}]; buckets hold the mean time and
+        value (single readings are returned unchanged)
+    """
+    if len(t) == 0:
+        return []
+    if points <= 0 or len(t) <= points:
+        return [
+            {"date": from_epoch(ts).isoformat(), "value": float(val), "min": float(val), "max": float(val), "n": 1}
+            for ts, val in zip(t, v)
+        ]
+
+    start, span = float(t[0]), float(t[-1]) - float(t[0]) + 1
+    bucket = np.minimum(((t - start) * points / span).astype(np.int64), points - 1)
+    counts = np.bincount(bucket, minlength=points)
+    t_sum = np.bincount(bucket, weights=t.astype(np.float64), minlength=points)
+    v_sum = np.bincount(bucket, weights=v, minlength=points)
+    v_min = np.full(points, np.inf)
+    v_max = np.full(points, -np.inf)
+    np.minimum.at(v_min, bucket, v)
+    np.maximum.at(v_max, bucket, v)
+
+    filled = np.nonzero(counts)[0]
+    return [
+        {
+            "date": from_epoch(t_sum[i] / counts[i]).isoformat(),
+            "value": round(float(v_sum[i] / counts[i]), 4),
+            "min": float(v_min[i]),
+            "max": float(v_max[i]),
+            "n": int(counts[i])
+        }
+        for i in filled
+    ]
+
+
+class LabTrendStore:
+    """Columnar per-analyte lab series maintained on lab insert/delete"""
+
+    def __init__(self, collection_name: str = SERIES_COLLECTION, max_retries: int = 5):
+        """
+        Initialize store
+
+        Args:
+            collection_name: Series collection
+            max_retries: Attempts per series update when a concurrent write wins
+        """
+        self.collection_name = collection_name
+        self.max_retries = max_retries
+
+        # Metrics
+        self.updates = 0
+        self.conflicts = 0
+        self.failed = 0
+        self.queries = 0
+
+    def _key(self, user_id: str, profile_id: Optional[str], analyte: str) -> Dict[str, Any]:
+        return {"user_id": user_id, "profile_id": profile_id or None, "analyte": analyte}
+
+    def lab_points(self, lab: Dict[str, Any]) -> Dict[str, Tuple[str, List[float]]]:
+        """analyte -> (canonical unit, values) for the canonicalized entries of a lab document"""
+        points: Dict[str, Tuple[str, List[float]]] = {}
+        for entry in lab.get("entries") or []:
+            value = entry.get("canonical_value")
+            if not entry.get("analyte") or value is None or math.isnan(float(value)):
+                continue
+            unit, values = points.setdefault(entry["analyte"], (entry.get("canonical_unit") or "", []))
+            values.append(float(value))
+        return points
+
+    async def _update(self, database, user_id: str, profile_id: Optional[str], analyte: str, unit: str,
+                      lab_id: ObjectId, at: int = 0, values: Iterable[float] = ()) -> bool:
+        """
+        Replace the points of one lab in a series (no values = remove them)
+
+        Returns:
+            True if the series was written
+        """
+        collection = database[self.collection_name]
+        series_key = self._key(user_id, profile_id, analyte)
+        values = list(values)
+        key = np.frombuffer(lab_id.binary, dtype=np.uint8)
+        for _ in range(self.max_retries):
+            doc = await collection.find_one(series_key)
+            t, v, labs = decode_series(doc)
+            keep = ~(labs == key).all(axis=1)
+            t, v, labs = t[keep], v[keep], labs[keep]
+            if values:
+                position = int(np.searchsorted(t, at, side="right"))
+                t = np.insert(t, position, np.full(len(values), at, dtype="<u4"))
+                v = np.insert(v, position, np.asarray(values, dtype="<f8"))
+                labs = np.insert(labs, position, np.tile(key, (len(values), 1)), axis=0)
+
+            if doc is not None and len(t) == 0:
+                result = await collection.delete_one({"_id": doc["_id"], "version": doc["version"]})
+                if result.deleted_count == 1:
+                    self.updates += 1
+                    return True
+                self.conflicts += 1
+                continue
+            if doc is None and len(t) == 0:
+                return False
+
+            fields = {
+                "unit": unit or (doc or {}).get("unit", ""),
+                "t": Binary(t.astype("<u4").tobytes()),
+                "v": Binary(v.astype("<f8").tobytes()),
+                "labs": Binary(labs.tobytes()),
+                "count": int(len(t)),
+                "first_at": from_epoch(t[0]),
+                "last_at": from_epoch(t[-1]),
+                "last_value": float(v[-1]),
+                "updated_at": datetime.utcnow()
+            }
+            try:
+                if doc is None:
+                    await collection.insert_one({**series_key, "version": 1, **fields})
+                    self.updates += 1
+                    return True
+                result = await collection.update_one(
+                    {"_id": doc["_id"], "version": doc["version"]},
+                    {"$set": fields, "$inc": {"version": 1}}
+                )
+                if result.matched_count == 1:
+                    self.updates += 1
+                    return True
+            except DuplicateKeyError:
+                pass
+            # Another request changed the series in between: re-read and re-apply
+            self.conflicts += 1
+
+        self.failed += 1
+        print(f"[LAB-TRENDS] Gave up updating {analyte} for {user_id}/{profile_id} after {self.max_retries} attempts")
+        return False
+
+    async def add_lab(self, database, lab: Dict[str, Any]) -> int:
+        """
+        Add the canonical values of a stored lab document to its series
+
+        Args:
+            database: Motor database
+            lab: Lab document (with _id, user_id, profile_id, created_at and canonicalized entries)
+
+        Returns:
+            Number of series updated
+        """
+        if not lab.get("user_id") or lab.get("_id") is None:
+            return 0
+        at = to_epoch(lab.get("created_at"))
+        updated = 0
+        for analyte, (unit, values) in self.lab_points(lab).items():
+            updated += await self._update(database, lab["user_id"], lab.get("profile_id"), analyte, unit,
+                                          ObjectId(lab["_id"]), at, values)
+        return updated
+
+    async def remove_lab(self, database, lab: Dict[str, Any]) -> int:
+        """
+        Remove the points of a deleted lab document from its series
+
+        Args:
+            database: Motor database
+            lab: Deleted lab document (at least _id, user_id, profile_id and entries)
+
+        Returns:
+            Number of series updated
+        """
+        if not lab.get("user_id") or lab.get("_id") is None:
+            return 0
+        updated = 0
+        for analyte in self.lab_points(lab):
+            updated += await self._update(database, lab["user_id"], lab.get("profile_id"), analyte, "", ObjectId(lab["_id"]))
+        return updated
+
+    async def list_series(self, database, user_id: str, profile_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Analytes tracked for a profile, without the points
+
+        Args:
+            database: Motor database
+            user_id: User ID
+            profile_id: Profile ID (None = the user's labs without a profile)
+
+        Returns:
+            [{"analyte", "unit", "count", "first_at", "last_at", "last_value"}]
+        """
+        self.queries += 1
+        cursor = database[self.collection_name].find(
+            {"user_id": user_id, "profile_id": profile_id or None},
+            {"_id": 0, "analyte": 1, "unit": 1, "count": 1, "first_at": 1, "last_at": 1, "last_value": 1}
+        ).sort("analyte", 1)
+        return await cursor.to_list(length=500)
+
+    async def query(self, database, user_id: str, analyte: str, points: int = DEFAULT_TREND_POINTS,
+                    since: Optional[datetime] = None, until: Optional[datetime] = None,
+                    profile_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        One analyte over time, downsampled
+
+        Args:
+            database: Motor database
+            user_id: User ID
+            analyte: Test name or alias ("HbA1c", "Hemoglobin A1c")
+            points: Maximum number of points returned
+            since: Only readings at or after this time
+            until: Only readings at or before this time
+            profile_id: Profile ID (None = the user's labs without a profile)
+
+        Returns:
+            {"analyte", "unit", "count", "points": [{"date", "value", "min", "max", "n"}]},
+            or None if the profile has no series for the analyte
+        """
+        self.queries += 1
+        analyte = reference_engine.resolve_test(analyte) or analyte
+        doc = await database[self.collection_name].find_one(
+            self._key(user_id, profile_id, analyte), {"labs": 0}
+        )
+        if doc is None:
+            return None
+        t = np.frombuffer(doc["t"], dtype="<u4")
+        v = np.frombuffer(doc["v"], dtype="<f8")
+        low = np.searchsorted(t, to_epoch(since), side="left") if since else 0
+        high = np.searchsorted(t, to_epoch(until), side="right") if until else len(t)
+        t, v = t[low:high], v[low:high]
+        return {
+            "analyte": analyte,
+            "unit": doc.get("unit", ""),
+            "count": int(len(t)),
+            "points": downsample(t, v, points)
+        }
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get trend store statistics"""
+        return {
+            "updates": self.updates,
+            "conflicts": self.conflicts,
+            "failed": self.failed,
+            "queries": self.queries
+        }
+
+
+# Global store instance
+lab_trends = LabTrendStore()
@@ -0,0 +1,154 @@
+"""
+Lab Unit Registry
+Converts lab values into the unit of their reference range so flagging,
+trends and caching work on one numeric representation.
+
+Every entry canonicalized at ingestion (/api/labs, /api/labs/upload) keeps
+its printed value and unit and gains:
+    analyte          REFERENCE_RANGES key ("Glucose (Fasting)")
+    canonical_value  value in the reference unit
+    canonical_unit   the reference unit ("mg/dL")
+Entries whose analyte or unit is unknown are stored unchanged.
+"""
+import math
+import re
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from reference_data import REFERENCE_RANGES, normalize_unit, parse_number, reference_engine
+
+# Factor (or (factor, offset)) from a unit to the analyte's reference unit:
+# canonical = value * factor + offset
+ANALYTE_CONVERSIONS: Dict[str, Dict[str, Union[float, Tuple[float, float]]]] = {
+    "Glucose (Fasting)": {"mmol/l": 18.016},
+    "Glucose": {"mmol/l": 18.016},
+    "Total Cholesterol": {"mmol/l": 38.67},
+    "LDL Cholesterol": {"mmol/l": 38.67},
+    "HDL Cholesterol": {"mmol/l": 38.67},
+    "Triglycerides": {"mmol/l": 88.57},
+    "Creatinine": {"umol/l": 1 / 88.42},
+    "BUN (Blood Urea Nitrogen)": {"mmol/l": 2.801},
+    "Hemoglobin": {"mmol/l": 1.611},
+    "Hematocrit": {"l/l": 100.0},
+    # IFCC mmol/mol -> NGSP %
+    "Hemoglobin A1c": {"mmol/mol": (0.09148, 2.152)},
+    "Sodium": {"mmol/l": 1.0},
+    "Potassium": {"mmol/l": 1.0},
+    "Vitamin D (25-Hydroxy)": {"nmol/l": 1 / 2.496},
+    "ALT (Alanine Aminotransferase)": {"ukat/l": 60.0},
+    "AST (Aspartate Aminotransferase)": {"ukat/l": 60.0},
+    "WBC (White Blood Cells)": {"/ul": 0.001},
+    "Platelets": {"/ul": 0.001, "lakh/ul": 100.0},
+    "RBC (Red Blood Cells)": {"/ul": 1e-6},
+}
+
+# Analyte-independent conversions (same quantity, different scale)
+GENERIC_CONVERSIONS: Dict[Tuple[str, str], float] = {
+    ("g/l", "g/dl"): 0.1,
+    ("mg/l", "mg/dl"): 0.1,
+    ("g/dl", "mg/dl"): 1000.0,
+    ("mg/dl", "g/dl"): 0.001,
+    ("ug/l", "ng/ml"): 1.0,
+    ("ng/dl", "ng/ml"): 0.01,
+    ("ukat/l", "u/l"): 60.0,
+    ("10^6/ul", "10^3/ul"): 1000.0,
+    ("/ul", "10^3/ul"): 0.001,
+    ("/ul", "10^6/ul"): 1e-6,
+}
+
+
+def unit_key(unit: Optional[str]) -> str:
+    """Comparable unit, including cell-count spellings ("lakhs/cumm" -> "lakh/ul")"""
+    key = normalize_unit(unit)
+    key = re.sub(r"(?:cumm|cmm|mm3)$", "ul", key).replace("lakhs", "lakh")
+    return normalize_unit(key)
+
+
+class UnitRegistry:
+    """Per-analyte unit conversion into reference units"""
+
+    def __init__(self):
+        self.reference_units = {
+            analyte: next(iter(bands.values()))["unit"] for analyte, bands in REFERENCE_RANGES.items()
+        }
+        self.conversions = {
+            analyte: {unit_key(unit): factor for unit, factor in factors.items()}
+            for analyte, factors in ANALYTE_CONVERSIONS.items()
+        }
+
+        # Metrics
+        self.canonicalized = 0
+        self.converted = 0
+        self.unconvertible = 0
+
+    def factor(self, analyte: str, unit: Optional[str]) -> Optional[Tuple[float, float]]:
+        """
+        (factor, offset) from a unit to the analyte's reference unit
+
+        Args:
+            analyte: REFERENCE_RANGES key
+            unit: Printed unit (empty = assume the reference unit)
+
+        Returns:
+            (factor, offset), or None if the unit cannot be converted
+        """
+        target = unit_key(self.reference_units.get(analyte))
+        source = unit_key(unit)
+        if not source or source == target:
+            return (1.0, 0.0)
+        conversion = self.conversions.get(analyte, {}).get(source)
+        if conversion is None:
+            conversion = GENERIC_CONVERSIONS.get((source, target))
+        if conversion is None:
+            return None
+        return conversion if isinstance(conversion, tuple) else (conversion, 0.0)
+
+    def convert(self, analyte: str, value: float, unit: Optional[str]) -> Optional[float]:
+        """Value in the analyte's reference unit, None if not convertible"""
+        factor = self.factor(analyte, unit)
+        if factor is None or value is None or math.isnan(value):
+            return None
+        return round(value * factor[0] + factor[1], 4)
+
+    def canonicalize_entry(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Add analyte, canonical_value and canonical_unit to a lab entry
+
+        Args:
+            entry: Lab entry ({"name", "value", "unit", ...}); updated in place
+
+        Returns:
+            The same entry
+        """
+        analyte = reference_engine.resolve_test(entry.get("name") or "")
+        if analyte is None:
+            return entry
+        self.canonicalized += 1
+        value = self.convert(analyte, parse_number(entry.get("value")), entry.get("unit"))
+        if value is None:
+            self.unconvertible += 1
+            return entry
+        if unit_key(entry.get("unit")) not in ("", unit_key(self.reference_units[analyte])):
+            self.converted += 1
+        entry["analyte"] = analyte
+        entry["canonical_value"] = value
+        entry["canonical_unit"] = self.reference_units[analyte]
+        return entry
+
+    def canonicalize_entries(self, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Canonicalize a list of lab entries (in place)"""
+        for entry in entries or []:
+            if isinstance(entry, dict) and entry.get("canonical_value") is None:
+                self.canonicalize_entry(entry)
+        return entries
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get canonicalization statistics"""
+        return {
+            "canonicalized": self.canonicalized,
+            "converted": self.converted,
+            "unconvertible": self.unconvertible
+        }
+
+
+# Global registry instance
+unit_registry = UnitRegistry()
@@ -0,0 +1,221 @@
+"""
+Windowed Message Storage
+Bounded chat history for conversations and voice sessions
+
+The parent document (a conversation or voice session) only keeps the most
+recent messages, capped with an atomic $push/$slice update, so reading a
+turn's context costs the same no matter how long the chat has run. The
+complete history is bucketed into capped segment documents in the
+message_segments collection, one bucket per SEGMENT_SIZE messages.
+
+Documents written before this layout have no message_count field; they are
+migrated on first append (see also migrations/bucket_messages.py).
+"""
+import asyncio
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+MESSAGE_WINDOW = int(os.getenv("MESSAGE_WINDOW", "20"))
+MESSAGE_SEGMENT_SIZE = int(os.getenv("MESSAGE_SEGMENT_SIZE", "100"))
+SEGMENTS_COLLECTION = "message_segments"
+
+
+class MessageStore:
+    """Recent-message window on the parent document plus bucketed full history"""
+
+    def __init__(self, collection_name: str, window: int = MESSAGE_WINDOW, segment_size: int = MESSAGE_SEGMENT_SIZE):
+        """
+        Initialize store
+
+        Args:
+            collection_name: Parent collection (conversations, voice_sessions)
+            window: Messages kept on the parent document
+            segment_size: Messages per history segment
+        """
+        self.collection_name = collection_name
+        self.window = max(1, window)
+        self.segment_size = max(1, segment_size)
+
+    def new_document_fields(self) -> Dict[str, Any]:
+        """Fields a freshly created parent document starts with"""
+        return {"messages": [], "message_count": 0}
+
+    async def find_recent(self, database, query: Dict[str, Any], count: int,
+                          projection: Optional[Dict[str, Any]] = None) -> Optional[dict]:
+        """
+        Find a parent document with only its last messages
+
+        Args:
+            database: Motor database
+            query: Parent document filter
+            count: Number of recent messages to load (at most the window)
+            projection: Extra fields to include (None loads every other field)
+
+        Returns:
+            Parent document with a sliced messages array, or None
+        """
+        fields = {"messages": {"$slice": -min(count, self.window)}}
+        if projection:
+            fields.update(projection)
+            fields["message_count"] = 1
+        return await database[self.collection_name].find_one(query, fields)
+
+    async def append(self, database, parent_id, messages: List[dict], set_fields: Optional[Dict[str, Any]] = None):
+        """
+        Append messages to a parent document
+
+        The window update is a single atomic $push/$slice; the segment write
+        runs alongside it.
+
+        Args:
+            database: Motor database
+            parent_id: Parent document _id
+            messages: Messages in order
+            set_fields: Extra fields to $set on the parent
+        """
+        if not messages:
+            return
+
+        update = {
+            "$push": {"messages": {"$each": messages, "$slice": -self.window}},
+            "$inc": {"message_count": len(messages)}
+        }
+        if set_fields:
+            update["$set"] = set_fields
+
+        # Only trim documents that already use the windowed layout
+        parents = database[self.collection_name]
+        window_write = parents.update_one({"_id": parent_id, "message_count": {"$exists": True}}, update)
+        result, _ = await asyncio.gather(window_write, self._append_segment(database, parent_id, messages))
+
+        if result.matched_count == 0:
+            legacy = await parents.find_one({"_id": parent_id, "message_count": {"$exists": False}})
+            if legacy is None:
+                return
+            # The new messages are already in the segments; migrate the older ones before them
+            await self.migrate_document(database, legacy)
+            await parents.update_one({"_id": parent_id}, update)
+
+    async def _append_segment(self, database, parent_id, messages: List[dict]):
+        """Add messages to the open segment, starting a new one when it is full"""
+        await database[SEGMENTS_COLLECTION].update_one(
+            {"collection": self.collection_name, "parent_id": parent_id, "count": {"$lt": self.segment_size}},
+            {
+                "$push": {"messages": {"$each": messages}},
+                "$inc": {"count": len(messages)},
+                "$setOnInsert": {"created_at": datetime.utcnow()}
+            },
+            upsert=True
+        )
+
+    async def history(self, database, parent_id, limit: Optional[int] = None) -> List[dict]:
+        """
+        Full (or last `limit`) message history, oldest first
+
+        Args:
+            database: Motor database
+            parent_id: Parent document _id
+            limit: Max messages returned (newest kept; 0 or less returns none)
+
+        Returns:
+            List of messages
+        """
+        if limit is not None and limit <= 0:
+            return []
+        cursor = database[SEGMENTS_COLLECTION].find(
+            {"collection": self.collection_name, "parent_id": parent_id},
+            {"messages": 1}
+        ).sort("_id", -1)
+
+        segments = []
+        loaded = 0
+        async for segment in cursor:
+            segments.append(segment.get("messages", []))
+            loaded += len(segments[-1])
+            if limit is not None and loaded >= limit:
+                break
+
+        messages = [message for segment in reversed(segments) for message in segment]
+        return messages[-limit:] if limit is not None else messages
+
+    def _buckets(self, parent_id, messages: List[dict]) -> List[dict]:
+        """Segment documents for messages in order, at most segment_size each"""
+        return [
+            {
+                "collection": self.collection_name,
+                "parent_id": parent_id,
+                "messages": messages[i:i + self.segment_size],
+                "count": len(messages[i:i + self.segment_size]),
+                "created_at": datetime.utcnow()
+            }
+            for i in range(0, len(messages), self.segment_size)
+        ]
+
+    async def _take_segments(self, database, query: Dict[str, Any]) -> List[dict]:
+        """
+        Remove matching segments one at a time, oldest first, returning their messages
+
+        Each segment is read and deleted atomically, so a concurrent append
+        either lands in it before it is taken or starts a new segment.
+        """
+        taken = []
+        while True:
+            segment = await database[SEGMENTS_COLLECTION].find_one_and_delete(query, {"messages": 1}, sort=[("_id", 1)])
+            if segment is None:
+                return taken
+            taken.extend(segment.get("messages", []))
+
+    async def migrate_document(self, database, doc: dict, max_attempts: int = 5) -> bool:
+        """
+        Move a legacy document's messages into segments and trim it to the window
+
+        Args:
+            database: Motor database
+            doc: Parent document (with its full messages array)
+            max_attempts: Rewrites before segments started concurrently are left in place
+
+        Returns:
+            True if the document was migrated by this call
+        """
+        messages = doc.get("messages") or []
+        segments = database[SEGMENTS_COLLECTION]
+
+        # Claim the document first so concurrent migrations do not copy twice
+        result = await database[self.collection_name].update_one(
+            {"_id": doc["_id"], "message_count": {"$exists": False}},
+            {"$set": {"message_count": len(messages), "messages": messages[-self.window:]}}
+        )
+        if result.modified_count == 0:
+            return False
+
+        # Legacy messages first, then anything appended meanwhile
+        query = {"collection": self.collection_name, "parent_id": doc["_id"]}
+        ordered = messages + await self._take_segments(database, query)
+        written = []
+        for _ in range(max_attempts):
+            buckets = self._buckets(doc["_id"], ordered)
+            if not buckets:
+                return True
+            await segments.insert_many(buckets, ordered=True)
+            written += [bucket["_id"] for bucket in buckets]
+            # Segments started between the take and the insert would sort before
+            # the rewritten history: move them behind it
+            ordered = await self._take_segments(database, {**query, "_id": {"$lt": written[-1], "$nin": written}})
+        if ordered:
+            await segments.insert_many(self._buckets(doc["_id"], ordered), ordered=True)
+            print(f"[MESSAGE-STORE] {self.collection_name}/{doc['_id']}: appends kept racing the migration, "
+                  f"{len(ordered)} message(s) may be out of order")
+        return True
+
+    async def delete(self, database, parent_ids: List[Any]):
+        """Delete the message segments of removed parent documents"""
+        if parent_ids:
+            await database[SEGMENTS_COLLECTION].delete_many(
+                {"collection": self.collection_name, "parent_id": {"$in": parent_ids}}
+            )
+
+
+# Stores for the chat collections
+conversation_messages = MessageStore("conversations")
+voice_session_messages = MessageStore("voice_sessions")
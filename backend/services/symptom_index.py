@@ -0,0 +1,264 @@
+"""
+Related-Symptom Index
+Co-occurrence graph built from past visits, used to answer refinement
+suggestions locally instead of asking the LLM every time.
+
+Nodes are canonical symptom names. An edge s -> r is weighted by how often r
+was an initial symptom or a refinement answer in visits that started with s
+("Yes" answers count fully, "No"/"Unsure" answers half: they are still
+questions worth asking). Compacted edges live in CSR arrays; edges added since
+the last compaction sit in a small delta map until it is merged.
+"""
+import os
+import time
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set
+
+from utils.response_cache import canonical_text, canonical_symptoms
+
+ANSWER_WEIGHTS = {"yes": 1.0, "no": 0.5, "unsure": 0.5}
+
+
+class SymptomIndex:
+    """Array-backed symptom co-occurrence index with incremental updates"""
+
+    def __init__(self, min_support: int = 5, min_related: int = 10, compact_every: int = 2000):
+        """
+        Initialize index
+
+        Args:
+            min_support: Visits a symptom must appear in before the index answers for it
+            min_related: Minimum related symptoms needed to answer without the LLM
+            compact_every: Merge the delta into the arrays after this many new edges
+        """
+        self.min_support = min_support
+        self.min_related = min_related
+        self.compact_every = compact_every
+
+        # Vocabulary: canonical name <-> id, plus the display form seen first
+        self.ids: Dict[str, int] = {}
+        self.names: List[str] = []
+        self.support = array("I")
+
+        # Compacted graph (CSR): row i spans indices[indptr[i]:indptr[i+1]]
+        self.indptr = array("I", [0])
+        self.indices = array("I")
+        self.weights = array("f")
+
+        # Edges added since the last compaction: row id -> Counter(col id -> weight)
+        self.delta: Dict[int, Counter] = {}
+        self.delta_edges = 0
+
+        self.visit_ids: Set[str] = set()
+        self.ready = False
+
+        # Metrics
+        self.queries = 0
+        self.answered = 0
+        self.fallbacks = 0
+        self.total_lookup_us = 0.0
+        self.last_build_seconds = 0.0
+
+    def _node(self, name: str) -> Optional[int]:
+        key = canonical_text(name)
+        if not key:
+            return None
+        node = self.ids.get(key)
+        if node is None:
+            node = len(self.names)
+            self.ids[key] = node
+            self.names.append(" ".join(name.split()))
+            self.support.append(0)
+        return node
+
+    def add_visit(self, visit_id: Optional[str], symptoms: Iterable, refinements: Optional[Iterable[dict]] = None) -> bool:
+        """
+        Add one visit's symptoms and refinement answers to the graph
+
+        Args:
+            visit_id: Visit id (visits are only counted once)
+            symptoms: Extracted symptoms (dicts with normalizedName/name, or strings)
+            refinements: Refinement answers ({"symptom", "status"})
+
+        Returns:
+            True if the visit was added
+        """
+        if visit_id is not None:
+            if visit_id in self.visit_ids:
+                return False
+            self.visit_ids.add(visit_id)
+
+        initial = set()
+        for symptom in symptoms or []:
+            if isinstance(symptom, dict):
+                name = symptom.get("normalizedName") or symptom.get("name") or ""
+            else:
+                name = str(symptom)
+            # Normalized names are English; skip anything else
+            if name and name.isascii():
+                node = self._node(name)
+                if node is not None:
+                    initial.add(node)
+        if not initial:
+            return False
+
+        related: Dict[int, float] = {node: 1.0 for node in initial}
+        for answer in refinements or []:
+            if not isinstance(answer, dict):
+                continue
+            name = answer.get("symptom") or ""
+            weight = ANSWER_WEIGHTS.get(str(answer.get("status", "")).lower())
+            if weight is None or not name.isascii():
+                continue
+            node = self._node(name)
+            if node is not None:
+                related[node] = max(related.get(node, 0.0), weight)
+
+        for source in initial:
+            self.support[source] += 1
+            row = self.delta.setdefault(source, Counter())
+            for target, weight in related.items():
+                if target != source:
+                    row[target] += weight
+                    self.delta_edges += 1
+
+        if self.delta_edges >= self.compact_every:
+            self.compact()
+        return True
+
+    def compact(self):
+        """Merge delta edges into the CSR arrays, rows sorted by weight"""
+        if not self.delta and len(self.indptr) == len(self.names) + 1:
+            return
+
+        indptr = array("I", [0])
+        indices = array("I")
+        weights = array("f")
+        rows = len(self.indptr) - 1
+        for node in range(len(self.names)):
+            merged = Counter()
+            if node < rows:
+                start, end = self.indptr[node], self.indptr[node + 1]
+                for col, weight in zip(self.indices[start:end], self.weights[start:end]):
+                    merged[col] += weight
+            if node in self.delta:
+                merged.update(self.delta[node])
+            for col, weight in sorted(merged.items(), key=lambda item: -item[1]):
+                indices.append(col)
+                weights.append(weight)
+            indptr.append(len(indices))
+
+        self.indptr, self.indices, self.weights = indptr, indices, weights
+        self.delta = {}
+        self.delta_edges = 0
+
+    def related(self, symptoms: Iterable, language: str = "English", limit: int = 30) -> Optional[List[str]]:
+        """
+        Related symptoms to ask about
+
+        Args:
+            symptoms: Initial symptoms (dicts or strings)
+            language: Request language (the index holds English names only)
+            limit: Max symptoms returned
+
+        Returns:
+            Ranked symptom names, or None if the index cannot cover the request
+        """
+        start = time.perf_counter()
+        self.queries += 1
+        result = None
+        if self.ready and language == "English":
+            result = self._related(canonical_symptoms(symptoms), limit)
+
+        self.total_lookup_us += (time.perf_counter() - start) * 1e6
+        if result is None:
+            self.fallbacks += 1
+        else:
+            self.answered += 1
+        return result
+
+    def _related(self, keys: List[str], limit: int) -> Optional[List[str]]:
+        sources = []
+        for key in keys:
+            node = self.ids.get(key)
+            if node is None or self.support[node] < self.min_support:
+                return None
+            sources.append(node)
+        if not sources:
+            return None
+
+        # Score = sum over initial symptoms of P(asked about r | started with s)
+        scores: Dict[int, float] = {}
+        rows = len(self.indptr) - 1
+        for source in sources:
+            support = self.support[source]
+            if source < rows:
+                start, end = self.indptr[source], self.indptr[source + 1]
+                for col, weight in zip(self.indices[start:end], self.weights[start:end]):
+                    scores[col] = scores.get(col, 0.0) + weight / support
+            for col, weight in self.delta.get(source, {}).items():
+                scores[col] = scores.get(col, 0.0) + weight / support
+
+        for source in sources:
+            scores.pop(source, None)
+        if len(scores) < self.min_related:
+            return None
+
+        ranked = sorted(scores.items(), key=lambda item: -item[1])[:limit]
+        return [self.names[col] for col, _ in ranked]
+
+    async def build(self, database, batch_size: int = 1000) -> int:
+        """
+        Build the index from completed visits
+
+        Args:
+            database: Motor database
+            batch_size: Cursor batch size
+
+        Returns:
+            Number of visits indexed
+        """
+        start_time = time.time()
+        cursor = database["visits"].find(
+            {"status": "COMPLETED", "extracted_data.symptoms": {"$exists": True}},
+            {"extracted_data.symptoms": 1, "refinements": 1}
+        ).batch_size(batch_size)
+
+        added = 0
+        async for visit in cursor:
+            extracted = visit.get("extracted_data") or {}
+            if self.add_visit(str(visit["_id"]), extracted.get("symptoms"), visit.get("refinements")):
+                added += 1
+
+        self.compact()
+        self.ready = True
+        self.last_build_seconds = time.time() - start_time
+        print(f"[SYMPTOM-INDEX] Indexed {added} visits, {len(self.names)} symptoms, "
+              f"{len(self.indices)} edges in {self.last_build_seconds:.2f}s")
+        return added
+
+    def get_stats(self) -> Dict[str, any]:
+        """Get index size and hit statistics"""
+        return {
+            "ready": self.ready,
+            "visits": len(self.visit_ids),
+            "symptoms": len(self.names),
+            "edges": len(self.indices),
+            "delta_edges": self.delta_edges,
+            "bytes": (self.indptr.itemsize * len(self.indptr) + self.indices.itemsize * len(self.indices)
+                      + self.weights.itemsize * len(self.weights)),
+            "queries": self.queries,
+            "answered": self.answered,
+            "fallbacks": self.fallbacks,
+            "answer_rate": round(self.answered / self.queries * 100, 2) if self.queries > 0 else 0,
+            "avg_lookup_us": round(self.total_lookup_us / self.queries, 1) if self.queries > 0 else 0,
+            "last_build_seconds": round(self.last_build_seconds, 3)
+        }
+
+
+# Global index instance
+symptom_index = SymptomIndex(
+    min_support=int(os.getenv("SYMPTOM_INDEX_MIN_SUPPORT", "5")),
+    min_related=int(os.getenv("SYMPTOM_INDEX_MIN_RELATED", "10"))
+)
@@ -0,0 +1,88 @@
+"""
+TTS format isolation
+The cache, ETag and single-flight key must keep mp3 and opus audio apart
+
+Run from the backend directory:
+    python -m pytest -q tests
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.http_audio import audio_media_type
+from utils.tts_cache import TTSCache
+from utils.tts_engine import TTSSynthesizer
+
+
+class FakeSpeech:
+    """Stands in for client.audio.speech; returns audio tagged with its format"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def create(self, model, voice, input, response_format):
+        self.calls.append(response_format)
+        await asyncio.sleep(0)
+        return type("SpeechResponse", (), {"content": f"{response_format}:{input}".encode()})()
+
+
+class FakeClient:
+    def __init__(self):
+        self.audio = type("Audio", (), {"speech": FakeSpeech()})()
+
+
+def make_engine():
+    client = FakeClient()
+    engine = TTSSynthesizer(client, TTSCache(maxsize=10), model="tts-1")
+    return engine, client.audio.speech
+
+
+def test_mp3_after_opus_is_not_served_opus_bytes():
+    engine, speech = make_engine()
+    text = "Please rest and drink plenty of water."
+
+    async def run():
+        opus = await engine.synthesize(text, "alloy", response_format="opus")
+        mp3 = await engine.synthesize(text, "alloy", response_format="mp3")
+        return opus, mp3
+
+    opus, mp3 = asyncio.run(run())
+
+    assert opus.startswith(b"opus:")
+    assert mp3.startswith(b"mp3:")
+    assert speech.calls == ["opus", "mp3"]
+    assert engine.cache.etag("tts-1", "alloy", text, "opus") != engine.cache.etag("tts-1", "alloy", text, "mp3")
+
+
+def test_concurrent_formats_do_not_share_a_flight():
+    engine, speech = make_engine()
+    text = "Your results look normal."
+
+    async def run():
+        return await asyncio.gather(
+            engine.synthesize(text, "alloy", response_format="opus"),
+            engine.synthesize(text, "alloy", response_format="mp3"),
+            engine.synthesize(text, "alloy", response_format="mp3"),
+        )
+
+    opus, mp3, mp3_again = asyncio.run(run())
+
+    assert opus.startswith(b"opus:")
+    assert mp3 == mp3_again and mp3.startswith(b"mp3:")
+    assert sorted(speech.calls) == ["mp3", "opus"]
+
+    # Cached entries are also per format
+    async def cached():
+        return await engine.synthesize(text, "alloy", response_format="mp3")
+
+    assert asyncio.run(cached()) == mp3
+    assert len(speech.calls) == 2
+
+
+def test_media_type_follows_format():
+    assert audio_media_type("mp3") == "audio/mpeg"
+    assert audio_media_type(None) == "audio/mpeg"
+    assert audio_media_type("opus") == "audio/ogg"
+    assert audio_media_type("wav") == "audio/wav"
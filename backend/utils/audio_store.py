@@ -0,0 +1,301 @@
+"""
+Persistent Audio Stores
+Second-tier backends for the TTS cache (content-addressed disk and Mongo GridFS)
+"""
+import asyncio
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+from gridfs.errors import NoFile
+
+
+class DiskAudioStore:
+    """
+    Content-addressed on-disk audio store with size-based LRU eviction
+
+    The directory may be shared by several worker processes. File mtimes are
+    the shared LRU clock (reads touch them), and the usage checked against
+    the budget is re-read from the directory every rescan_every writes and
+    whenever the local estimate is over budget, so files written by other
+    workers count too. Eviction frees down to low_water of the budget, so a
+    full directory is not rescanned on every write.
+    """
+
+    name = "disk"
+
+    def __init__(self, root: str, max_bytes: int = 512 * 1024 * 1024, rescan_every: int = 50, low_water: float = 0.9):
+        """
+        Initialize disk store
+
+        Args:
+            root: Directory holding the sharded cache files
+            max_bytes: Byte budget for the whole directory before least recently used files are evicted
+            rescan_every: Re-read directory usage every N writes of this process
+            low_water: Fraction of max_bytes left after an eviction
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.rescan_every = max(1, rescan_every)
+        self.low_water = min(1.0, max(0.0, low_water))
+        self.lock = threading.Lock()
+
+        # key -> size, ordered from least to most recently used
+        self.index: "OrderedDict[str, int]" = OrderedDict()
+        self.total_bytes = 0
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.rescans = 0
+
+        os.makedirs(self.root, exist_ok=True)
+        self._load_index()
+
+    def _path(self, key: str) -> str:
+        """Shard by content hash, encode the full key in the file name"""
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.root, digest[:2], key.encode("utf-8").hex() + ".bin")
+
+    def _load_index(self):
+        """Rebuild the LRU index from the files on disk, written by any worker (oldest access first)"""
+        entries = []
+        for shard in os.listdir(self.root):
+            shard_dir = os.path.join(self.root, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for filename in os.listdir(shard_dir):
+                if not filename.endswith(".bin"):
+                    continue
+                try:
+                    key = bytes.fromhex(filename[:-4]).decode("utf-8")
+                    stat = os.stat(os.path.join(shard_dir, filename))
+                except (ValueError, OSError):
+                    continue
+                entries.append((stat.st_mtime, key, stat.st_size))
+
+        entries.sort()
+        with self.lock:
+            self.index = OrderedDict((key, size) for _, key, size in entries)
+            self.total_bytes = sum(self.index.values())
+
+    def _evict(self):
+        """Remove least recently used files down to the low-water mark once over budget (lock held)"""
+        if self.total_bytes <= self.max_bytes:
+            return
+        while self.total_bytes > self.max_bytes * self.low_water and self.index:
+            key, size = self.index.popitem(last=False)
+            self.total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def get_sync(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            # Touch for LRU ordering that survives restarts
+            os.utime(path)
+        except OSError:
+            with self.lock:
+                self.misses += 1
+                if key in self.index:
+                    self.total_bytes -= self.index.pop(key)
+            return None
+
+        with self.lock:
+            self.hits += 1
+            if key in self.index:
+                self.index.move_to_end(key)
+            else:
+                # Written by another worker
+                self.index[key] = len(data)
+                self.total_bytes += len(data)
+        return data
+
+    def put_sync(self, key: str, data: bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Atomic write so concurrent workers never read a partial file
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self.lock:
+            self.writes += 1
+            if key in self.index:
+                self.total_bytes -= self.index.pop(key)
+            self.index[key] = len(data)
+            self.total_bytes += len(data)
+            rescan = self.total_bytes > self.max_bytes or self.writes % self.rescan_every == 0
+
+        if rescan:
+            # Other workers write to the same directory: count their files too
+            self._load_index()
+            self.rescans += 1
+        with self.lock:
+            self._evict()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self.get_sync, key)
+
+    async def put(self, key: str, data: bytes):
+        await asyncio.to_thread(self.put_sync, key, data)
+
+    async def recent_keys(self, count: int) -> List[str]:
+        """Most recently used keys, newest first"""
+        with self.lock:
+            return list(reversed(self.index.keys()))[:count]
+
+    def get_stats(self) -> Dict[str, any]:
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self.index),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total * 100, 2) if total > 0 else 0,
+                "writes": self.writes,
+                "evictions": self.evictions,
+                "rescans": self.rescans
+            }
+
+
+class GridFSAudioStore:
+    """
+    Shared audio store in MongoDB GridFS with size-based eviction
+
+    Workers that miss on the same key at once may both upload it. Reads take
+    the newest revision, and each writer drops every older revision after
+    its upload, so duplicates do not outlive the race.
+    """
+
+    name = "gridfs"
+
+    def __init__(self, database_provider: Callable, bucket_name: str = "tts_audio",
+                 max_bytes: int = 1024 * 1024 * 1024, evict_every: int = 50):
+        """
+        Initialize GridFS store
+
+        Args:
+            database_provider: Callable returning the Motor database (or None)
+            bucket_name: GridFS bucket name
+            max_bytes: Byte budget before oldest files are evicted
+            evict_every: Run the eviction check every N writes
+        """
+        self.database_provider = database_provider
+        self.bucket_name = bucket_name
+        self.max_bytes = max_bytes
+        self.evict_every = max(1, evict_every)
+        self._bucket = None
+        self._database = None
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.errors = 0
+
+    def _get_bucket(self):
+        database = self.database_provider()
+        if database is None:
+            return None
+        if self._bucket is None or self._database is not database:
+            from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+            self._bucket = AsyncIOMotorGridFSBucket(database, bucket_name=self.bucket_name)
+            self._database = database
+        return self._bucket
+
+    async def get(self, key: str) -> Optional[bytes]:
+        bucket = self._get_bucket()
+        if bucket is None:
+            return None
+        try:
+            stream = await bucket.open_download_stream_by_name(key, revision=-1)
+            data = await stream.read()
+            self.hits += 1
+            return data
+        except NoFile:
+            self.misses += 1
+            return None
+        except Exception as e:
+            self.errors += 1
+            print(f"[TTS-CACHE] GridFS read error: {e}")
+            self.misses += 1
+            return None
+
+    async def put(self, key: str, data: bytes):
+        bucket = self._get_bucket()
+        if bucket is None:
+            return
+        files = self._database[f"{self.bucket_name}.files"]
+        if await files.find_one({"filename": key}, {"_id": 1}):
+            return
+
+        await bucket.upload_from_stream(key, data)
+        await self._drop_stale_revisions(key)
+        self.writes += 1
+        if self.writes % self.evict_every == 0:
+            await self._evict()
+
+    async def _drop_stale_revisions(self, key: str):
+        """Delete all but the newest upload of key (every writer keeps the same one)"""
+        files = self._database[f"{self.bucket_name}.files"]
+        cursor = files.find({"filename": key}, {"_id": 1}).sort([("uploadDate", -1), ("_id", -1)]).skip(1)
+        async for doc in cursor:
+            try:
+                await self._bucket.delete(doc["_id"])
+            except NoFile:
+                # Already dropped by the concurrent writer
+                pass
+
+    async def _evict(self):
+        files = self._database[f"{self.bucket_name}.files"]
+        result = await files.aggregate([{"$group": {"_id": None, "total": {"$sum": "$length"}}}]).to_list(length=1)
+        total = result[0]["total"] if result else 0
+        if total <= self.max_bytes:
+            return
+
+        cursor = files.find({}, {"_id": 1, "length": 1}).sort("uploadDate", 1)
+        async for doc in cursor:
+            if total <= self.max_bytes:
+                break
+            try:
+                await self._bucket.delete(doc["_id"])
+            except NoFile:
+                # Evicted or replaced by another worker meanwhile
+                pass
+            else:
+                self.evictions += 1
+            total -= doc.get("length", 0)
+
+    async def recent_keys(self, count: int) -> List[str]:
+        if self._get_bucket() is None:
+            return []
+        files = self._database[f"{self.bucket_name}.files"]
+        cursor = files.find({}, {"filename": 1}).sort("uploadDate", -1).limit(count)
+        return [doc["filename"] async for doc in cursor]
+
+    def get_stats(self) -> Dict[str, any]:
+        total = self.hits + self.misses
+        return {
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total * 100, 2) if total > 0 else 0,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "errors": self.errors
+        }
@@ -0,0 +1,136 @@
+"""
+HTTP helpers for audio responses
+Strong ETags, conditional requests (304) and single byte-range responses (206)
+"""
+import re
+from typing import Optional, Tuple, Union
+
+from fastapi import Request
+from fastapi.responses import Response
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+# Content types for the formats the TTS API can return
+AUDIO_MEDIA_TYPES = {
+    "mp3": "audio/mpeg",
+    "opus": "audio/ogg",
+    "aac": "audio/aac",
+    "flac": "audio/flac",
+    "wav": "audio/wav",
+    "pcm": "audio/L16"
+}
+
+
+def audio_media_type(response_format: Optional[str]) -> str:
+    """Content type for a TTS response format (mp3 when unset)"""
+    return AUDIO_MEDIA_TYPES.get(response_format or "mp3", "application/octet-stream")
+
+
+def etag_matches(request: Request, etag: Optional[str]) -> bool:
+    """
+    Check If-None-Match against an ETag
+
+    Args:
+        request: Incoming request
+        etag: Quoted strong ETag of the current representation
+
+    Returns:
+        True if the client already has this representation
+    """
+    if not etag:
+        return False
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison, as required for If-None-Match
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return etag in candidates
+
+
+def parse_range(header: Optional[str], length: int) -> Union[None, Tuple[int, int], str]:
+    """
+    Parse a single-range Range header
+
+    Args:
+        header: Range header value
+        length: Full content length
+
+    Returns:
+        (start, end) inclusive, None to serve the full body, or "unsatisfiable"
+    """
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        # Multiple ranges or other units: serve the full body
+        return None
+
+    start_str, end_str = match.groups()
+    if not start_str and not end_str:
+        return None
+
+    if not start_str:
+        # Suffix range: last N bytes
+        suffix = int(end_str)
+        if suffix == 0:
+            return "unsatisfiable"
+        return max(0, length - suffix), length - 1
+
+    start = int(start_str)
+    end = int(end_str) if end_str else length - 1
+    if start >= length or end < start:
+        return "unsatisfiable"
+    return start, min(end, length - 1)
+
+
+def audio_response(
+    request: Request,
+    audio: Union[bytes, memoryview],
+    etag: Optional[str] = None,
+    max_age: int = 600,
+    media_type: str = "audio/mpeg"
+) -> Response:
+    """
+    Build a cacheable audio response honouring If-None-Match, Range and If-Range
+
+    Args:
+        request: Incoming request
+        audio: Full audio content
+        etag: Quoted strong ETag (content-addressed)
+        max_age: Cache lifetime in seconds
+        media_type: Content type
+
+    Returns:
+        200, 206, 304 or 416 response
+    """
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Cache-Control": f"public, max-age={max_age}, immutable"
+    }
+    if etag:
+        headers["ETag"] = etag
+
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    length = len(audio)
+    byte_range = parse_range(request.headers.get("range"), length)
+
+    # If-Range: only honour the range if the client's copy is current
+    if_range = request.headers.get("if-range")
+    if byte_range is not None and if_range and if_range.strip() != etag:
+        byte_range = None
+
+    if byte_range == "unsatisfiable":
+        headers["Content-Range"] = f"bytes */{length}"
+        return Response(status_code=416, headers=headers)
+
+    if byte_range is not None:
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{length}"
+        body = memoryview(audio)[start:end + 1]
+        return Response(content=body, status_code=206, media_type=media_type, headers=headers)
+
+    return Response(content=audio, media_type=media_type, headers=headers)
@@ -0,0 +1,249 @@
+"""
+Phrase Bank
+Pre-rendered audio for fixed disclaimer and boilerplate sentences
+
+Fixed strings are registered per language, rendered once per (model, voice)
+into a bundled asset directory and served without any TTS API call.
+
+Render missing assets at build time with:
+    python -m utils.phrase_bank --voices alloy
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from collections import Counter
+from typing import Awaitable, Callable, Dict, List, Optional
+
+# Fixed sentences exactly as they reach TTS (see sentence_splitter.format_for_doctor_tone,
+# text_normalizer.extract_voice_summary and the chat_with_doctor disclaimer prompt)
+PHRASES = {
+    "English": [
+        "Remember, this is for informational purposes only. Please consult a doctor if needed.",
+        "See below for more details.",
+        "Remember this is for informational purposes only.",
+        "Please visit a doctor if needed.",
+    ],
+    "Bengali": [
+        "মনে রাখবেন, এটি শুধুমাত্র তথ্যমূলক। কোনো সমস্যা হলে ডাক্তারের পরামর্শ নিন।",
+        "আরো বিস্তারিত নিচে দেখুন।",
+        "মনে রাখবেন, এটি শুধুমাত্র তথ্যমূলক।",
+        "কোনো সমস্যা হলে ডাক্তারের পরামর্শ নিন।",
+    ],
+}
+
+DEFAULT_ASSET_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets", "phrase_bank")
+
+
+def _phrase_key(text: str) -> str:
+    return " ".join(text.split())
+
+
+def _phrase_hash(text: str) -> str:
+    return hashlib.sha256(_phrase_key(text).encode("utf-8")).hexdigest()[:16]
+
+
+class PhraseBank:
+    """Registry of fixed phrases with bundled audio and hot-phrase reporting"""
+
+    def __init__(self, asset_dir: str = DEFAULT_ASSET_DIR, phrases: Dict[str, List[str]] = None,
+                 candidate_limit: int = 2000):
+        """
+        Initialize phrase bank
+
+        Args:
+            asset_dir: Directory with rendered audio (<model>/<voice>/<hash>.mp3)
+            phrases: Fixed phrases per language
+            candidate_limit: Max distinct non-bank sentences tracked for growth
+        """
+        self.asset_dir = asset_dir
+        self.phrases = phrases or PHRASES
+        self.candidate_limit = candidate_limit
+        self.lock = threading.Lock()
+
+        # phrase key -> language
+        self.registry: Dict[str, str] = {}
+        for language, texts in self.phrases.items():
+            for text in texts:
+                self.registry[_phrase_key(text)] = language
+
+        # (model, voice, phrase key) -> audio
+        self.audio: Dict[tuple, bytes] = {}
+
+        # Metrics
+        self.hits: Counter = Counter()
+        self.misses: Counter = Counter()
+
+        self.load()
+
+    def _asset_path(self, model: str, voice: str, text: str) -> str:
+        return os.path.join(self.asset_dir, model, voice, _phrase_hash(text) + ".mp3")
+
+    def load(self) -> int:
+        """
+        Load bundled audio for registered phrases
+
+        Returns:
+            Number of (model, voice, phrase) assets loaded
+        """
+        loaded = {}
+        if os.path.isdir(self.asset_dir):
+            by_hash = {_phrase_hash(key): key for key in self.registry}
+            for model in os.listdir(self.asset_dir):
+                model_dir = os.path.join(self.asset_dir, model)
+                if not os.path.isdir(model_dir):
+                    continue
+                for voice in os.listdir(model_dir):
+                    voice_dir = os.path.join(model_dir, voice)
+                    if not os.path.isdir(voice_dir):
+                        continue
+                    for filename in os.listdir(voice_dir):
+                        key = by_hash.get(filename[:-4]) if filename.endswith(".mp3") else None
+                        if key is None:
+                            continue
+                        with open(os.path.join(voice_dir, filename), "rb") as f:
+                            loaded[(model, voice, key)] = f.read()
+
+        with self.lock:
+            self.audio = loaded
+        print(f"[PHRASE-BANK] Loaded {len(loaded)} pre-rendered phrases")
+        return len(loaded)
+
+    def is_registered(self, text: str) -> bool:
+        return _phrase_key(text) in self.registry
+
+    def get(self, model: str, voice: str, text: str) -> Optional[bytes]:
+        """
+        Get pre-rendered audio for a fixed phrase
+
+        Args:
+            model: TTS model
+            voice: Voice name
+            text: Sentence text
+
+        Returns:
+            Audio bytes if the phrase is banked for this model/voice, None otherwise
+        """
+        key = _phrase_key(text)
+        if key not in self.registry:
+            return None
+
+        with self.lock:
+            audio = self.audio.get((model, voice, key))
+            if audio is not None:
+                self.hits[key] += 1
+        return audio
+
+    def record_synthesis(self, text: str):
+        """Count a sentence that had to be synthesized (candidate for the bank)"""
+        key = _phrase_key(text)
+        with self.lock:
+            self.misses[key] += 1
+            # Keep the tracker bounded: drop the long tail of one-off sentences
+            if len(self.misses) > self.candidate_limit:
+                self.misses = Counter(dict(self.misses.most_common(self.candidate_limit // 2)))
+
+    async def render_missing(self, model: str, voices: List[str], synthesize: Callable[[str, str], Awaitable[bytes]]) -> int:
+        """
+        Render and save audio for registered phrases that have no asset yet
+
+        Args:
+            model: TTS model the audio is rendered with
+            voices: Voices to render
+            synthesize: async (text, voice) -> audio bytes
+
+        Returns:
+            Number of phrases rendered
+        """
+        rendered = 0
+        for voice in voices:
+            for key in self.registry:
+                with self.lock:
+                    if (model, voice, key) in self.audio:
+                        continue
+                try:
+                    audio = await synthesize(key, voice)
+                except Exception as e:
+                    print(f"[PHRASE-BANK] Failed to render '{key[:40]}' ({voice}): {e}")
+                    continue
+
+                path = self._asset_path(model, voice, key)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "wb") as f:
+                    f.write(audio)
+                with self.lock:
+                    self.audio[(model, voice, key)] = audio
+                rendered += 1
+
+        if rendered:
+            self._write_manifest()
+        print(f"[PHRASE-BANK] Rendered {rendered} phrases")
+        return rendered
+
+    def _write_manifest(self):
+        """Human-readable index of the asset directory"""
+        manifest = {_phrase_hash(key): {"text": key, "language": language} for key, language in self.registry.items()}
+        os.makedirs(self.asset_dir, exist_ok=True)
+        with open(os.path.join(self.asset_dir, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    def get_report(self, top: int = 20, min_count: int = 3) -> Dict[str, any]:
+        """
+        Report phrase usage
+
+        Args:
+            top: Number of growth candidates to return
+            min_count: Minimum syntheses for a sentence to be a candidate
+
+        Returns:
+            Dictionary with banked phrase hits and hot non-bank sentences
+        """
+        with self.lock:
+            phrases = [
+                {
+                    "text": key,
+                    "language": language,
+                    "hits": self.hits[key],
+                    "rendered": sorted(f"{model}/{voice}" for (model, voice, k) in self.audio if k == key)
+                }
+                for key, language in self.registry.items()
+            ]
+            candidates = [
+                {"text": text, "syntheses": count}
+                for text, count in self.misses.most_common(top)
+                if count >= min_count and text not in self.registry
+            ]
+
+        phrases.sort(key=lambda p: p["hits"], reverse=True)
+        return {
+            "phrases": phrases,
+            "total_hits": sum(p["hits"] for p in phrases),
+            "candidates": candidates
+        }
+
+
+# Global phrase bank instance
+phrase_bank = PhraseBank()
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from openai import AsyncOpenAI
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Render phrase bank audio assets")
+    parser.add_argument("--model", default=os.getenv("TTS_MODEL", "gpt-4o-mini-tts"))
+    parser.add_argument("--voices", default=os.getenv("PHRASE_BANK_VOICES", "alloy"))
+    args = parser.parse_args()
+
+    client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+    async def synthesize(text: str, voice: str) -> bytes:
+        response = await client.audio.speech.create(model=args.model, voice=voice, input=text, response_format="mp3")
+        return response.content
+
+    voices = [v.strip() for v in args.voices.split(",") if v.strip()]
+    asyncio.run(phrase_bank.render_missing(args.model, voices, synthesize))
@@ -0,0 +1,255 @@
+"""
+Red-Flag Detector
+Rule-based emergency detection that runs before any LLM call
+
+All English and Bengali phrases from the keyword table (data/red_flags.json)
+are compiled into one trie-shaped regex, so a message is scanned once no
+matter how many phrases the table holds. Matches respect word boundaries
+(Bengali letters and vowel signs count as word characters; English phrases
+may end in s/es/ing) and negation ("no chest pain", "বুকে ব্যথা নেই"),
+unless the sentence goes on to reverse it ("never had chest pain until today").
+
+Co-occurrence rules flag a message that mentions an anchor term anywhere
+together with a qualifier ("fever" ... "104", "temperature" ... "high").
+"""
+import json
+import os
+import re
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+DEFAULT_TABLE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "red_flags.json")
+
+# Python's \w does not cover Bengali vowel signs (they are combining marks)
+_WORD = r"\w\u0980-\u09FF"
+_SEVERITY_RANK = {"urgent": 1, "critical": 2}
+
+# Inflections accepted after an English phrase ("chest pains", "choking")
+_EN_SUFFIX = "(?:s|es|ing)?"
+
+# English negation precedes the phrase within the same clause
+_CLAUSE_BREAK = re.compile(r"[.;:!?,\n]|\b(?:but|however|except|although|though|until|till|now)\b")
+# ...and is lifted when the rest of the sentence reverses it
+# ("never had chest pain before until today", "no chest pain before, but now it hurts")
+_NEGATION_LIFTED = re.compile(
+    r"^[^.;!?\n]*?\b(?:until|till|before\s+(?:now|today|tonight)"
+    r"|(?:but|and)\s+(?:now|today|tonight|recently|lately|suddenly|this\s+(?:morning|evening|week)))\b"
+)
+_TOKEN = re.compile(r"[a-z']+")
+_NEGATION_CUES = {
+    "no", "not", "never", "without", "deny", "denies", "denied",
+    "don't", "doesn't", "didn't", "haven't", "hasn't", "isn't", "wasn't"
+}
+_NEGATION_BIGRAMS = {("negative", "for"), ("free", "of")}
+# Bengali negation follows the phrase (the phrase may end mid-word on an inflection)
+_NEG_AFTER_BN = re.compile(
+    r"^[\u0980-\u09FF]*\s+(?:[\u0980-\u09FF]+\s+)?(?:নেই|নাই|না|নি|হয়নি|হয় না)(?![\u0980-\u09FF])"
+)
+
+
+def _trie_regex(phrases, boundary: bool = True) -> str:
+    """
+    Regex for a set of phrases, factored as a prefix trie
+
+    Python's re tries alternatives one by one, so a flat alternation costs
+    O(phrases) at every position; the trie form fails after one character
+    for almost all of them. Longer phrases win over their prefixes, spaces
+    match any whitespace, and English phrases must end on a word boundary
+    after an optional s/es/ing (Bengali ones may carry any inflection suffix).
+    boundary=False leaves the phrase end to the caller.
+    """
+    trie: dict = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = boundary and phrase.isascii()
+
+    def build(node: dict) -> str:
+        branches = []
+        for char in sorted(c for c in node if c):
+            token = r"\s+" if char == " " else re.escape(char)
+            branches.append(token + build(node[char]))
+        if "" in node:
+            # End of a phrase: tried after the longer continuations
+            branches.append(f"{_EN_SUFFIX}(?![{_WORD}])" if node[""] else "")
+        if len(branches) == 1:
+            return branches[0]
+        return "(?:" + "|".join(branches) + ")"
+
+    return build(trie)
+
+
+def _term_regex(terms) -> str:
+    """Standalone regex for co-occurrence terms (numbers must not be part of a longer number)"""
+    parts = []
+    numbers = [term for term in terms if term.isdigit()]
+    if numbers:
+        parts.append(rf"(?<!\d){_trie_regex(numbers, boundary=False)}(?!\d)")
+    words = [term for term in terms if not term.isdigit()]
+    if words:
+        parts.append(f"(?<![{_WORD}]){_trie_regex(words)}")
+    return "|".join(parts)
+
+
+class RedFlag(NamedTuple):
+    label: str
+    severity: str
+    phrase: str
+
+
+class RedFlagDetector:
+    """Compiled multi-pattern red-flag matcher with negation handling"""
+
+    def __init__(self, table_path: str = DEFAULT_TABLE_PATH):
+        """
+        Initialize detector
+
+        Args:
+            table_path: JSON keyword table ({"flags": [...], "emergency_reply": {...}})
+        """
+        self.table_path = table_path
+        with open(table_path, encoding="utf-8") as f:
+            table = json.load(f)
+
+        self.emergency_replies: Dict[str, str] = table.get("emergency_reply", {})
+
+        # Literal phrases go into one prefix trie; regex patterns stay separate alternatives
+        self.phrases: Dict[str, dict] = {}
+        patterns = []
+        # (anchor regex, qualifier regex, entry)
+        self.cooccurrences = []
+        for entry in table["flags"]:
+            for anchors, qualifiers in entry.get("cooccur", {}).values():
+                self.cooccurrences.append((re.compile(_term_regex(anchors)), re.compile(_term_regex(qualifiers)), entry))
+            for phrase in sum(entry.get("phrases", {}).values(), []):
+                key = " ".join(phrase.lower().split())
+                current = self.phrases.get(key)
+                if current is None or _SEVERITY_RANK[entry["severity"]] > _SEVERITY_RANK[current["severity"]]:
+                    self.phrases[key] = entry
+            for pattern in sum(entry.get("patterns", {}).values(), []):
+                patterns.append((pattern, entry))
+
+        self.groups: Dict[str, dict] = {}
+        parts = [f"(?P<phrase>{_trie_regex(self.phrases)})"]
+        for i, (pattern, entry) in enumerate(patterns):
+            name = f"p{i}"
+            self.groups[name] = entry
+            right = f"(?![{_WORD}])" if pattern.isascii() else ""
+            parts.append(f"(?P<{name}>{pattern}){right}")
+
+        self.pattern = re.compile(f"(?<![{_WORD}])(?:{'|'.join(parts)})")
+        self.phrase_count = len(self.phrases) + len(patterns) + len(self.cooccurrences)
+
+        # Metrics
+        self.calls = 0
+        self.flagged = 0
+        self.negated = 0
+        self.total_us = 0.0
+
+        print(f"[RED-FLAGS] Compiled {self.phrase_count} phrases from {os.path.basename(table_path)}")
+
+    def _phrase_entry(self, phrase: str) -> dict:
+        """Table entry of a matched phrase (English matches may carry an s/es/ing suffix)"""
+        entry = self.phrases.get(phrase)
+        if entry is not None:
+            return entry
+        for suffix in ("ing", "es", "s"):
+            if phrase.endswith(suffix) and phrase[:-len(suffix)] in self.phrases:
+                return self.phrases[phrase[:-len(suffix)]]
+        raise KeyError(phrase)
+
+    def _is_negated(self, text: str, start: int, end: int, ascii_only: bool) -> bool:
+        if ascii_only:
+            # A cue within the last four words of the same clause negates the phrase
+            clause = _CLAUSE_BREAK.split(text[max(0, start - 60):start])[-1]
+            tokens = _TOKEN.findall(clause)[-4:]
+            if not any(token in _NEGATION_CUES for token in tokens) and \
+                    not any(pair in _NEGATION_BIGRAMS for pair in zip(tokens, tokens[1:])):
+                return False
+            return _NEGATION_LIFTED.match(text[end:end + 80]) is None
+        return _NEG_AFTER_BN.match(text[end:end + 40]) is not None
+
+    def scan(self, text: Optional[str]) -> List[RedFlag]:
+        """
+        Find red flags in a message
+
+        Args:
+            text: User message (English, Bengali or mixed)
+
+        Returns:
+            One RedFlag per label (highest severity wins), in order of appearance
+        """
+        start_time = time.perf_counter()
+        self.calls += 1
+        found: Dict[str, RedFlag] = {}
+
+        if text:
+            normalized = text.lower().replace("’", "'")
+            for match in self.pattern.finditer(normalized):
+                phrase = match.group(0)
+                if match.lastgroup == "phrase":
+                    entry = self._phrase_entry(" ".join(phrase.split()))
+                else:
+                    entry = self.groups[match.lastgroup]
+                current = found.get(entry["label"])
+                if current is not None and _SEVERITY_RANK[entry["severity"]] <= _SEVERITY_RANK[current.severity]:
+                    continue
+                if self._is_negated(normalized, match.start(), match.end(), phrase.isascii()):
+                    self.negated += 1
+                    continue
+                found[entry["label"]] = RedFlag(entry["label"], entry["severity"], phrase)
+
+            for anchor, qualifier, entry in self.cooccurrences:
+                current = found.get(entry["label"])
+                if current is not None and _SEVERITY_RANK[entry["severity"]] <= _SEVERITY_RANK[current.severity]:
+                    continue
+                anchors = list(anchor.finditer(normalized))
+                if not anchors or qualifier.search(normalized) is None:
+                    continue
+                for match in anchors:
+                    if self._is_negated(normalized, match.start(), match.end(), match.group(0).isascii()):
+                        self.negated += 1
+                        continue
+                    found[entry["label"]] = RedFlag(entry["label"], entry["severity"], match.group(0))
+                    break
+
+        if found:
+            self.flagged += 1
+        self.total_us += (time.perf_counter() - start_time) * 1e6
+        return list(found.values())
+
+    def detect(self, text: Optional[str]) -> List[str]:
+        """
+        Red-flag labels found in a message
+
+        Args:
+            text: User message
+
+        Returns:
+            List of labels
+        """
+        return [flag.label for flag in self.scan(text)]
+
+    def emergency_reply(self, language: str = "English") -> str:
+        """Fixed reply used when a critical flag short-circuits the LLM"""
+        return self.emergency_replies.get(language) or self.emergency_replies.get("English", "")
+
+    def get_stats(self) -> Dict[str, any]:
+        """Get detector statistics"""
+        return {
+            "phrases": self.phrase_count,
+            "calls": self.calls,
+            "flagged": self.flagged,
+            "negated_matches": self.negated,
+            "avg_scan_us": round(self.total_us / self.calls, 2) if self.calls > 0 else 0
+        }
+
+
+def is_critical(flags: List[RedFlag]) -> bool:
+    """True if any flag needs an immediate emergency response"""
+    return any(flag.severity == "critical" for flag in flags)
+
+
+# Global detector instance
+red_flag_detector = RedFlagDetector(os.getenv("RED_FLAG_TABLE") or DEFAULT_TABLE_PATH)
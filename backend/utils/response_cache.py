@@ -0,0 +1,193 @@
+"""
+LLM Response Cache
+Per-method TTL/LRU cache for DoctorAgent responses keyed on canonicalized inputs
+"""
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Union
+from cachetools import TTLCache
+
+
+def prompt_version(template: str) -> str:
+    """
+    Short hash of a prompt template
+
+    Any edit to the template changes the version, so entries produced by
+    the old prompt are never served again.
+    """
+    return hashlib.sha256(template.encode("utf-8")).hexdigest()[:12]
+
+
+def canonical_text(text: Optional[str]) -> str:
+    """Case- and whitespace-insensitive form of free text"""
+    return " ".join((text or "").split()).casefold()
+
+
+def canonical_symptoms(symptoms: Iterable[Union[dict, str]]) -> List[str]:
+    """
+    Normalized, deduplicated and sorted symptom names
+
+    Args:
+        symptoms: Symptom dicts (normalizedName/name) or plain strings
+
+    Returns:
+        Sorted list of canonical names
+    """
+    names = set()
+    for symptom in symptoms or []:
+        if isinstance(symptom, dict):
+            name = symptom.get("normalizedName") or symptom.get("name") or symptom.get("symptom") or ""
+        else:
+            name = str(symptom)
+        name = canonical_text(name)
+        if name:
+            names.add(name)
+    return sorted(names)
+
+
+class ResponseCache:
+    """Thread-safe per-method response cache with TTL, LRU eviction and metrics"""
+
+    def __init__(self, maxsize: int = 500, ttl: int = 3600, disabled_methods: Optional[Iterable[str]] = None,
+                 enabled: bool = True):
+        """
+        Initialize response cache
+
+        Args:
+            maxsize: Maximum cached responses per method
+            ttl: Time-to-live in seconds
+            disabled_methods: Methods that bypass the cache
+            enabled: Master switch
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.enabled = enabled
+        self.disabled_methods = set(disabled_methods or [])
+        self.lock = threading.Lock()
+
+        # method -> TTLCache (least recently used entries are evicted first)
+        self.caches: Dict[str, TTLCache] = {}
+
+        # Metrics per method
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+
+    def is_enabled(self, method: str) -> bool:
+        return self.enabled and method not in self.disabled_methods
+
+    def set_enabled(self, method: str, enabled: bool):
+        """Enable or disable caching for one method (disabling drops its entries)"""
+        with self.lock:
+            if enabled:
+                self.disabled_methods.discard(method)
+            else:
+                self.disabled_methods.add(method)
+                self.caches.pop(method, None)
+
+    def make_key(self, method: str, model: str, template: str, **inputs: Any) -> str:
+        """
+        Build a cache key from canonicalized inputs
+
+        Args:
+            method: DoctorAgent method name
+            model: LLM model name
+            template: Prompt template (hashed into the key)
+            **inputs: Canonicalized inputs (language, symptoms, ...)
+
+        Returns:
+            Cache key string
+        """
+        payload = json.dumps(inputs, sort_keys=True, ensure_ascii=False, default=str)
+        input_hash = hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+        return f"{method}:{model}:{prompt_version(template)}:{input_hash}"
+
+    def get(self, method: str, key: str) -> Optional[Any]:
+        """
+        Get a cached response
+
+        Args:
+            method: DoctorAgent method name
+            key: Key from make_key
+
+        Returns:
+            Cached response if present and caching is enabled, None otherwise
+        """
+        if not self.is_enabled(method):
+            return None
+
+        with self.lock:
+            cache = self.caches.get(method)
+            value = cache.get(key) if cache is not None else None
+            if value is not None:
+                self.hits[method] = self.hits.get(method, 0) + 1
+                print(f"[LLM-CACHE] HIT {method}")
+            else:
+                self.misses[method] = self.misses.get(method, 0) + 1
+            return value
+
+    def set(self, method: str, key: str, value: Any):
+        """
+        Store a response
+
+        Args:
+            method: DoctorAgent method name
+            key: Key from make_key
+            value: Response to cache
+        """
+        if not self.is_enabled(method):
+            return
+
+        with self.lock:
+            cache = self.caches.get(method)
+            if cache is None:
+                cache = self.caches[method] = TTLCache(maxsize=self.maxsize, ttl=self.ttl)
+            cache[key] = value
+
+    def clear(self, method: Optional[str] = None):
+        """Clear one method's entries, or all of them"""
+        with self.lock:
+            if method is None:
+                self.caches.clear()
+            else:
+                self.caches.pop(method, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get per-method cache statistics
+
+        Returns:
+            Dictionary with hit rates and sizes per method
+        """
+        with self.lock:
+            methods = set(self.hits) | set(self.misses) | set(self.caches) | self.disabled_methods
+            per_method = {}
+            for method in sorted(methods):
+                hits = self.hits.get(method, 0)
+                misses = self.misses.get(method, 0)
+                total = hits + misses
+                cache = self.caches.get(method)
+                per_method[method] = {
+                    "enabled": self.is_enabled(method),
+                    "size": len(cache) if cache is not None else 0,
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_rate": round(hits / total * 100, 2) if total > 0 else 0
+                }
+
+            return {
+                "enabled": self.enabled,
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "methods": per_method
+            }
+
+
+# Global response cache instance
+response_cache = ResponseCache(
+    maxsize=int(os.getenv("LLM_CACHE_MAXSIZE", "500")),
+    ttl=int(os.getenv("LLM_CACHE_TTL", "3600")),
+    disabled_methods=[m.strip() for m in os.getenv("LLM_CACHE_DISABLED_METHODS", "").split(",") if m.strip()],
+    enabled=os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+)
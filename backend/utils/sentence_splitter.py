@@ -3,65 +3,44 @@ Sentence Splitter for TTS
 Smart sentence splitting for smooth sequential audio playback
 """
 import re
-from typing import List
+from typing import List, Optional, Tuple
 
 
-def split_into_sentences(text: str, language: str = "English", max_sentences: int = 12) -> List[str]:
+def _is_bengali(language: str) -> bool:
+    return language.lower() in ["bengali", "bangla", "bn"]
+
+
+def _split_complete(text: str, language: str = "English") -> Tuple[List[str], str]:
     """
-    Split text into sentences for TTS chunking
+    Split text into terminated sentences and an unterminated remainder
     
     Args:
-        text: Normalized text
+        text: Text to split
         language: "English" or "Bengali"
-        max_sentences: Maximum number of sentences to return
     
     Returns:
-        List of sentences ready for TTS
+        (sentences, remainder) tuple
     """
-    if not text or not text.strip():
-        return []
-    
-    sentences = []
-    
-    if language.lower() in ["bengali", "bangla", "bn"]:
+    if _is_bengali(language):
         # Bengali sentence splitting
         # Split on দাঁড়ি (।), question mark (?), exclamation (!)
         parts = re.split(r'([।?!])', text)
-        
-        current_sentence = ""
-        for i, part in enumerate(parts):
-            if i % 2 == 0:  # Text part
-                current_sentence += part.strip()
-            else:  # Punctuation
-                current_sentence += part
-                if current_sentence.strip():
-                    sentences.append(current_sentence.strip())
-                current_sentence = ""
-        
-        # Add remaining if any
-        if current_sentence.strip():
-            sentences.append(current_sentence.strip())
-    
     else:
         # English sentence splitting
-        # Split on period, question mark, exclamation
+        # Split on period, question mark, exclamation followed by whitespace
         parts = re.split(r'([.?!])\s+', text)
-        
-        current_sentence = ""
-        for i, part in enumerate(parts):
-            if i % 2 == 0:  # Text part
-                current_sentence += part.strip()
-            else:  # Punctuation
-                current_sentence += part + " "
-                if current_sentence.strip():
-                    sentences.append(current_sentence.strip())
-                current_sentence = ""
-        
-        # Add remaining if any
-        if current_sentence.strip():
-            sentences.append(current_sentence.strip())
     
-    # Filter out very short fragments and merge them
+    sentences = []
+    for i in range(1, len(parts), 2):
+        sentence = parts[i - 1].strip() + parts[i]
+        if sentence.strip():
+            sentences.append(sentence.strip())
+    
+    return sentences, parts[-1]
+
+
+def _merge_short_fragments(sentences: List[str]) -> List[str]:
+    """Merge very short fragments (< 8 chars) into neighbouring sentences"""
     merged_sentences = []
     pending = ""
     
@@ -84,12 +63,39 @@ def split_into_sentences(text: str, language: str = "English", max_sentences: in
     elif pending:
         merged_sentences.append(pending)
     
+    return merged_sentences
+
+
+def split_into_sentences(text: str, language: str = "English", max_sentences: int = 12) -> List[str]:
+    """
+    Split text into sentences for TTS chunking
+    
+    Args:
+        text: Normalized text
+        language: "English" or "Bengali"
+        max_sentences: Maximum number of sentences to return
+    
+    Returns:
+        List of sentences ready for TTS
+    """
+    if not text or not text.strip():
+        return []
+    
+    sentences, remainder = _split_complete(text, language)
+    
+    # Add remaining if any
+    if remainder.strip():
+        sentences.append(remainder.strip())
+    
+    # Filter out very short fragments and merge them
+    merged_sentences = _merge_short_fragments(sentences)
+    
     # Limit to max sentences
     if len(merged_sentences) > max_sentences:
         # Keep first sentences and add ellipsis
         merged_sentences = merged_sentences[:max_sentences]
         last_sentence = merged_sentences[-1]
-        if language.lower() in ["bengali", "bangla", "bn"]:
+        if _is_bengali(language):
             # Don't add ellipsis if already has punctuation
             if not last_sentence.endswith('।'):
                 merged_sentences[-1] = last_sentence + '।'
@@ -100,6 +106,97 @@ def split_into_sentences(text: str, language: str = "English", max_sentences: in
     return merged_sentences
 
 
+class IncrementalSentenceSplitter:
+    """
+    Streaming counterpart of split_into_sentences
+    
+    Text is fed in arbitrary pieces (e.g. LLM tokens). A sentence is released
+    as soon as it is certain that no later short fragment will be merged into
+    it, so the output matches split_into_sentences on the full text (without
+    the max_sentences cap).
+    """
+    
+    def __init__(self, language: str = "English"):
+        self.language = language
+        self.buffer = ""
+        self.held: Optional[str] = None  # Last merged sentence, may still grow
+        self.pending = ""  # Leading short fragment waiting for a sentence
+        self.has_merged = False
+    
+    def _add(self, sentence: str) -> List[str]:
+        """Apply the short-fragment merge rules to one terminated sentence"""
+        ready = []
+        if len(sentence) < 8 and self.has_merged:
+            self.held = (self.held + " " + sentence) if self.held is not None else sentence
+        elif self.pending:
+            if self.held is not None:
+                ready.append(self.held)
+            self.held = self.pending + " " + sentence
+            self.pending = ""
+            self.has_merged = True
+        elif len(sentence) < 8:
+            self.pending = sentence
+        else:
+            if self.held is not None:
+                ready.append(self.held)
+            self.held = sentence
+            self.has_merged = True
+        return ready
+    
+    def feed(self, text: str) -> List[str]:
+        """
+        Add text and return the sentences that are now final
+        
+        Args:
+            text: Next piece of text
+        
+        Returns:
+            List of finished sentences (possibly empty)
+        """
+        if not text:
+            return []
+        
+        self.buffer += text
+        sentences, self.buffer = _split_complete(self.buffer, self.language)
+        
+        ready = []
+        for sentence in sentences:
+            ready.extend(self._add(sentence))
+        
+        # Once the next sentence is known to be long enough, nothing can be
+        # merged into the held one any more
+        if self.held is not None and len(self.buffer.strip()) >= 8:
+            ready.append(self.held)
+            self.held = None
+        
+        return ready
+    
+    def flush(self) -> List[str]:
+        """
+        Finish the stream and return all remaining sentences
+        
+        Returns:
+            List of remaining sentences
+        """
+        ready = []
+        if self.buffer.strip():
+            ready.extend(self._add(self.buffer.strip()))
+        self.buffer = ""
+        
+        if self.pending:
+            if self.held is not None:
+                self.held += " " + self.pending
+            else:
+                self.held = self.pending
+            self.pending = ""
+        
+        if self.held is not None:
+            ready.append(self.held)
+            self.held = None
+        
+        return ready
+
+
 def format_for_doctor_tone(sentences: List[str], language: str = "English") -> List[str]:
     """
     Format sentences for calm, professional doctor tone
@@ -115,7 +212,7 @@ def format_for_doctor_tone(sentences: List[str], language: str = "English") -> L
         return []
     
     # Add disclaimer at the end if not present
-    if language.lower() in ["bengali", "bangla", "bn"]:
+    if _is_bengali(language):
         disclaimer = "মনে রাখবেন, এটি শুধুমাত্র তথ্যমূলক। কোনো সমস্যা হলে ডাক্তারের পরামর্শ নিন।"
         # Check if disclaimer already present
         has_disclaimer = any(disclaimer[:20] in s for s in sentences)
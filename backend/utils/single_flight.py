@@ -0,0 +1,84 @@
+"""
+Single-Flight Request Coalescing
+Concurrent callers with the same key share one in-flight upstream call
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time; duplicates await the same result"""
+
+    def __init__(self, name: str = "single-flight"):
+        """
+        Initialize coalescer
+
+        Args:
+            name: Label used in logs
+        """
+        self.name = name
+        # key -> [shared task, number of callers still waiting]
+        self.calls: Dict[str, list] = {}
+
+        # Metrics
+        self.executed = 0
+        self.coalesced = 0
+        self.failed = 0
+        self.peak_waiters = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run fn once for all concurrent callers with the same key
+
+        The shared call keeps running while at least one caller is still
+        waiting, so a cancelled or disconnected leader does not fail the
+        others. Errors are propagated to every waiter and not cached.
+
+        Args:
+            key: Coalescing key (e.g. cache key of the request)
+            fn: Zero-argument coroutine function performing the upstream call
+
+        Returns:
+            Result of fn
+        """
+        call = self.calls.get(key)
+        if call is None:
+            task = asyncio.ensure_future(fn())
+            call = [task, 0]
+            self.calls[key] = call
+            self.executed += 1
+            task.add_done_callback(lambda t, k=key: self._finish(k, t))
+        else:
+            self.coalesced += 1
+
+        call[1] += 1
+        self.peak_waiters = max(self.peak_waiters, call[1])
+        task = call[0]
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            # Last interested caller gone: stop the upstream call
+            if call[1] == 1 and not task.done():
+                task.cancel()
+            raise
+        finally:
+            call[1] -= 1
+
+    def _finish(self, key: str, task: asyncio.Task):
+        if self.calls.get(key, [None])[0] is task:
+            del self.calls[key]
+        if not task.cancelled() and task.exception() is not None:
+            self.failed += 1
+            print(f"[{self.name.upper()}] Shared call failed: {task.exception()}")
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get coalescing statistics"""
+        total = self.executed + self.coalesced
+        return {
+            "in_flight": len(self.calls),
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "coalesce_rate": round(self.coalesced / total * 100, 2) if total > 0 else 0,
+            "failed": self.failed,
+            "peak_waiters": self.peak_waiters
+        }
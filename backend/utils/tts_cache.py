@@ -1,9 +1,15 @@
 """
 TTS Cache Layer
-In-memory caching for generated TTS audio to reduce API calls and improve performance
+In-memory caching for generated TTS audio to reduce API calls and improve performance,
+optionally backed by persistent tiers (see utils/audio_store.py)
 """
+import asyncio
 import hashlib
+import os
+import sqlite3
+import tempfile
 import time
+from collections import OrderedDict
 from typing import Optional, Dict, Tuple, List
 from cachetools import TTLCache
 import threading
@@ -12,16 +18,19 @@ import threading
 class TTSCache:
     """Thread-safe TTS cache with TTL and metrics"""
     
-    def __init__(self, maxsize: int = 1000, ttl: int = 86400):
+    def __init__(self, maxsize: int = 1000, ttl: int = 86400, tiers: Optional[List] = None):
         """
         Initialize TTS cache
         
         Args:
             maxsize: Maximum number of cached items
             ttl: Time-to-live in seconds (default: 24 hours)
+            tiers: Persistent stores checked (in order) on memory misses
         """
         self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
         self.lock = threading.Lock()
+        self.tiers = list(tiers or [])
+        self._pending_writes = set()
         
         # Metrics
         self.hits = 0
@@ -29,7 +38,7 @@ class TTSCache:
         self.total_generation_time = 0.0
         self.generation_count = 0
     
-    def _make_key(self, model: str, voice: str, text: str) -> str:
+    def _make_key(self, model: str, voice: str, text: str, response_format: str = "mp3") -> str:
         """
         Generate cache key from TTS parameters
         
@@ -37,15 +46,32 @@ class TTSCache:
             model: TTS model name
             voice: Voice name
             text: Normalized text
+            response_format: Audio format (mp3, opus, wav, ...)
         
         Returns:
             Cache key string
         """
         # Hash the text for consistent key length
         text_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
-        return f"{model}:{voice}:{text_hash}"
+        return f"{model}:{voice}:{response_format}:{text_hash}"
     
-    def get(self, model: str, voice: str, text: str) -> Optional[bytes]:
+    def etag(self, model: str, voice: str, text: str, response_format: str = "mp3") -> str:
+        """
+        Strong HTTP ETag for TTS audio, derived from the cache key
+        
+        Args:
+            model: TTS model
+            voice: Voice name
+            text: Normalized text
+            response_format: Audio format
+        
+        Returns:
+            Quoted ETag string
+        """
+        key = self._make_key(model, voice, text, response_format)
+        return '"' + hashlib.sha256(key.encode('utf-8')).hexdigest()[:32] + '"'
+    
+    def get(self, model: str, voice: str, text: str, response_format: str = "mp3") -> Optional[bytes]:
         """
         Get cached audio
         
@@ -53,11 +79,12 @@ class TTSCache:
             model: TTS model
             voice: Voice name
             text: Normalized text
+            response_format: Audio format
         
         Returns:
             Audio bytes if cached, None otherwise
         """
-        key = self._make_key(model, voice, text)
+        key = self._make_key(model, voice, text, response_format)
         
         with self.lock:
             audio = self.cache.get(key)
@@ -68,7 +95,8 @@ class TTSCache:
                 self.misses += 1
                 return None
     
-    def set(self, model: str, voice: str, text: str, audio: bytes, generation_time: float = 0.0):
+    def set(self, model: str, voice: str, text: str, audio: bytes, generation_time: float = 0.0,
+            response_format: str = "mp3"):
         """
         Cache audio
         
@@ -78,8 +106,9 @@ class TTSCache:
             text: Normalized text
             audio: Audio bytes
            generation_time: Time taken to generate (for metrics)
+            response_format: Audio format of the bytes
         """
-        key = self._make_key(model, voice, text)
+        key = self._make_key(model, voice, text, response_format)
         
         with self.lock:
             self.cache[key] = audio
@@ -89,6 +118,102 @@ class TTSCache:
                 self.total_generation_time += generation_time
                 self.generation_count += 1
     
+    def add_tier(self, tier):
+        """Add a persistent store below the in-memory cache"""
+        self.tiers.append(tier)
+    
+    async def fetch(self, model: str, voice: str, text: str, response_format: str = "mp3") -> Optional[bytes]:
+        """
+        Get cached audio from memory, then from persistent tiers
+        
+        Hits in a lower tier are promoted into memory and faster tiers.
+        
+        Args:
+            model: TTS model
+            voice: Voice name
+            text: Normalized text
+            response_format: Audio format
+        
+        Returns:
+            Audio bytes if cached in any tier, None otherwise
+        """
+        audio = self.get(model, voice, text, response_format)
+        if audio is not None or not self.tiers:
+            return audio
+        
+        key = self._make_key(model, voice, text, response_format)
+        for i, tier in enumerate(self.tiers):
+            try:
+                audio = await tier.get(key)
+            except Exception as e:
+                print(f"[TTS-CACHE] {tier.name} read error: {e}")
+                continue
+            
+            if audio is not None:
+                with self.lock:
+                    self.cache[key] = audio
+                for upper in self.tiers[:i]:
+                    self._write_behind(upper, key, audio)
+                return audio
+        
+        return None
+    
+    async def store(self, model: str, voice: str, text: str, audio: bytes, generation_time: float = 0.0,
+                    response_format: str = "mp3"):
+        """
+        Cache audio in memory and write it through to persistent tiers
+        
+        Tier writes run in the background so synthesis never waits on them.
+        """
+        self.set(model, voice, text, audio, generation_time, response_format)
+        
+        key = self._make_key(model, voice, text, response_format)
+        for tier in self.tiers:
+            self._write_behind(tier, key, audio)
+    
+    def _write_behind(self, tier, key: str, audio: bytes):
+        async def write():
+            try:
+                await tier.put(key, audio)
+            except Exception as e:
+                print(f"[TTS-CACHE] {tier.name} write error: {e}")
+        
+        task = asyncio.create_task(write())
+        self._pending_writes.add(task)
+        task.add_done_callback(self._pending_writes.discard)
+    
+    async def warm(self, count: int = 200) -> int:
+        """
+        Load the most recently used entries from persistent tiers into memory
+        
+        Args:
+            count: Maximum number of entries to load
+        
+        Returns:
+            Number of entries loaded
+        """
+        loaded = 0
+        for tier in self.tiers:
+            if loaded >= count:
+                break
+            try:
+                keys = await tier.recent_keys(count - loaded)
+                for key in keys:
+                    with self.lock:
+                        if key in self.cache:
+                            continue
+                    audio = await tier.get(key)
+                    if audio is None:
+                        continue
+                    with self.lock:
+                        self.cache[key] = audio
+                    loaded += 1
+            except Exception as e:
+                print(f"[TTS-CACHE] Warm-up from {tier.name} failed: {e}")
+        
+        print(f"[TTS-CACHE] Warmed {loaded} entries")
+        return loaded
+    
     def get_stats(self) -> Dict[str, any]:
         """
         Get cache statistics
@@ -109,7 +234,8 @@ class TTSCache:
                 "hit_rate": round(hit_rate, 2),
                 "total_requests": total_requests,
                 "avg_generation_time_ms": round(avg_gen_time * 1000, 2),
-                "total_generations": self.generation_count
+                "total_generations": self.generation_count,
+                "tiers": {tier.name: tier.get_stats() for tier in self.tiers}
             }
     
     def clear(self):
@@ -121,19 +247,120 @@ class TTSCache:
 tts_cache = TTSCache(maxsize=1000, ttl=86400)
 
 
+class AsyncChunkAccess:
+    """
+    Async entry points of the chunk stores for request handlers
+    
+    Stores that block on I/O (blocking = True) run each call in a worker
+    thread so the event loop keeps serving other requests.
+    """
+    
+    blocking = False
+    
+    async def _call(self, fn, *args):
+        if self.blocking:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+    
+    def session_exists(self, session_id: str) -> bool:
+        """True if the session is registered or still has chunks"""
+        return self.get_session_info(session_id) is not None or bool(self.get_session_chunks(session_id))
+    
+    def next_chunk(self, session_id: str, index: int) -> Tuple[Optional[int], Optional[memoryview]]:
+        """
+        (expected chunk count or None, audio of chunk c<index> or None)
+        
+        The count falls back to the chunks held once the session manifest is gone.
+        """
+        info = self.get_session_info(session_id)
+        total = info["total"] if info else len(self.get_session_chunks(session_id))
+        if total is not None and index > total:
+            return total, None
+        return total, self.get_chunk(session_id, f"c{index}")
+    
+    async def open_session_async(self, session_id: str, total: Optional[int] = None):
+        await self._call(self.open_session, session_id, total)
+    
+    async def close_session_async(self, session_id: str, total: int):
+        await self._call(self.close_session, session_id, total)
+    
+    async def save_chunk_async(self, session_id: str, chunk_id: str, audio: bytes, text: str, etag: Optional[str] = None) -> Dict:
+        return await self._call(self.save_chunk, session_id, chunk_id, audio, text, etag)
+    
+    async def save_chunks_async(self, session_id: str, chunks: List[Tuple[str, bytes, str]]) -> List[Dict]:
+        return await self._call(self.save_chunks, session_id, chunks)
+    
+    async def get_chunk_entry_async(self, session_id: str, chunk_id: str) -> Optional[Tuple[memoryview, Optional[str]]]:
+        return await self._call(self.get_chunk_entry, session_id, chunk_id)
+    
+    async def session_exists_async(self, session_id: str) -> bool:
+        return await self._call(self.session_exists, session_id)
+    
+    async def next_chunk_async(self, session_id: str, index: int) -> Tuple[Optional[int], Optional[memoryview]]:
+        return await self._call(self.next_chunk, session_id, index)
+    
+    async def get_stats_async(self) -> Dict[str, any]:
+        return await self._call(self.get_stats)
+
+
 # Chunk storage for multi-part audio
-class ChunkStore:
-    """Temporary storage for audio chunks"""
+class ChunkStore(AsyncChunkAccess):
+    """Temporary storage for audio chunks with a hard byte budget"""
     
-    def __init__(self, ttl: int = 600):
+    def __init__(self, ttl: int = 600, max_bytes: int = 64 * 1024 * 1024):
         """
         Initialize chunk store
         
         Args:
             ttl: Time-to-live in seconds (default: 10 minutes)
+            max_bytes: Maximum audio bytes held (default: 64 MB)
         """
-        self.store = TTLCache(maxsize=10000, ttl=ttl)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
         self.lock = threading.Lock()
+        
+        # (session_id, chunk_id) -> (audio, expires_at, etag), oldest first
+        self.entries: "OrderedDict[Tuple[str, str], Tuple[bytes, float, Optional[str]]]" = OrderedDict()
+        # session_id -> {chunk_id: size}
+        self.sessions: Dict[str, Dict[str, int]] = {}
+        self.session_bytes: Dict[str, int] = {}
+        # session_id -> (expected chunk count or None while still generating, expires_at)
+        self.manifests: "OrderedDict[str, Tuple[Optional[int], float]]" = OrderedDict()
+        self.total_bytes = 0
+        
+        # Metrics
+        self.evictions = 0
+        self.expirations = 0
+        self.rejected = 0
+    
+    def _remove(self, key: Tuple[str, str]):
+        """Drop one chunk and update accounting (lock held)"""
+        audio, _, _ = self.entries.pop(key)
+        session_id, chunk_id = key
+        size = len(audio)
+        self.total_bytes -= size
+        
+        chunks = self.sessions.get(session_id)
+        if chunks is not None:
+            chunks.pop(chunk_id, None)
+            self.session_bytes[session_id] -= size
+            if not chunks:
+                del self.sessions[session_id]
+                del self.session_bytes[session_id]
+    
+    def _expire(self, now: float):
+        """Drop expired chunks and session manifests from the front (lock held)"""
+        while self.manifests:
+            session_id, (_, expires_at) = next(iter(self.manifests.items()))
+            if expires_at > now:
+                break
+            del self.manifests[session_id]
+        while self.entries:
+            key, (_, expires_at, _) = next(iter(self.entries.items()))
+            if expires_at > now:
+                break
+            self._remove(key)
+            self.expirations += 1
     
     def save_chunks(self, session_id: str, chunks: List[Tuple[str, bytes, str]]) -> List[Dict]:
         """
@@ -141,28 +368,59 @@ class ChunkStore:
         
         Args:
             session_id: Unique session identifier
-            chunks: List of (chunk_id, audio_bytes, text) tuples
+            chunks: List of (chunk_id, audio_bytes, text) or (chunk_id, audio_bytes, text, etag) tuples
         
         Returns:
             List of chunk metadata
         """
-        metadata = []
+        return [self.save_chunk(session_id, *chunk) for chunk in chunks]
+    
+    def save_chunk(self, session_id: str, chunk_id: str, audio: bytes, text: str, etag: Optional[str] = None) -> Dict:
+        """
+        Save a single audio chunk
+        
+        Oldest chunks are evicted until the new one fits in the byte budget.
+        
+        Args:
+            session_id: Unique session identifier
+            chunk_id: Chunk ID within the session
+            audio: Audio bytes
+            text: Sentence text
+            etag: Content-addressed ETag served with the chunk
+        
+        Returns:
+            Chunk metadata
+        """
+        key = (session_id, chunk_id)
+        size = len(audio)
+        now = time.time()
         
         with self.lock:
-            for chunk_id, audio, text in chunks:
-                key = f"{session_id}:{chunk_id}"
-                self.store[key] = audio
+            self._expire(now)
+            if key in self.entries:
+                self._remove(key)
+            
+            if size > self.max_bytes:
+                self.rejected += 1
+                print(f"[CHUNK-STORE] Chunk {session_id}/{chunk_id} ({size} bytes) exceeds budget, not stored")
+            else:
+                while self.total_bytes + size > self.max_bytes and self.entries:
+                    self._remove(next(iter(self.entries)))
+                    self.evictions += 1
                 
-                metadata.append({
-                    "id": chunk_id,
-                    "text": text,
-                    "url": f"/api/voice/chunk/{session_id}/{chunk_id}",
-                    "size": len(audio)
-                })
+                self.entries[key] = (bytes(audio), now + self.ttl, etag)
+                self.sessions.setdefault(session_id, {})[chunk_id] = size
+                self.session_bytes[session_id] = self.session_bytes.get(session_id, 0) + size
+                self.total_bytes += size
         
-        return metadata
+        return {
+            "id": chunk_id,
+            "text": text,
+            "url": f"/api/voice/chunk/{session_id}/{chunk_id}",
+            "size": size
+        }
     
-    def get_chunk(self, session_id: str, chunk_id: str) -> Optional[bytes]:
+    def get_chunk(self, session_id: str, chunk_id: str) -> Optional[memoryview]:
         """
         Get audio chunk
         
@@ -171,20 +429,312 @@ class ChunkStore:
             chunk_id: Chunk ID
         
         Returns:
-            Audio bytes if found, None otherwise
+            Zero-copy view of the audio bytes if found, None otherwise
+        """
+        entry = self.get_chunk_entry(session_id, chunk_id)
+        return entry[0] if entry else None
+    
+    def get_chunk_entry(self, session_id: str, chunk_id: str) -> Optional[Tuple[memoryview, Optional[str]]]:
+        """
+        Get audio chunk together with its ETag
+        
+        Returns:
+            (audio view, etag) if found, None otherwise
+        """
+        with self.lock:
+            entry = self.entries.get((session_id, chunk_id))
+            if entry is None:
+                return None
+            audio, expires_at, etag = entry
+            if expires_at <= time.time():
+                self._remove((session_id, chunk_id))
+                self.expirations += 1
+                return None
+            return memoryview(audio), etag
+    
+    def get_session_chunks(self, session_id: str) -> List[str]:
+        """Chunk IDs currently held for a session"""
+        with self.lock:
+            return list(self.sessions.get(session_id, {}).keys())
+    
+    def open_session(self, session_id: str, total: Optional[int] = None):
         """
-        key = f"{session_id}:{chunk_id}"
+        Register a session before its chunks exist
         
+        Args:
+            session_id: Session ID
+            total: Expected chunk count, None if not known yet
+        """
         with self.lock:
-            return self.store.get(key)
+            self.manifests.pop(session_id, None)
+            self.manifests[session_id] = (total, time.time() + self.ttl)
+    
+    def close_session(self, session_id: str, total: int):
+        """Mark a session complete with its final chunk count"""
+        self.open_session(session_id, total)
+    
+    def get_session_info(self, session_id: str) -> Optional[Dict]:
+        """
+        Get session manifest
+        
+        Returns:
+            {"total": expected chunk count or None} if the session is known, None otherwise
+        """
+        with self.lock:
+            manifest = self.manifests.get(session_id)
+            if manifest is None or manifest[1] <= time.time():
+                return None
+            return {"total": manifest[0]}
     
     def clear_session(self, session_id: str):
         """Clear all chunks for a session"""
         with self.lock:
-            keys_to_delete = [k for k in self.store.keys() if k.startswith(f"{session_id}:")]
-            for key in keys_to_delete:
-                del self.store[key]
+            self.manifests.pop(session_id, None)
+            for chunk_id in list(self.sessions.get(session_id, {}).keys()):
+                self._remove((session_id, chunk_id))
+    
+    def get_stats(self, top_sessions: int = 10) -> Dict[str, any]:
+        """
+        Get chunk store gauges
+        
+        Args:
+            top_sessions: Number of largest sessions to report
+        
+        Returns:
+            Dictionary with memory accounting metrics
+        """
+        with self.lock:
+            self._expire(time.time())
+            largest = sorted(self.session_bytes.items(), key=lambda item: item[1], reverse=True)[:top_sessions]
+            return {
+                "backend": "memory",
+                "bytes_held": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "utilization": round(self.total_bytes / self.max_bytes * 100, 2) if self.max_bytes else 0,
+                "chunks": len(self.entries),
+                "sessions": len(self.sessions),
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "rejected": self.rejected,
+                "largest_sessions": [{"session_id": sid, "bytes": size} for sid, size in largest]
+            }
+
+
+class SQLiteChunkStore(AsyncChunkAccess):
+    """
+    Chunk store shared by all worker processes through a local SQLite file
+    
+    Same interface as ChunkStore, so chunk URLs resolve no matter which
+    uvicorn worker receives the follow-up request. Writes can wait up to
+    10 s for another worker's lock, so handlers use the *_async methods.
+    """
+    
+    blocking = True
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS chunks (
+            session_id TEXT NOT NULL,
+            chunk_id TEXT NOT NULL,
+            audio BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            expires_at REAL NOT NULL,
+            etag TEXT,
+            PRIMARY KEY (session_id, chunk_id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_chunks_expires ON chunks (expires_at);
+        CREATE TABLE IF NOT EXISTS sessions (
+            session_id TEXT PRIMARY KEY,
+            total INTEGER,
+            expires_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS meta (id INTEGER PRIMARY KEY CHECK (id = 1), total_bytes INTEGER NOT NULL);
+        INSERT OR IGNORE INTO meta (id, total_bytes) VALUES (1, 0);
+        CREATE TRIGGER IF NOT EXISTS chunks_insert AFTER INSERT ON chunks
+            BEGIN UPDATE meta SET total_bytes = total_bytes + NEW.size WHERE id = 1; END;
+        CREATE TRIGGER IF NOT EXISTS chunks_delete AFTER DELETE ON chunks
+            BEGIN UPDATE meta SET total_bytes = total_bytes - OLD.size WHERE id = 1; END;
+    """
+    
+    def __init__(self, path: str, ttl: int = 600, max_bytes: int = 64 * 1024 * 1024):
+        """
+        Initialize SQLite chunk store
+        
+        Args:
+            path: Database file path (must be on a local filesystem shared by the workers)
+            ttl: Time-to-live in seconds (default: 10 minutes)
+            max_bytes: Maximum audio bytes held across all workers (default: 64 MB)
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        
+        self.conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+        try:
+            # Files created before ETags were stored
+            self.conn.execute("ALTER TABLE chunks ADD COLUMN etag TEXT")
+        except sqlite3.OperationalError:
+            pass
+        
+        # Metrics (this process only)
+        self.evictions = 0
+        self.expirations = 0
+        self.rejected = 0
+    
+    def _total_bytes(self) -> int:
+        return self.conn.execute("SELECT total_bytes FROM meta WHERE id = 1").fetchone()[0]
+    
+    def save_chunks(self, session_id: str, chunks: List[Tuple[str, bytes, str]]) -> List[Dict]:
+        """Save audio chunks, returns list of chunk metadata"""
+        return [self.save_chunk(session_id, *chunk) for chunk in chunks]
+    
+    def save_chunk(self, session_id: str, chunk_id: str, audio: bytes, text: str, etag: Optional[str] = None) -> Dict:
+        """Save a single audio chunk, evicting the oldest chunks to stay within budget"""
+        size = len(audio)
+        now = time.time()
+        
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.expirations += self.conn.execute("DELETE FROM chunks WHERE expires_at <= ?", (now,)).rowcount
+                self.conn.execute("DELETE FROM chunks WHERE session_id = ? AND chunk_id = ?", (session_id, chunk_id))
+                
+                if size > self.max_bytes:
+                    self.rejected += 1
+                    print(f"[CHUNK-STORE] Chunk {session_id}/{chunk_id} ({size} bytes) exceeds budget, not stored")
+                else:
+                    overflow = self._total_bytes() + size - self.max_bytes
+                    if overflow > 0:
+                        freed = 0
+                        victims = []
+                        for rowid, victim_size in self.conn.execute("SELECT rowid, size FROM chunks ORDER BY expires_at"):
+                            victims.append((rowid,))
+                            freed += victim_size
+                            if freed >= overflow:
+                                break
+                        self.conn.executemany("DELETE FROM chunks WHERE rowid = ?", victims)
+                        self.evictions += len(victims)
+                    
+                    self.conn.execute(
+                        "INSERT INTO chunks (session_id, chunk_id, audio, size, expires_at, etag) VALUES (?, ?, ?, ?, ?, ?)",
+                        (session_id, chunk_id, sqlite3.Binary(audio), size, now + self.ttl, etag)
+                    )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        
+        return {
+            "id": chunk_id,
+            "text": text,
+            "url": f"/api/voice/chunk/{session_id}/{chunk_id}",
+            "size": size
+        }
+    
+    def get_chunk(self, session_id: str, chunk_id: str) -> Optional[memoryview]:
+        """Get audio chunk as a memoryview, None if missing or expired"""
+        entry = self.get_chunk_entry(session_id, chunk_id)
+        return entry[0] if entry else None
+    
+    def get_chunk_entry(self, session_id: str, chunk_id: str) -> Optional[Tuple[memoryview, Optional[str]]]:
+        """Get (audio view, etag) for a chunk, None if missing or expired"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT audio, etag FROM chunks WHERE session_id = ? AND chunk_id = ? AND expires_at > ?",
+                (session_id, chunk_id, time.time())
+            ).fetchone()
+        return (memoryview(row[0]), row[1]) if row else None
+    
+    def get_session_chunks(self, session_id: str) -> List[str]:
+        """Chunk IDs currently held for a session"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT chunk_id FROM chunks WHERE session_id = ? AND expires_at > ?",
+                (session_id, time.time())
+            ).fetchall()
+        return [row[0] for row in rows]
+    
+    def open_session(self, session_id: str, total: Optional[int] = None):
+        """Register a session before its chunks exist (total=None while still generating)"""
+        now = time.time()
+        with self.lock:
+            self.conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, total, expires_at) VALUES (?, ?, ?)",
+                (session_id, total, now + self.ttl)
+            )
+    
+    def close_session(self, session_id: str, total: int):
+        """Mark a session complete with its final chunk count"""
+        self.open_session(session_id, total)
+    
+    def get_session_info(self, session_id: str) -> Optional[Dict]:
+        """Get {"total": expected chunk count or None} if the session is known"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT total FROM sessions WHERE session_id = ? AND expires_at > ?",
+                (session_id, time.time())
+            ).fetchone()
+        return {"total": row[0]} if row else None
+    
+    def clear_session(self, session_id: str):
+        """Clear all chunks for a session"""
+        with self.lock:
+            self.conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self.conn.execute("DELETE FROM chunks WHERE session_id = ?", (session_id,))
+    
+    def get_stats(self, top_sessions: int = 10) -> Dict[str, any]:
+        """Get chunk store gauges (bytes and counts are shared, event counters are per process)"""
+        with self.lock:
+            self.expirations += self.conn.execute("DELETE FROM chunks WHERE expires_at <= ?", (time.time(),)).rowcount
+            total_bytes = self._total_bytes()
+            chunks, sessions = self.conn.execute("SELECT COUNT(*), COUNT(DISTINCT session_id) FROM chunks").fetchone()
+            largest = self.conn.execute(
+                "SELECT session_id, SUM(size) AS bytes FROM chunks GROUP BY session_id ORDER BY bytes DESC LIMIT ?",
+                (top_sessions,)
+            ).fetchall()
+        
+        return {
+            "backend": "sqlite",
+            "bytes_held": total_bytes,
+            "max_bytes": self.max_bytes,
+            "utilization": round(total_bytes / self.max_bytes * 100, 2) if self.max_bytes else 0,
+            "chunks": chunks,
+            "sessions": sessions,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "rejected": self.rejected,
+            "largest_sessions": [{"session_id": sid, "bytes": size} for sid, size in largest]
+        }
+
+
+def create_chunk_store(backend: str = "memory", ttl: int = 600, max_bytes: int = 64 * 1024 * 1024, path: Optional[str] = None):
+    """
+    Create the configured chunk store
+    
+    Args:
+        backend: "memory" (per process) or "sqlite" (shared across workers)
+        ttl: Time-to-live in seconds
+        max_bytes: Byte budget
+        path: SQLite file path (sqlite backend only)
+    
+    Returns:
+        ChunkStore or SQLiteChunkStore
+    """
+    if backend == "sqlite":
+        path = path or os.path.join(tempfile.gettempdir(), "doctor_ai_chunks.sqlite3")
+        print(f"[CHUNK-STORE] Using shared SQLite chunk store at {path}")
+        return SQLiteChunkStore(path, ttl=ttl, max_bytes=max_bytes)
+    return ChunkStore(ttl=ttl, max_bytes=max_bytes)
 
 
 # Global chunk store instance
-chunk_store = ChunkStore(ttl=600)
+chunk_store = create_chunk_store(
+    backend=os.getenv("CHUNK_STORE_BACKEND", "memory").lower(),
+    ttl=int(os.getenv("CHUNK_STORE_TTL", "600")),
+    max_bytes=int(os.getenv("CHUNK_STORE_MAX_MB", "64")) * 1024 * 1024,
+    path=os.getenv("CHUNK_STORE_PATH")
+)
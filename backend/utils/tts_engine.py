@@ -0,0 +1,239 @@
+"""
+TTS Synthesis Engine
+Bounded-concurrency sentence synthesis on top of the TTS cache
+"""
+import asyncio
+import time
+from typing import AsyncIterable, AsyncIterator, Dict, List, Optional, Tuple, Union
+
+from utils.single_flight import SingleFlight
+from utils.tts_cache import TTSCache
+
+
+class TTSSynthesizer:
+    """Synthesizes sentences in parallel with per-request and per-process limits"""
+
+    def __init__(
+        self,
+        client,
+        cache: TTSCache,
+        model: str,
+        response_format: str = "mp3",
+        max_concurrency: int = 8,
+        request_concurrency: int = 4,
+        phrase_bank=None
+    ):
+        """
+        Initialize synthesizer
+
+        Args:
+            client: AsyncOpenAI client
+            cache: TTS cache used for lookups and write-back
+            model: TTS model name
+            response_format: Audio format requested from the API
+            max_concurrency: Max in-flight TTS calls for the whole process
+            request_concurrency: Max in-flight TTS calls for a single request
+            phrase_bank: Optional PhraseBank served before the cache
+        """
+        self.client = client
+        self.cache = cache
+        self.model = model
+        self.response_format = response_format
+        self.max_concurrency = max(1, max_concurrency)
+        self.request_concurrency = max(1, request_concurrency)
+        self.process_semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.phrase_bank = phrase_bank
+        # Identical sentences requested concurrently share one TTS call
+        self.flights = SingleFlight("tts-flight")
+
+        # Metrics
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.deduplicated = 0
+
+    def flight_key(self, voice: str, text: str, response_format: Optional[str] = None) -> str:
+        """Single-flight key for one sentence in one audio format (defaults to the engine's format)"""
+        return self.cache._make_key(self.model, voice, text, response_format or self.response_format)
+
+    async def _generate(self, text: str, voice: str, response_format: str) -> bytes:
+        """Call the TTS API under the process-wide limit and cache the result"""
+        async with self.process_semaphore:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            start_time = time.time()
+            try:
+                response = await self.client.audio.speech.create(
+                    model=self.model,
+                    voice=voice,
+                    input=text,
+                    response_format=response_format
+                )
+            finally:
+                self.in_flight -= 1
+
+        audio_bytes = response.content
+        generation_time = time.time() - start_time
+        if self.phrase_bank is not None:
+            self.phrase_bank.record_synthesis(text)
+        await self.cache.store(self.model, voice, text, audio_bytes, generation_time, response_format)
+        print(f"[TTS-ENGINE] Generated in {generation_time:.2f}s: {text[:40]}...")
+        return audio_bytes
+
+    async def synthesize(
+        self,
+        text: str,
+        voice: str,
+        request_semaphore: Optional[asyncio.Semaphore] = None,
+        response_format: Optional[str] = None
+    ) -> bytes:
+        """
+        Get audio for one sentence, from the phrase bank, cache or the TTS API
+
+        Args:
+            text: Normalized sentence
+            voice: Voice name
+            request_semaphore: Optional per-request limiter
+            response_format: Audio format (defaults to the engine's format)
+
+        Returns:
+            Audio bytes
+        """
+        fmt = response_format or self.response_format
+
+        # The bank is rendered as mp3 only
+        if self.phrase_bank is not None and fmt == "mp3":
+            banked_audio = self.phrase_bank.get(self.model, voice, text)
+            if banked_audio is not None:
+                return banked_audio
+
+        cached_audio = await self.cache.fetch(self.model, voice, text, fmt)
+        if cached_audio is not None:
+            return cached_audio
+
+        async def generate() -> bytes:
+            if request_semaphore is None:
+                return await self._generate(text, voice, fmt)
+            async with request_semaphore:
+                return await self._generate(text, voice, fmt)
+
+        return await self.flights.do(self.flight_key(voice, text, fmt), generate)
+
+    async def synthesize_many(self, sentences: List[str], voice: str, concurrency: Optional[int] = None) -> List[bytes]:
+        """
+        Synthesize a batch of sentences concurrently
+
+        Identical sentences are synthesized once. Results are returned in
+        the same order as the input.
+
+        Args:
+            sentences: Sentences in playback order
+            voice: Voice name
+            concurrency: Per-request limit (defaults to the configured limit)
+
+        Returns:
+            List of audio bytes aligned with sentences
+        """
+        if not sentences:
+            return []
+
+        limit = min(concurrency or self.request_concurrency, self.max_concurrency)
+        request_semaphore = asyncio.Semaphore(max(1, limit))
+
+        unique_sentences = list(dict.fromkeys(sentences))
+        self.deduplicated += len(sentences) - len(unique_sentences)
+
+        tasks: Dict[str, asyncio.Task] = {
+            sentence: asyncio.create_task(self.synthesize(sentence, voice, request_semaphore))
+            for sentence in unique_sentences
+        }
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except Exception:
+            for task in tasks.values():
+                task.cancel()
+            raise
+
+        return [tasks[sentence].result() for sentence in sentences]
+
+    async def synthesize_ordered(
+        self,
+        sentences: Union[List[str], AsyncIterable[str]],
+        voice: str,
+        concurrency: Optional[int] = None
+    ) -> AsyncIterator[Tuple[int, str, bytes]]:
+        """
+        Synthesize sentences concurrently and yield them in playback order
+
+        Sentences may come from a list or from an async iterator (e.g. an
+        LLM token stream cut into sentences); each one is handed to TTS as
+        soon as it arrives. The first sentence does not wait for a
+        per-request slot, so the caller can start playback after a single
+        TTS round trip.
+
+        Args:
+            sentences: Sentences in playback order (list or async iterable)
+            voice: Voice name
+            concurrency: Per-request limit (defaults to the configured limit)
+
+        Yields:
+            (index, sentence, audio_bytes) tuples in input order
+        """
+        limit = min(concurrency or self.request_concurrency, self.max_concurrency)
+        request_semaphore = asyncio.Semaphore(max(1, limit))
+
+        tasks: Dict[str, asyncio.Task] = {}
+        queue: asyncio.Queue = asyncio.Queue()
+        done = object()
+
+        def schedule(i: int, sentence: str):
+            if sentence in tasks:
+                self.deduplicated += 1
+            else:
+                semaphore = None if i == 0 else request_semaphore
+                tasks[sentence] = asyncio.create_task(self.synthesize(sentence, voice, semaphore))
+            queue.put_nowait((i, sentence))
+
+        async def produce():
+            try:
+                if isinstance(sentences, list):
+                    for i, sentence in enumerate(sentences):
+                        schedule(i, sentence)
+                else:
+                    i = 0
+                    async for sentence in sentences:
+                        schedule(i, sentence)
+                        i += 1
+                queue.put_nowait(done)
+            except Exception as e:
+                queue.put_nowait(e)
+
+        producer = asyncio.create_task(produce())
+
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                i, sentence = item
+                audio_bytes = await tasks[sentence]
+                yield i, sentence, audio_bytes
+        finally:
+            if not producer.done():
+                producer.cancel()
+            for task in tasks.values():
+                if not task.done():
+                    task.cancel()
+
+    def get_stats(self) -> Dict[str, any]:
+        """Get synthesis concurrency statistics"""
+        return {
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "max_concurrency": self.max_concurrency,
+            "request_concurrency": self.request_concurrency,
+            "deduplicated_sentences": self.deduplicated,
+            "single_flight": self.flights.get_stats()
+        }